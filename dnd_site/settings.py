@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,12 +50,18 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # снаружи PrimaryAfterWriteMiddleware: сохранение отчета профилирования
+    # не считается записью запроса и не закрепляет клиента за основной БД
+    "spells.middleware.ProfilingMiddleware",
+    "spells.middleware.PrimaryAfterWriteMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
 ROOT_URLCONF = "dnd_site.urls"
 
+TEST_RUNNER = "spells.test_runner.SpellsTestRunner"
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -83,6 +90,81 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: пути к файлам SQLite через запятую в SPELLS_REPLICA_DBS.
+# В тестах у реплики свой файл, а чтение идет из основной БД
+# (см. spells.test_runner)
+SPELLS_DB_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.environ.get("SPELLS_REPLICA_DBS", "").split(",")), start=1
+):
+    alias = f"replica_{number}"
+    DATABASES[alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": name.strip(),
+        "TEST": {"NAME": f"{name.strip()}.test"},
+    }
+    SPELLS_DB_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["spells.routers.PrimaryReplicaRouter"]
+
+# Сколько секунд после записи клиент читает из основной БД (задержка реплик)
+SPELLS_REPLICA_LAG = 5
+
+# Ограничение частоты дорогих запросов по пользователю или IP.
+# Счетчики хранятся в кэше default: при нескольких процессах
+# это должен быть общий кэш (Redis, Memcached).
+# IP берется из REMOTE_ADDR; за обратными прокси SPELLS_NUM_PROXIES - сколько
+# их добавляет адрес в X-Forwarded-For (заголовок клиента не учитывается).
+# SPELLS_THROTTLING = False выключает ограничение (нагрузочный тест)
+# Кроме JSON ответы и запросы бывают в MessagePack (spells/renderers.py)
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "rest_framework.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "spells.renderers.MessagePackRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "rest_framework.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+        "spells.renderers.MessagePackParser",
+    ],
+    "DEFAULT_THROTTLE_RATES": {
+        "spells.sheet": "120/min",
+        "spells.shared": "300/min",
+        "spells.recommendations": "60/min",
+        "spells.simulation": "60/min",
+        "spells.cards": "30/min",
+    },
+    "NUM_PROXIES": int(os.environ.get("SPELLS_NUM_PROXIES", "0")),
+}
+SPELLS_THROTTLING = True
+
+# Объединение одинаковых одновременных вычислений при промахе кэша
+SPELLS_REQUEST_COALESCING = True
+
+# Бюджет времени импортов при запуске процесса (startup_benchmark), мс
+SPELLS_STARTUP_BUDGET_MS = 600
+
+# Не реже чем раз в столько секунд индекс автодополнения перестраивается
+# (обновляется популярность названий)
+SPELLS_AUTOCOMPLETE_TTL = 600
+
+# Не реже чем раз в столько секунд признаки заклинаний для рекомендаций
+# и подбора против столкновения перестраиваются целиком (точечные правки
+# не пересчитывают веса idf)
+SPELLS_FEATURES_TTL = 600
+
+# Профилирование запросов (ProfilingMiddleware, отчеты - в админке).
+# SPELLS_PROFILING - разрешить cProfile по заголовку X-Spells-Profile
+# (сотрудникам или со значением SPELLS_PROFILING_TOKEN);
+# SPELLS_SLOW_REQUEST_MS - порог, после которого у запроса снимаются стеки
+# раз в SPELLS_PROFILE_SAMPLE_INTERVAL_MS. Выключено - без накладных расходов.
+SPELLS_PROFILING = os.environ.get("SPELLS_PROFILING") == "1"
+SPELLS_PROFILING_TOKEN = os.environ.get("SPELLS_PROFILING_TOKEN") or None
+SPELLS_SLOW_REQUEST_MS = None
+SPELLS_PROFILE_SAMPLE_INTERVAL_MS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -119,6 +201,32 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Загруженные файлы (аватары игроков и их миниатюры)
+MEDIA_URL = "media/"
+MEDIA_ROOT = BASE_DIR / "media"
+
+# Потоки фоновой обработки аватаров
+SPELLS_AVATAR_WORKERS = 2
+
+# Карточки заклинаний для печати: шрифты с кириллицей (путь или имя файла
+# в системных папках шрифтов), процессы отрисовки render_spell_cards и с какого
+# числа недостающих карточек их запускать, сколько карточек рисовать прямо
+# в запросе к API (остальные рисуются в фоне, API отвечает 202)
+SPELLS_CARD_FONTS = (
+    os.environ.get("SPELLS_CARD_FONT", "DejaVuSans.ttf"),
+    os.environ.get("SPELLS_CARD_FONT_BOLD", "DejaVuSans-Bold.ttf"),
+)
+SPELLS_CARD_WORKERS = min(4, os.cpu_count() or 1)
+SPELLS_CARD_POOL_MIN = 16
+SPELLS_CARD_REQUEST_MAX = 8
+
+# Журнал событий сессии вместо перезаписи ячеек и хитов
+# (перед выключением выполнить compact_session_events).
+# Свертка не трогает события моложе SPELLS_EVENT_COMPACTION_GRACE с -
+# окно должно быть больше самой долгой транзакции, вставляющей события
+SPELLS_EVENT_SOURCING = False
+SPELLS_EVENT_COMPACTION_GRACE = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
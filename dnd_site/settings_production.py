@@ -0,0 +1,38 @@
+"""
+Настройки для рабочих процессов и управляющих команд на сервере.
+
+Использование: DJANGO_SETTINGS_MODULE=dnd_site.settings_production.
+Отличия от settings.py - без приложений для разработки и отладки,
+только JSON-рендерер DRF (браузерный API тянет шаблоны и формы).
+"""
+
+import os
+
+from dnd_site.settings import *  # noqa: F403
+from dnd_site.settings import INSTALLED_APPS, REST_FRAMEWORK
+
+# Приложения, нужные только разработчикам (shell_plus, схема БД)
+DEV_APPS = ("django_extensions", "django_dbml")
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEV_APPS]
+
+DEBUG = False
+
+SECRET_KEY = os.environ["DJANGO_SECRET_KEY"]
+
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get("DJANGO_ALLOWED_HOSTS", "").split(",")
+    if host.strip()
+]
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    "DEFAULT_RENDERER_CLASSES": [
+        "rest_framework.renderers.JSONRenderer",
+        "spells.renderers.MessagePackRenderer",
+    ],
+}
+
+# Бюджет времени запуска процесса для startup_benchmark, мс
+SPELLS_STARTUP_BUDGET_MS = 450
@@ -1,7 +1,11 @@
+import json
+
 from django.contrib import admin
+from django.utils.html import format_html
 
 from spells.models import (CharacterClass, DamageType, Effect, MagicSchool,
-                           MaterialComponent, Person, Player, Spell, Spellbook,
+                           MaterialComponent, Person, Player, ProfileReport,
+                           PublishedSnapshot, SessionEvent, Spell, Spellbook,
                            SpellTime, Subclass)
 
 # Register your models here.
@@ -12,6 +16,8 @@ admin.site.register(MagicSchool)
 admin.site.register(MaterialComponent)
 admin.site.register(Person)
 admin.site.register(Player)
+admin.site.register(PublishedSnapshot)
+admin.site.register(SessionEvent)
 admin.site.register(Spell)
 admin.site.register(Spellbook)
 admin.site.register(SpellTime)
@@ -21,3 +27,41 @@ admin.site.register(Subclass)
 
 
 
+
+
+@admin.register(ProfileReport)
+class ProfileReportAdmin(admin.ModelAdmin):
+    """Профили запросов: по умолчанию самые медленные сверху"""
+
+    list_display = (
+        "created_at",
+        "kind",
+        "method",
+        "path",
+        "view",
+        "status_code",
+        "duration_ms",
+        "sql_count",
+        "sql_ms",
+    )
+    list_filter = ("kind", "view")
+    search_fields = ("path",)
+    ordering = ("-duration_ms",)
+    date_hierarchy = "created_at"
+    fields = (*list_display, "queries_text", "report_text")
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Запросы к БД")
+    def queries_text(self, obj):
+        text = json.dumps(obj.queries, ensure_ascii=False, indent=2)
+        return format_html("<pre>{}</pre>", text)
+
+    @admin.display(description="Отчет")
+    def report_text(self, obj):
+        return format_html("<pre>{}</pre>", obj.report)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SpellsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "spells"
+
+    def ready(self):
+        from spells import signals  # noqa: F401
@@ -0,0 +1,113 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from spells.services.autocomplete import KINDS, SPELL, NameIndex, build_index
+
+SYLLABLES = (
+    "ог не ша р ле дя ной лу ч ма ги чес кая стре ла щит мол ни я "
+    "гро м све т тьма ве тер ка мень ис це ле ние ядо ви тое об ла ко "
+    "при зыв ду х за щи та от зла вол шеб ный гла з бы стро та"
+).split()
+
+
+def synthetic_index(size: int, seed: int) -> NameIndex:
+    """Индекс из случайных названий из 1-3 слов"""
+    rng = random.Random(seed)
+    popularity = sorted((rng.random() for _ in range(size)), reverse=True)
+    index = NameIndex(kind=SPELL)
+    for object_id in range(1, size + 1):
+        words = [
+            "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+            for _ in range(rng.randint(1, 3))
+        ]
+        index.add(object_id, " ".join(words), popularity[object_id - 1])
+    return index
+
+
+def with_typo(text: str, rng: random.Random) -> str:
+    """Заменить, удалить или переставить одну букву"""
+    if len(text) < 3:
+        return text
+    i = rng.randrange(1, len(text) - 1)
+    action = rng.randrange(3)
+    if action == 0:
+        return text[:i] + rng.choice("абвгдеклмнопрст") + text[i + 1 :]
+    if action == 1:
+        return text[:i] + text[i + 1 :]
+    return text[: i - 1] + text[i] + text[i - 1] + text[i + 1 :]
+
+
+class Command(BaseCommand):
+    help = (
+        "Измерить время подсказок автодополнения: для случайных названий "
+        "набираются все префиксы (с одной опечаткой), как при вводе по буквам"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind", choices=KINDS, default=SPELL, help="Индекс из базы"
+        )
+        parser.add_argument(
+            "--synthetic",
+            type=int,
+            default=0,
+            help="Вместо базы - случайный справочник из стольких названий",
+        )
+        parser.add_argument(
+            "--names", type=int, default=200, help="Сколько названий набрать"
+        )
+        parser.add_argument("--limit", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--budget-ms", type=float, default=10.0, help="Бюджет на p99, мс"
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        started = time.perf_counter()
+        if options["synthetic"]:
+            index = synthetic_index(options["synthetic"], options["seed"])
+        else:
+            index = build_index(options["kind"])
+        build_ms = (time.perf_counter() - started) * 1000
+        names = [
+            (object_id, name)
+            for object_id, name in zip(index.ids, index.names, strict=True)
+            if object_id
+        ]
+        if not names:
+            raise CommandError("Справочник пуст")
+        self.stdout.write(
+            f"Индекс: {len(names)} названий, {len(index.postings)} триграмм, "
+            f"построен за {build_ms:.0f} мс"
+        )
+
+        latencies = []
+        found = 0
+        for object_id, name in rng.choices(names, k=options["names"]):
+            typed = with_typo(name, rng)
+            for end in range(1, len(typed) + 1):
+                started = time.perf_counter()
+                suggestions = index.search(typed[:end], options["limit"])
+                latencies.append((time.perf_counter() - started) * 1000)
+            # название целиком (с опечаткой) должно находить исходное
+            found += any(item["id"] == object_id for item in suggestions)
+
+        latencies.sort()
+        p50, p95, p99 = (
+            latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+            for q in (0.5, 0.95, 0.99)
+        )
+        self.stdout.write(
+            f"Запросов {len(latencies)}: p50 {p50:.2f} мс, p95 {p95:.2f} мс, "
+            f"p99 {p99:.2f} мс, максимум {latencies[-1]:.2f} мс, "
+            f"среднее {statistics.fmean(latencies):.2f} мс; исходное название "
+            f"найдено в {found / options['names']:.0%} случаев"
+        )
+        budget = options["budget_ms"]
+        if p99 > budget:
+            raise CommandError(f"p99 {p99:.2f} мс превышает бюджет {budget:.0f} мс")
+        self.stdout.write(self.style.SUCCESS("Подсказки укладываются в бюджет"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from spells.services.recommendations import get_feature_index, rebuild_cooccurrence
+
+
+class Command(BaseCommand):
+    help = "Пересчитать таблицу совместного выбора и индекс признаков заклинаний"
+
+    def handle(self, *args, **options):
+        pairs = rebuild_cooccurrence()
+        index = get_feature_index()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Пар заклинаний: {pairs}, "
+                f"заклинаний в индексе: {len(index.features)}, "
+                f"признаков: {len(index.postings)}"
+            )
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from spells.services.near_duplicates import rebuild_signatures
+
+
+class Command(BaseCommand):
+    help = "Построить MinHash-сигнатуры текста заклинаний для поиска почти-дубликатов"
+
+    def handle(self, *args, **options):
+        updated = rebuild_signatures()
+        self.stdout.write(self.style.SUCCESS(f"Обновлено сигнатур: {updated}"))
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from spells.services.events import compact, prune
+
+
+class Command(BaseCommand):
+    help = "Свернуть журнал событий сессии в строки спеллбуков и персонажей"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Кол-во строк в одной транзакции свертки",
+        )
+        parser.add_argument(
+            "--prune-days",
+            type=int,
+            default=None,
+            help="Удалить свернутые события и снимки старше N дней",
+        )
+
+    def handle(self, *args, **options):
+        compacted = compact(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Свернуто спеллбуков: {compacted['spellbooks']}, "
+                f"персонажей: {compacted['persons']}"
+            )
+        )
+        if options["prune_days"] is not None:
+            deleted = prune(now() - timedelta(days=options["prune_days"]))
+            self.stdout.write(self.style.SUCCESS(f"Удалено событий: {deleted}"))
@@ -0,0 +1,57 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from spells.services.listings import LISTING_INDEXES
+
+# Признак сортировки вне индекса в плане запроса
+SORT_PATTERNS = {
+    "sqlite": re.compile(r"USE TEMP B-TREE FOR (ORDER BY|RIGHT PART OF ORDER BY)"),
+    "postgresql": re.compile(r"\bSort\b"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверить по EXPLAIN, что списки персонажей и спеллбуков читаются "
+        "по своим индексам без отдельной сортировки. На PostgreSQL план зависит "
+        "от статистики - проверять на заполненной базе после ANALYZE"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "listings",
+            nargs="*",
+            help=f"Списки (по умолчанию все): {', '.join(LISTING_INDEXES)}",
+        )
+        parser.add_argument(
+            "--plans", action="store_true", help="Печатать планы запросов"
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["listings"]) - set(LISTING_INDEXES)
+        if unknown:
+            raise CommandError(f"Неизвестные списки: {', '.join(sorted(unknown))}")
+        sort_pattern = SORT_PATTERNS.get(connection.vendor)
+        failed = []
+        for name in options["listings"] or LISTING_INDEXES:
+            build, index = LISTING_INDEXES[name]
+            plan = build().explain()
+            problems = []
+            if index not in plan:
+                problems.append(f"не использует индекс {index}")
+            if sort_pattern is not None and sort_pattern.search(plan):
+                problems.append("сортирует вне индекса")
+
+            if problems:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: {', '.join(problems)}"))
+            else:
+                self.stdout.write(f"{name}: {index}")
+            if options["plans"] or problems:
+                self.stdout.write(plan)
+
+        if failed:
+            raise CommandError(f"Планы без нужных индексов: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS("Все списки читаются по индексам"))
@@ -0,0 +1,372 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import (
+    ThreadedWSGIServer,
+    WSGIRequestHandler,
+    get_internal_wsgi_application,
+)
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from spells.models import (
+    CharacterClass,
+    MagicSchool,
+    MaterialComponent,
+    Person,
+    Player,
+    Spell,
+    Spellbook,
+    SpellTime,
+)
+from spells.models.enums import MagicType
+from spells.services import load_testing
+
+SCHOOLS = (
+    ("Воплощение", "#e74c3c"),
+    ("Ограждение", "#3498db"),
+    ("Вызов", "#f1c40f"),
+    ("Прорицание", "#9b59b6"),
+    ("Некромантия", "#2c3e50"),
+)
+WORDS = (
+    "огненный ледяной шар стрела щит волшебный малый великий луч туман "
+    "призыв дух зов гром молния свет тьма страж огонь клинок оберег"
+).split()
+SPELLS_PER_BOOK = 40
+# Ячейки заклинаний 1-5 уровней у персонажей теста
+SLOTS = (4, 3, 3, 3, 1)
+COMPONENTS = 200
+# Компонентов на удаление у каждого виртуального пользователя
+SCRATCH_COMPONENTS = 100
+# Опции, которые --compare передает прогонам с другими настройками
+PASSED_OPTIONS = (
+    "users",
+    "duration",
+    "warmup",
+    "think_ms",
+    "mix",
+    "spells",
+    "party_size",
+    "seed",
+)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in load_testing.SCENARIOS or not weight.strip().isdigit():
+            raise CommandError(
+                f"Смесь задается как browse=60,crud=10,...; сценарии: "
+                f"{', '.join(load_testing.SCENARIOS)}"
+            )
+        mix[name] = int(weight)
+    if not any(mix.values()):
+        raise CommandError("Все веса смеси нулевые")
+    return mix
+
+
+def seed_fixtures(spells: int, users: int, party_size: int, seed: int) -> dict:
+    """Справочник и игроки для теста; id объектов для клиента"""
+    rng = random.Random(seed)
+    times = SpellTime.objects.bulk_create(
+        SpellTime(time=time) for time in ("1 действие", "1 бонусное действие")
+    )
+    schools = MagicSchool.objects.bulk_create(
+        MagicSchool(name=name, description=name, color=color) for name, color in SCHOOLS
+    )
+    wizard = CharacterClass.objects.create(
+        name="Волшебник",
+        description="Класс нагрузочного теста",
+        magic_type=MagicType.FULL_CASTER,
+        spellcasting_ability="INT",
+    )
+
+    names = set()
+    while len(names) < spells:
+        words = rng.sample(WORDS, rng.randint(2, 3))
+        names.add(f"{' '.join(words).capitalize()} {len(names) + 1}")
+    spell_objects = Spell.objects.bulk_create(
+        Spell(
+            name=name,
+            level=rng.randint(0, 9),
+            time=rng.choice(times),
+            school=rng.choice(schools),
+            range="120 футов",
+            duration="Мгновенная",
+            concentration=rng.random() < 0.4,
+            description=" ".join(rng.choices(WORDS, k=rng.randint(30, 120))),
+            damage_dice=f"{rng.randint(1, 8)}d{rng.choice((4, 6, 8, 10))}",
+        )
+        for name in sorted(names)
+    )
+    spell_ids = [spell.id for spell in spell_objects]
+    wizard.aviable_spells.add(*spell_ids)
+
+    scratch_total = users * SCRATCH_COMPONENTS
+    components = MaterialComponent.objects.bulk_create(
+        MaterialComponent(
+            name=f"Компонент {number}",
+            description="Материальный компонент нагрузочного теста",
+            cost=rng.randint(0, 50000) / 100,
+        )
+        for number in range(COMPONENTS + scratch_total)
+    )
+    component_ids = [component.id for component in components]
+    Spell.material_components.through.objects.bulk_create(
+        Spell.material_components.through(
+            spell_id=spell_id,
+            materialcomponent_id=rng.choice(component_ids[:COMPONENTS]),
+        )
+        for spell_id in spell_ids
+    )
+
+    slots = {}
+    for level, count in enumerate(SLOTS, start=1):
+        slots[f"max_spell_slots_{level}"] = slots[f"current_spell_slots_{level}"] = (
+            count
+        )
+    parties = []
+    for number in range(max(1, -(-users // party_size))):
+        user = User.objects.create(username=f"load-test-{number}")
+        player = Player.objects.create(user=user, nickname=f"Игрок {number}")
+        person = Person.objects.create(
+            name=f"Персонаж {number}",
+            player=player,
+            character_class=wizard,
+            primary_class_level=9,
+            intelligence=18,
+            max_hit_points=60,
+            current_hit_points=60,
+            spellcasting_ability="INT",
+            is_public=number % 2 == 0,
+        )
+        spellbook = Spellbook.objects.create(
+            name=f"Спеллбук {number}",
+            owner=person,
+            is_shared=number % 2 == 0,
+            **slots,
+        )
+        spellbook.spells.add(*rng.sample(spell_ids, min(SPELLS_PER_BOOK, spells)))
+        parties.append((player.id, person.id, spellbook.id))
+
+    scratch = component_ids[COMPONENTS:]
+    return {
+        "spells": spell_ids,
+        "names": sorted(names),
+        "components": component_ids[:COMPONENTS],
+        "scratch": [scratch[number::users] for number in range(users)],
+        "spellbooks": [spellbook for _, _, spellbook in parties],
+        "parties": parties,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест API: поднимает в этом процессе многопоточный "
+        "WSGI-сервер на отдельной тестовой базе, заполняет ее и прогоняет "
+        "смесь сценариев (просмотр справочника, CRUD компонентов, бой, "
+        "долгий отдых) асинхронными клиентами в отдельном процессе. "
+        "Отчет - пропускная способность, p50/p95/p99 и доля ошибок"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=20, help="Одновременных пользователей"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=20.0, help="Длительность замера, с"
+        )
+        parser.add_argument(
+            "--warmup", type=float, default=2.0, help="Прогрев без замера, с"
+        )
+        parser.add_argument(
+            "--think-ms",
+            type=float,
+            default=0.0,
+            help="Средняя пауза пользователя между запросами (0 - без пауз)",
+        )
+        parser.add_argument(
+            "--mix",
+            default=",".join(f"{k}={v}" for k, v in load_testing.DEFAULT_MIX.items()),
+            help="Веса сценариев: browse=60,crud=10,combat=25,rest=5",
+        )
+        parser.add_argument(
+            "--spells", type=int, default=500, help="Заклинаний в справочнике"
+        )
+        parser.add_argument(
+            "--party-size",
+            type=int,
+            default=4,
+            help="Пользователей на одного игрока (одновременные правки)",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--json", action="store_true", help="Вывести результат в JSON"
+        )
+        parser.add_argument(
+            "--compare",
+            nargs="+",
+            metavar="SETTINGS",
+            help=(
+                "Прогнать с каждым модулем настроек (например, с SQLite "
+                "и PostgreSQL) и свести результаты в таблицу"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["party_size"] < 1:
+            raise CommandError("--users и --party-size должны быть больше нуля")
+        mix = parse_mix(options["mix"])
+        if options["compare"]:
+            self._compare(options)
+            return
+
+        result = self._run(options, mix)
+        if options["json"]:
+            self.stdout.write(json.dumps(result, ensure_ascii=False))
+        else:
+            self._report(result)
+
+    def _run(self, options: dict, mix: dict) -> dict:
+        with tempfile.TemporaryDirectory() as directory:
+            # SQLite по умолчанию тестируется в памяти - для замеров нужен файл
+            for alias in connections:
+                database = connections[alias].settings_dict
+                if database["ENGINE"].endswith("sqlite3") and not database["TEST"].get(
+                    "NAME"
+                ):
+                    database["TEST"]["NAME"] = os.path.join(directory, f"{alias}.db")
+            verbosity = max(0, options["verbosity"] - 1)
+            # таблицы создаются по текущим моделям, без файлов миграций
+            with override_settings(MIGRATION_MODULES={"spells": None}):
+                old_config = setup_databases(
+                    verbosity, interactive=False, serialized_aliases=set()
+                )
+            try:
+                fixtures = seed_fixtures(
+                    options["spells"],
+                    options["users"],
+                    options["party_size"],
+                    options["seed"],
+                )
+                # DEBUG сохраняет каждый SQL-запрос - в замер это не должно попасть;
+                # все клиенты теста приходят с одного адреса
+                with override_settings(
+                    DEBUG=False,
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "127.0.0.1"],
+                    SPELLS_THROTTLING=False,
+                ):
+                    result = self._serve(options, mix, fixtures)
+            finally:
+                connections.close_all()
+                teardown_databases(old_config, verbosity)
+        result["backend"] = connection.vendor
+        result["settings"] = settings.SETTINGS_MODULE
+        return result
+
+    def _serve(self, options: dict, mix: dict, fixtures: dict) -> dict:
+        server = ThreadedWSGIServer(("127.0.0.1", 0), QuietRequestHandler)
+        server.set_app(get_internal_wsgi_application())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        plan = {
+            "host": "127.0.0.1",
+            "port": server.server_address[1],
+            "users": options["users"],
+            "duration": options["duration"],
+            "warmup": options["warmup"],
+            "think_ms": options["think_ms"],
+            "mix": mix,
+            "seed": options["seed"],
+            "fixtures": fixtures,
+        }
+        try:
+            # клиент - в отдельном процессе, чтобы не делить GIL с сервером
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                return pool.submit(load_testing.run, plan).result()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def _report(self, result: dict) -> None:
+        total = result["total"]
+        self.stdout.write(
+            f"{result['settings']} ({result['backend']}), "
+            f"{result['users']} пользователей, {result['seconds']:.1f} с"
+        )
+        header = (
+            f"{'Запрос':40} {'кол-во':>7} {'в сек':>7} {'p50':>7} {'p95':>7} "
+            f"{'p99':>7} {'ошибки':>7} {'409':>5} {'429':>5}"
+        )
+        self.stdout.write(header)
+        for label, row in [*result["endpoints"].items(), ("Всего", total)]:
+            self.stdout.write(
+                f"{label:40} {row['requests']:7} {row['rps']:7.1f} "
+                f"{row['p50']:7.1f} {row['p95']:7.1f} {row['p99']:7.1f} "
+                f"{row['errors']:7} {row['conflicts']:5} {row['throttled']:5}"
+            )
+        rate = total["errors"] / total["requests"] if total["requests"] else 0.0
+        style = self.style.SUCCESS if not total["errors"] else self.style.ERROR
+        self.stdout.write(
+            style(
+                f"Пропускная способность {total['rps']:.1f} запр/с, "
+                f"p99 {total['p99']:.1f} мс, ошибок {rate:.2%}"
+            )
+        )
+
+    def _compare(self, options: dict) -> None:
+        arguments = []
+        for name in PASSED_OPTIONS:
+            arguments += [f"--{name.replace('_', '-')}", str(options[name])]
+        rows = []
+        for module in options["compare"]:
+            self.stderr.write(f"Прогон с {module}...")
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "django",
+                    "load_test",
+                    f"--settings={module}",
+                    "--json",
+                    *arguments,
+                ],
+                cwd=settings.BASE_DIR,
+                env={**os.environ, "PYTHONPATH": str(settings.BASE_DIR)},
+                capture_output=True,
+                text=True,
+            )
+            if process.returncode:
+                raise CommandError(f"Прогон с {module} не удался:\n{process.stderr}")
+            rows.append(json.loads(process.stdout.strip().splitlines()[-1]))
+
+        self.stdout.write(
+            f"{'Настройки':32} {'БД':10} {'в сек':>8} {'p50':>7} {'p95':>7} "
+            f"{'p99':>7} {'ошибки':>8}"
+        )
+        for row in rows:
+            total = row["total"]
+            rate = total["errors"] / total["requests"] if total["requests"] else 0.0
+            self.stdout.write(
+                f"{row['settings']:32} {row['backend']:10} {total['rps']:8.1f} "
+                f"{total['p50']:7.1f} {total['p95']:7.1f} {total['p99']:7.1f} "
+                f"{rate:8.2%}"
+            )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from spells.models import Person, PublishedSnapshot, Spellbook
+from spells.services.publishing import publish
+
+
+class Command(BaseCommand):
+    help = "Опубликовать все общие спеллбуки и публичных персонажей"
+
+    def handle(self, *args, **options):
+        kind = PublishedSnapshot.Kind
+        sources = (
+            (kind.SPELLBOOK, Spellbook.objects.filter(is_shared=True)),
+            (kind.PERSON, Person.objects.filter(is_public=True)),
+        )
+        total = 0
+        for source_kind, queryset in sources:
+            for object_id in queryset.values_list("id", flat=True).iterator():
+                publish(source_kind, object_id)
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f"Опубликовано: {total}"))
@@ -0,0 +1,82 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from spells.models import Spell, Spellbook
+from spells.services.cards import (
+    build_pdf,
+    ensure_cards,
+    prune_cards,
+    spellbook_spell_ids,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Нарисовать карточки заклинаний (класса, спеллбуков или всех "
+        "спеллбуков персонажей группы) и при необходимости собрать PDF"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--class", dest="class_id", type=int, help="Все заклинания класса"
+        )
+        parser.add_argument(
+            "--spellbook", type=int, action="append", default=[], help="Спеллбук"
+        )
+        parser.add_argument(
+            "--person",
+            type=int,
+            action="append",
+            default=[],
+            help="Персонаж группы (все его активные спеллбуки)",
+        )
+        parser.add_argument("--all", action="store_true", help="Все заклинания")
+        parser.add_argument("--output", help="Сохранить PDF в этот файл")
+        parser.add_argument(
+            "--prune", action="store_true", help="Удалить устаревшие карточки"
+        )
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            spell_ids = list(
+                Spell.objects.order_by("level", "name").values_list("id", flat=True)
+            )
+        elif options["class_id"]:
+            spell_ids = list(
+                Spell.objects.filter(aviable_classes=options["class_id"])
+                .order_by("level", "name")
+                .values_list("id", flat=True)
+            )
+        else:
+            spellbook_ids = [
+                *options["spellbook"],
+                *Spellbook.objects.filter(
+                    owner__in=options["person"], is_active=True
+                ).values_list("id", flat=True),
+            ]
+            spell_ids = spellbook_spell_ids(*spellbook_ids) if spellbook_ids else []
+
+        if spell_ids:
+            started = time.perf_counter()
+            cards = ensure_cards(
+                spell_ids, workers=getattr(settings, "SPELLS_CARD_WORKERS", 4)
+            )
+            self.stdout.write(
+                f"Карточек: {len(cards.names)}, нарисовано: {cards.rendered} "
+                f"за {time.perf_counter() - started:.1f} с"
+            )
+            if options["output"]:
+                started = time.perf_counter()
+                Path(options["output"]).write_bytes(build_pdf(cards))
+                self.stdout.write(
+                    f"PDF {options['output']} собран "
+                    f"за {time.perf_counter() - started:.1f} с"
+                )
+        elif not options["prune"]:
+            raise CommandError("Не выбрано ни одного заклинания")
+
+        if options["prune"]:
+            self.stdout.write(f"Удалено устаревших карточек: {prune_cards()}")
@@ -0,0 +1,93 @@
+import datetime
+import decimal
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from spells.renderers import packb, unpackb
+
+SCHOOLS = ("Воплощение", "Ограждение", "Вызов", "Прорицание", "Некромантия")
+
+
+def synthetic_catalog(size: int, seed: int) -> dict:
+    """Справочник заклинаний и компонентов, как из .values(): Decimal и datetime"""
+    rng = random.Random(seed)
+    started = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+    components = [
+        {
+            "id": number,
+            "name": f"Компонент {number}",
+            "cost": decimal.Decimal(rng.randint(0, 50000)) / 100,
+            "is_consumable": rng.random() < 0.2,
+            "is_focus": rng.random() < 0.1,
+        }
+        for number in range(1, size // 10 + 2)
+    ]
+    spells = [
+        {
+            "id": number,
+            "name": f"Заклинание {number}",
+            "level": rng.randint(0, 9),
+            "school": rng.choice(SCHOOLS),
+            "concentration": rng.random() < 0.4,
+            "ritual": rng.random() < 0.1,
+            "damage_dice": f"{rng.randint(1, 10)}d{rng.choice((4, 6, 8, 10))}",
+            "components": rng.sample(range(1, len(components) + 1), 2),
+            "updated_at": started + datetime.timedelta(seconds=rng.randint(0, 10**7)),
+        }
+        for number in range(1, size + 1)
+    ]
+    return {"spells": spells, "components": components}
+
+
+def _median_ms(function, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнить JSON и MessagePack (построчно и по столбцам) на случайном "
+        "справочнике: время кодирования и разбора, размер ответа"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--spells", type=int, default=10000, help="Размер справочника"
+        )
+        parser.add_argument(
+            "--runs", type=int, default=7, help="Кол-во замеров (берется медиана)"
+        )
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        data = synthetic_catalog(options["spells"], options["seed"])
+        runs = max(1, options["runs"])
+        renderer = JSONRenderer()
+        formats = {
+            "JSON": (lambda: renderer.render(data), json.loads),
+            "MessagePack": (lambda: packb(data), unpackb),
+            "MessagePack по столбцам": (lambda: packb(data, columns=True), unpackb),
+        }
+
+        baseline = None
+        for name, (encode, decode) in formats.items():
+            payload = encode()
+            encode_ms = _median_ms(encode, runs)
+            decode_ms = _median_ms(lambda d=decode, p=payload: d(p), runs)
+            if baseline is None:
+                baseline = (encode_ms, len(payload))
+            self.stdout.write(
+                f"{name:24} кодирование {encode_ms:7.1f} мс "
+                f"({encode_ms / baseline[0]:.2f}x), разбор {decode_ms:7.1f} мс, "
+                f"размер {len(payload) / 1024:8.1f} КБ "
+                f"({len(payload) / baseline[1]:.0%})"
+            )
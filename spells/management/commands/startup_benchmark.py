@@ -0,0 +1,99 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Строка вывода -X importtime: "import time: self | cumulative | [отступ]модуль"
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+STARTUP_CODE = "import django; django.setup()"
+URLCONF_CODE = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+
+
+def parse_importtime(output: str) -> tuple[int, dict[str, int]]:
+    """Суммарное время импортов (мкс) и накопленное время по модулям"""
+    total = 0
+    cumulative = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        total += int(self_us)
+        # модули верхнего уровня уже включают время вложенных импортов
+        if not indent:
+            cumulative[module] = int(cumulative_us)
+    return total, cumulative
+
+
+class Command(BaseCommand):
+    help = (
+        "Измерить время запуска процесса (django.setup()) через "
+        "python -X importtime и сравнить с бюджетом"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--runs", type=int, default=5, help="Кол-во запусков (берется медиана)"
+        )
+        parser.add_argument(
+            "--budget-ms",
+            type=float,
+            default=None,
+            help="Бюджет, мс (по умолчанию SPELLS_STARTUP_BUDGET_MS)",
+        )
+        parser.add_argument(
+            "--urls",
+            action="store_true",
+            help="Включить загрузку URLconf (холодный старт до первого запроса)",
+        )
+        parser.add_argument(
+            "--top", type=int, default=10, help="Сколько самых долгих модулей показать"
+        )
+
+    def _measure(self, code: str) -> tuple[int, dict[str, int]]:
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE}
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=settings.BASE_DIR,
+        )
+        if completed.returncode:
+            raise CommandError(completed.stderr.strip().splitlines()[-1])
+        return parse_importtime(completed.stderr)
+
+    def handle(self, *args, **options):
+        code = URLCONF_CODE if options["urls"] else STARTUP_CODE
+        budget = options["budget_ms"]
+        if budget is None:
+            budget = getattr(settings, "SPELLS_STARTUP_BUDGET_MS", 500)
+
+        runs = [self._measure(code) for _ in range(max(1, options["runs"]))]
+        totals = [total / 1000 for total, _ in runs]
+        median = statistics.median(totals)
+
+        # модули из самого быстрого запуска - меньше всего шума
+        _, modules = min(runs, key=lambda run: run[0])
+        slowest = sorted(modules.items(), key=lambda item: -item[1])
+        for module, cumulative in slowest[: options["top"]]:
+            self.stdout.write(f"{cumulative / 1000:9.1f} мс  {module}")
+
+        self.stdout.write(
+            f"Настройки: {settings.SETTINGS_MODULE}; импорты при запуске: "
+            f"медиана {median:.1f} мс, минимум {min(totals):.1f} мс "
+            f"({len(totals)} запусков), бюджет {budget:.0f} мс"
+        )
+        if median > budget:
+            raise CommandError(
+                f"Время запуска {median:.1f} мс превышает бюджет {budget:.0f} мс"
+            )
+        self.stdout.write(self.style.SUCCESS("Запуск укладывается в бюджет"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from spells.services.slots import sync_all_spellbook_slots
+
+
+class Command(BaseCommand):
+    help = "Пересчитать максимальные ячейки всех спеллбуков по уровням персонажей"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Кол-во персонажей в одной пачке",
+        )
+
+    def handle(self, *args, **options):
+        updated = sync_all_spellbook_slots(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Обновлено спеллбуков: {updated}"))
@@ -0,0 +1,111 @@
+import ipaddress
+import statistics
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+
+
+class QueryCounter:
+    """Обертка execute_wrapper, считающая запросы к базе"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест 'громового стада': много клиентов одновременно "
+        "запрашивают один и тот же адрес при холодном кэше. "
+        "Очищает кэш default перед каждым прогоном"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", help="Адрес, например /api/spells/spellbook/1/sheet/"
+        )
+        parser.add_argument(
+            "--clients", type=int, default=50, help="Кол-во одновременных клиентов"
+        )
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Сначала прогнать без объединения запросов, потом с ним",
+        )
+
+    def _run(self, path: str, clients: int) -> dict:
+        cache.clear()
+        barrier = threading.Barrier(clients)
+        lock = threading.Lock()
+        queries = []
+        latencies = []
+        statuses = Counter()
+
+        def worker(number: int):
+            # у каждого клиента свой IP, чтобы ограничение частоты не мешало тесту
+            address = ipaddress.IPv4Address("10.0.0.1") + number
+            client = Client(REMOTE_ADDR=str(address))
+            counter = QueryCounter()
+            barrier.wait()
+            started = time.perf_counter()
+            try:
+                with connection.execute_wrapper(counter):
+                    response = client.get(path)
+            finally:
+                connection.close()
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                queries.append(counter.count)
+                latencies.append(elapsed)
+                statuses[response.status_code] += 1
+
+        threads = [
+            threading.Thread(target=worker, args=(number,)) for number in range(clients)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {
+            "queries": sum(queries),
+            "max_queries": max(queries),
+            "statuses": dict(statuses),
+            "p50": statistics.median(latencies),
+            "total": (time.perf_counter() - started) * 1000,
+        }
+
+    def _report(self, title: str, clients: int, result: dict):
+        self.stdout.write(
+            f"{title}: {clients} клиентов, ответы {result['statuses']}, "
+            f"запросов к БД {result['queries']} "
+            f"({result['queries'] / clients:.2f} на клиента, "
+            f"максимум {result['max_queries']}), "
+            f"p50 {result['p50']:.1f} мс, всего {result['total']:.1f} мс"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        clients = max(1, options["clients"])
+        # тестовый клиент обращается к хосту testserver
+        hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+
+        modes = [True]
+        if options["compare"]:
+            modes = [False, True]
+        for coalescing in modes:
+            with override_settings(
+                ALLOWED_HOSTS=hosts, SPELLS_REQUEST_COALESCING=coalescing
+            ):
+                result = self._run(path, clients)
+            title = "С объединением" if coalescing else "Без объединения"
+            self._report(title, clients, result)
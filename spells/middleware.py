@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from spells.routers import _pinned, _wrote, get_replicas, track_writes
+from spells.services import profiling
+
+PRIMARY_COOKIE = "spells_primary"
+# Как rest_framework.permissions.SAFE_METHODS - без импорта DRF при запуске
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class PrimaryAfterWriteMiddleware:
+    """
+    Закрепляет чтение за основной БД на время изменяющего запроса
+    и после недавней записи: запись в текущем запросе или cookie после прошлой
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_replicas():
+            return self.get_response(request)
+
+        # изменяющий запрос читает то, что собирается менять, из основной БД
+        pinned = _pinned.set(
+            PRIMARY_COOKIE in request.COOKIES or request.method not in SAFE_METHODS
+        )
+        wrote = _wrote.set(False)
+        try:
+            with track_writes():
+                response = self.get_response(request)
+            if _wrote.get():
+                response.set_cookie(
+                    PRIMARY_COOKIE,
+                    "1",
+                    max_age=getattr(settings, "SPELLS_REPLICA_LAG", 5),
+                    httponly=True,
+                    samesite="Lax",
+                )
+        finally:
+            _pinned.reset(pinned)
+            _wrote.reset(wrote)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование по заголовку и выборки стека медленных запросов
+    (см. spells.services.profiling); выключенное не подключается
+    """
+
+    def __init__(self, get_response):
+        self.profiling = getattr(settings, "SPELLS_PROFILING", False)
+        self.sampling = getattr(settings, "SPELLS_SLOW_REQUEST_MS", None) is not None
+        if not (self.profiling or self.sampling):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.profiling and profiling.is_requested(request):
+            return profiling.profile(request, self.get_response)
+        if self.sampling:
+            return profiling.sample(request, self.get_response)
+        return self.get_response(request)
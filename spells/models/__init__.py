@@ -1,5 +1,55 @@
-from .characters import *
-from .enums import *
-from .spellbooks import *
-from .spells import *
-from .users import *
+from .characters import CharacterClass, Person, Subclass
+from .enums import (
+    Alignment,
+    Characters,
+    Dice,
+    EffectCategory,
+    MagicType,
+    SpellLevels,
+)
+from .events import SessionEvent, SessionSnapshot
+from .profiling import ProfileReport
+from .recommendations import SpellCooccurrence
+from .signatures import SpellSignature, SpellSignatureBand
+from .snapshots import PublishedSnapshot
+from .spellbooks import Spellbook
+from .spells import (
+    DamageType,
+    Effect,
+    MagicSchool,
+    MaterialComponent,
+    Spell,
+    SpellTime,
+)
+from .sync import AppliedOperation, SpellbookSpellChange, Tombstone
+from .users import Player
+
+__all__ = [
+    "Alignment",
+    "AppliedOperation",
+    "CharacterClass",
+    "Characters",
+    "DamageType",
+    "Dice",
+    "Effect",
+    "EffectCategory",
+    "MagicSchool",
+    "MagicType",
+    "MaterialComponent",
+    "Person",
+    "Player",
+    "ProfileReport",
+    "PublishedSnapshot",
+    "SessionEvent",
+    "SessionSnapshot",
+    "Spell",
+    "SpellCooccurrence",
+    "SpellLevels",
+    "SpellSignature",
+    "SpellSignatureBand",
+    "SpellTime",
+    "Spellbook",
+    "SpellbookSpellChange",
+    "Subclass",
+    "Tombstone",
+]
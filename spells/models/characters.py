@@ -3,9 +3,21 @@ from django.db import models
 from django.utils.timezone import now
 
 from spells.models.enums import Alignment, Characters, Dice, MagicType
+from spells.models.querysets import SummaryQuerySet
+from spells.models.tracking import TrackedModel
 from spells.models.users import Player
 
 
+class CharacterClassQuerySet(SummaryQuerySet):
+    heavy_fields = ("description",)
+    preview_field = "description"
+
+
+class SubclassQuerySet(SummaryQuerySet):
+    heavy_fields = ("description", "features_description")
+    preview_field = "description"
+
+
 class CharacterClass(models.Model):
     """Класс персонажа"""
 
@@ -33,6 +45,8 @@ class CharacterClass(models.Model):
         verbose_name="Заклинательная характеристика",
     )
 
+    objects = CharacterClassQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -63,6 +77,8 @@ class Subclass(models.Model):
         verbose_name="Уровень получения",
     )
 
+    objects = SubclassQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} ({self.character_class.name})"
 
@@ -72,9 +88,11 @@ class Subclass(models.Model):
         unique_together = ["name", "character_class"]
 
 
-class Person(models.Model):
+class Person(TrackedModel):
     """Персонаж игрока"""
 
+    version_field = "version"
+
     id = models.AutoField(primary_key=True, verbose_name="id")
     name = models.CharField(max_length=100, verbose_name="Название")
     player = models.ForeignKey(
@@ -226,6 +244,12 @@ class Person(models.Model):
     )
     created_at = models.DateTimeField(default=now, verbose_name="Создано")
     updated_at = models.DateTimeField(auto_now=True)
+    events_compacted_to = models.BigIntegerField(
+        default=0, editable=False, verbose_name="Последнее свернутое событие сессии"
+    )
+    version = models.PositiveIntegerField(
+        default=1, editable=False, verbose_name="Версия (для оптимистичной блокировки)"
+    )
 
     def __str__(self):
         class_str = f" {self.character_class.name}" if self.character_class else ""
@@ -364,3 +388,21 @@ class Person(models.Model):
         verbose_name = "Персонаж"
         verbose_name_plural = "Персонажи"
         ordering = ["-is_favorite", "-updated_at"]
+        # Порядок индексов совпадает с ordering: списки читаются по индексу
+        # без сортировки. Частичные индексы содержат только нужные строки
+        indexes = [
+            models.Index(
+                fields=["player", "-is_favorite", "-updated_at"],
+                name="person_player_order_idx",
+            ),
+            models.Index(
+                fields=["player", "-is_favorite", "-updated_at"],
+                condition=models.Q(is_active=True),
+                name="person_player_active_idx",
+            ),
+            models.Index(
+                fields=["-is_favorite", "-updated_at"],
+                condition=models.Q(is_public=True),
+                name="person_public_order_idx",
+            ),
+        ]
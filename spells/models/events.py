@@ -0,0 +1,104 @@
+from django.db import models
+from django.utils.timezone import now
+
+from spells.models.characters import Person
+
+from .spellbooks import Spellbook
+
+
+class SessionEvent(models.Model):
+    """
+    Событие игровой сессии: трата или восстановление ячейки, отдых,
+    изменение хитов. Журнал только дополняется; текущее состояние -
+    строка спеллбука/персонажа плюс еще не свернутые события
+    """
+
+    class Kind(models.TextChoices):
+        SLOT_USED = "slot_used", "Потрачена ячейка"
+        SLOT_RESTORED = "slot_restored", "Восстановлена ячейка"
+        LONG_REST = "long_rest", "Продолжительный отдых"
+        HP_CHANGED = "hp_changed", "Изменение хитов"
+        TEMP_HP = "temp_hp", "Временные хиты"
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=15, choices=Kind.choices, verbose_name="Тип")
+    spellbook = models.ForeignKey(
+        Spellbook,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="events",
+        verbose_name="Спеллбук",
+    )
+    person = models.ForeignKey(
+        Person,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="events",
+        verbose_name="Персонаж",
+    )
+    level = models.PositiveSmallIntegerField(default=0, verbose_name="Уровень ячейки")
+    is_warlock = models.BooleanField(default=False, verbose_name="Ячейка колдуна")
+    amount = models.IntegerField(
+        default=0,
+        help_text="Изменение хитов: урон отрицательный, лечение положительное",
+        verbose_name="Величина",
+    )
+    created_at = models.DateTimeField(default=now, verbose_name="Время")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.id}"
+
+    class Meta:
+        verbose_name = "Событие сессии"
+        verbose_name_plural = "События сессии"
+        indexes = [
+            models.Index(fields=["spellbook", "id"]),
+            models.Index(fields=["person", "id"]),
+            models.Index(fields=["created_at"]),
+        ]
+
+
+class SessionSnapshot(models.Model):
+    """
+    Состояние спеллбука или персонажа до очередной свертки событий -
+    точка отсчета для воспроизведения хода сессии
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    spellbook = models.ForeignKey(
+        Spellbook,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Спеллбук",
+    )
+    person = models.ForeignKey(
+        Person,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Персонаж",
+    )
+    event_id = models.BigIntegerField(
+        help_text="Состояние после всех событий с id не больше этого",
+        verbose_name="Последнее учтенное событие",
+    )
+    state = models.JSONField(verbose_name="Состояние")
+    created_at = models.DateTimeField(default=now, verbose_name="Создано")
+
+    def __str__(self):
+        if self.spellbook_id:
+            return f"Спеллбук #{self.spellbook_id} до события #{self.event_id}"
+        return f"Персонаж #{self.person_id} до события #{self.event_id}"
+
+    class Meta:
+        verbose_name = "Снимок состояния сессии"
+        verbose_name_plural = "Снимки состояния сессии"
+        indexes = [
+            models.Index(fields=["spellbook", "event_id"]),
+            models.Index(fields=["person", "event_id"]),
+        ]
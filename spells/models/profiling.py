@@ -0,0 +1,45 @@
+from django.db import models
+from django.utils.timezone import now
+
+
+class ProfileReport(models.Model):
+    """
+    Профиль одного запроса к API: по cProfile (запрошен заголовком)
+    или по выборкам стека медленного запроса
+    """
+
+    class Kind(models.TextChoices):
+        PROFILE = "profile", "cProfile"
+        SAMPLED = "sampled", "Выборки стека"
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=Kind.choices, verbose_name="Тип")
+    method = models.CharField(max_length=10, verbose_name="Метод")
+    path = models.CharField(max_length=500, verbose_name="Путь")
+    view = models.CharField(max_length=200, blank=True, verbose_name="View")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Код ответа")
+    duration_ms = models.FloatField(verbose_name="Длительность, мс")
+    sql_count = models.PositiveIntegerField(default=0, verbose_name="Запросов к БД")
+    sql_ms = models.FloatField(default=0, verbose_name="Время запросов к БД, мс")
+    queries = models.JSONField(
+        default=list,
+        help_text="Самые долгие запросы: [{sql, count, ms}]",
+        verbose_name="Запросы к БД",
+    )
+    report = models.TextField(
+        help_text="Статистика cProfile или свернутые стеки с числом выборок",
+        verbose_name="Отчет",
+    )
+    created_at = models.DateTimeField(default=now, verbose_name="Время")
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} мс)"
+
+    class Meta:
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["-duration_ms"]),
+            models.Index(fields=["view", "-duration_ms"]),
+        ]
@@ -0,0 +1,37 @@
+from django.db import models
+from django.db.models import Case, Value, When
+from django.db.models.functions import Concat, Length, Substr
+from django.db.models.lookups import GreaterThan
+
+
+class SummaryQuerySet(models.QuerySet):
+    """
+    QuerySet для списков: тяжелые текстовые поля не загружаются,
+    а краткое описание считается в SQL
+    """
+
+    # Неограниченные текстовые поля, которые не нужны в списках
+    heavy_fields: tuple[str, ...] = ()
+    # Поле, из которого строится краткое описание
+    preview_field: str | None = None
+
+    def summary(self, max_length: int = 20):
+        """Список без тяжелых полей, с аннотацией ``<поле>_preview``"""
+        queryset = self.defer(*self.heavy_fields)
+        if self.preview_field:
+            queryset = queryset.with_preview(max_length)
+        return queryset
+
+    def with_preview(self, max_length: int = 20):
+        """Поле, обрезанное до ``max_length`` символов с многоточием"""
+        field = self.preview_field
+        preview = Case(
+            When(**{f"{field}__isnull": True}, then=Value("")),
+            When(
+                GreaterThan(Length(field), max_length),
+                then=Concat(Substr(field, 1, max_length), Value("...")),
+            ),
+            default=field,
+            output_field=models.TextField(),
+        )
+        return self.annotate(**{f"{field}_preview": preview})
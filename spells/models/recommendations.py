@@ -0,0 +1,35 @@
+from django.db import models
+
+from spells.models.spells import Spell
+
+
+class SpellCooccurrence(models.Model):
+    """
+    Сколько спеллбуков содержат пару заклинаний.
+    Пара хранится в обе стороны, чтобы соседей заклинания
+    можно было получить одним запросом по индексу
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    spell = models.ForeignKey(
+        Spell, on_delete=models.CASCADE, related_name="+", verbose_name="Заклинание"
+    )
+    other = models.ForeignKey(
+        Spell,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Соседнее заклинание",
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name="Кол-во спеллбуков")
+
+    def __str__(self):
+        return f"{self.spell_id} + {self.other_id}: {self.count}"
+
+    class Meta:
+        verbose_name = "Совместный выбор заклинаний"
+        verbose_name_plural = "Совместный выбор заклинаний"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["spell", "other"], name="spells_cooccurrence_unique_pair"
+            ),
+        ]
@@ -0,0 +1,56 @@
+from django.db import models
+
+from spells.models.spells import Spell
+
+
+class SpellSignature(models.Model):
+    """MinHash-сигнатура текста заклинания (описание и усиление)"""
+
+    spell = models.OneToOneField(
+        Spell,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="signature",
+        verbose_name="Заклинание",
+    )
+    text_hash = models.CharField(
+        max_length=64,
+        help_text="Сигнатура пересчитывается, только если текст изменился",
+        verbose_name="Хэш текста",
+    )
+    minhash = models.JSONField(verbose_name="Значения MinHash")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    def __str__(self):
+        return f"Сигнатура заклинания #{self.spell_id}"
+
+    class Meta:
+        verbose_name = "Сигнатура заклинания"
+        verbose_name_plural = "Сигнатуры заклинаний"
+
+
+class SpellSignatureBand(models.Model):
+    """
+    Полоса MinHash-сигнатуры (LSH): заклинания с совпавшей корзиной
+    хотя бы в одной полосе - кандидаты в почти-дубликаты
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    spell = models.ForeignKey(
+        Spell,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Заклинание",
+    )
+    band = models.PositiveSmallIntegerField(verbose_name="Номер полосы")
+    bucket = models.BigIntegerField(verbose_name="Корзина (хэш полосы)")
+
+    def __str__(self):
+        return f"{self.spell_id}: {self.band}/{self.bucket}"
+
+    class Meta:
+        verbose_name = "Полоса сигнатуры заклинания"
+        verbose_name_plural = "Полосы сигнатур заклинаний"
+        indexes = [
+            models.Index(fields=["band", "bucket"]),
+        ]
@@ -0,0 +1,32 @@
+from django.db import models
+from django.utils.timezone import now
+
+
+class PublishedSnapshot(models.Model):
+    """
+    Опубликованная версия публичного спеллбука или персонажа -
+    неизменяемый JSON, адресуемый хэшем содержимого
+    """
+
+    class Kind(models.TextChoices):
+        SPELLBOOK = "SB", "Спеллбук"
+        PERSON = "PR", "Персонаж"
+
+    id = models.AutoField(primary_key=True, verbose_name="id")
+    kind = models.CharField(max_length=2, choices=Kind.choices, verbose_name="Тип")
+    object_id = models.IntegerField(verbose_name="id источника")
+    content_hash = models.CharField(
+        max_length=64, unique=True, verbose_name="Хэш содержимого (sha256)"
+    )
+    payload = models.TextField(verbose_name="Содержимое (JSON)")
+    created_at = models.DateTimeField(default=now, verbose_name="Опубликовано")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id} ({self.content_hash[:12]})"
+
+    class Meta:
+        verbose_name = "Опубликованная версия"
+        verbose_name_plural = "Опубликованные версии"
+        indexes = [
+            models.Index(fields=["kind", "object_id", "-created_at"]),
+        ]
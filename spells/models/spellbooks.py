@@ -1,18 +1,79 @@
+from functools import reduce
+from operator import add
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Count, F
 from django.utils.timezone import now
 
 from spells.models.characters import Person
+from spells.models.tracking import TrackedModel, TrackedQuerySet
 
 from .spells import Spell
 
-
-class Spellbook(models.Model):
+SLOT_LEVELS = range(1, 10)
+
+
+class SpellbookQuerySet(TrackedQuerySet):
+    def with_spell_count(self):
+        """Кол-во заклинаний в аннотации ``spell_count``"""
+        return self.annotate(spell_count=Count("spells", distinct=True))
+
+    def with_slot_totals(self):
+        """Сумма текущих и максимальных ячеек (с колдовскими) в SQL"""
+        return self.annotate(
+            remaining_slots=reduce(
+                add,
+                [F(f"current_spell_slots_{level}") for level in SLOT_LEVELS],
+                F("warlock_current_slots"),
+            ),
+            total_slots=reduce(
+                add,
+                [F(f"max_spell_slots_{level}") for level in SLOT_LEVELS],
+                F("warlock_max_slots"),
+            ),
+        )
+
+    def use_slot(self, spell_level: int, is_warlock: bool = False) -> int:
+        """Потратить ячейку одним UPDATE (без гонок), вернуть кол-во строк"""
+        if is_warlock:
+            field = "warlock_current_slots"
+        else:
+            field = f"current_spell_slots_{spell_level}"
+        return self.filter(**{f"{field}__gt": 0}).update(
+            **{field: F(field) - 1, "updated_at": now()}
+        )
+
+    def restore_slot(self, spell_level: int, is_warlock: bool = False) -> int:
+        """Вернуть одну ячейку, не превышая максимум"""
+        if is_warlock:
+            field, limit = "warlock_current_slots", "warlock_max_slots"
+        else:
+            field = f"current_spell_slots_{spell_level}"
+            limit = f"max_spell_slots_{spell_level}"
+        return self.filter(**{f"{field}__lt": F(limit)}).update(
+            **{field: F(field) + 1, "updated_at": now()}
+        )
+
+    def reset_slots(self) -> int:
+        """Восстановить все ячейки (продолжительный отдых)"""
+        values = {
+            f"current_spell_slots_{level}": F(f"max_spell_slots_{level}")
+            for level in SLOT_LEVELS
+        }
+        values["warlock_current_slots"] = F("warlock_max_slots")
+        return self.update(**values, updated_at=now())
+
+
+class Spellbook(TrackedModel):
     """
     Спеллбук - один из наборов заклинаний персонажа
     (у одного персонажа может быть несколько спеллбуков,
     у одного игрока - несколько персонажей)
     """
 
+    version_field = "version"
+
     id = models.AutoField(primary_key=True, verbose_name="id")
     name = models.CharField(max_length=100, verbose_name="Название")
     description = models.TextField(blank=True, verbose_name="Описание")
@@ -57,12 +118,36 @@ class Spellbook(models.Model):
     created_at = models.DateTimeField(default=now, verbose_name="Создано")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
     last_used = models.DateTimeField(null=True, blank=True, verbose_name="Последний заход")
+    events_compacted_to = models.BigIntegerField(
+        default=0, editable=False, verbose_name="Последнее свернутое событие сессии"
+    )
+    version = models.PositiveIntegerField(
+        default=1, editable=False, verbose_name="Версия (для оптимистичной блокировки)"
+    )
+
+    objects = SpellbookQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.name} ({self.owner.name})"
 
+    def _record_event(self, name, *args):
+        """Записать действие в журнал сессии (режим SPELLS_EVENT_SOURCING)"""
+        from spells.services import events
+
+        # проверка по состоянию экземпляра, как и без журнала; событие, которое
+        # окажется неприменимым к фактическому состоянию, свертка пропустит
+        state = {field: getattr(self, field) for field in events.SPELLBOOK_STATE_FIELDS}
+        if getattr(events, name)(self.id, *args, state=state) is None:
+            return False
+        for field in events.SPELLBOOK_COUNTER_FIELDS:
+            setattr(self, field, state[field])
+        return True
+
     def reset_all_spell_slots(self):
         """Восстановить все ячейки"""
+        if getattr(settings, "SPELLS_EVENT_SOURCING", False):
+            self._record_event("long_rest")
+            return
         self.current_spell_slots_1 = self.max_spell_slots_1
         self.current_spell_slots_2 = self.max_spell_slots_2
         self.current_spell_slots_3 = self.max_spell_slots_3
@@ -77,6 +162,9 @@ class Spellbook(models.Model):
 
     def use_spell_slot(self, spell_level, is_warlock=False):
         """Использовать ячейку заклинания"""
+        if getattr(settings, "SPELLS_EVENT_SOURCING", False):
+            return self._record_event("use_slot", spell_level, is_warlock)
+
         if is_warlock and self.warlock_current_slots > 0:
             self.warlock_current_slots -= 1
             self.save()
@@ -99,3 +187,19 @@ class Spellbook(models.Model):
         verbose_name = "Спеллбук"
         verbose_name_plural = "Спеллбуки"
         ordering = ["-updated_at"]
+        # см. индексы Person
+        indexes = [
+            models.Index(
+                fields=["owner", "-updated_at"], name="spellbook_owner_order_idx"
+            ),
+            models.Index(
+                fields=["owner", "-updated_at"],
+                condition=models.Q(is_active=True),
+                name="spellbook_owner_active_idx",
+            ),
+            models.Index(
+                fields=["-updated_at"],
+                condition=models.Q(is_shared=True),
+                name="spellbook_shared_order_idx",
+            ),
+        ]
@@ -3,12 +3,32 @@ from django.utils.timezone import now
 
 from spells.models.characters import CharacterClass, Subclass
 from spells.models.enums import Characters, EffectCategory, SpellLevels
+from spells.models.querysets import SummaryQuerySet
+from spells.models.tracking import TrackedModel, TrackedQuerySet
 from spells.models.users import Player
+from spells.services.dice import validate_dice_expression
 
 
-class MaterialComponent(models.Model):
+class MaterialComponentQuerySet(SummaryQuerySet, TrackedQuerySet):
+    heavy_fields = ("description",)
+    preview_field = "description"
+
+
+class EffectQuerySet(SummaryQuerySet):
+    heavy_fields = ("description",)
+    preview_field = "description"
+
+
+class SpellQuerySet(SummaryQuerySet):
+    heavy_fields = ("description", "higher_level")
+    preview_field = "description"
+
+
+class MaterialComponent(TrackedModel):
     "Материальный компонент"
 
+    version_field = "version"
+
     id = models.AutoField(primary_key=True, verbose_name="id")
     name = models.TextField(max_length=49, verbose_name="Название")
     description = models.TextField(blank=True, null=True, verbose_name="Описание компонента")
@@ -22,18 +42,31 @@ class MaterialComponent(models.Model):
     is_focus = models.BooleanField(
         default=False, help_text="Является ли фокусировкой для заклинания", verbose_name="Фокус"
     )
+    version = models.PositiveIntegerField(
+        default=1, editable=False, verbose_name="Версия (для оптимистичной блокировки)"
+    )
+
+    objects = MaterialComponentQuerySet.as_manager()
 
     def truncate_description(self, description: str = "", max_length: int = 20) -> str:
         if not description:
-            description = self.description
+            description = self.description or ""
 
         if len(description) > max_length:
             return description[:max_length] + "..."
         return description
 
+    @property
+    def short_description(self) -> str:
+        """Краткое описание (из SQL-аннотации summary(), если она есть)"""
+        preview = self.__dict__.get("description_preview")
+        if preview is not None:
+            return preview
+        return self.truncate_description()
+
     def __str__(self):
         cost_str = f"| ({self.cost} зм) " if self.cost else ""
-        description_str = self.truncate_description()
+        description_str = self.short_description
         return f"{self.name} {cost_str}({description_str})"
 
     class Meta:
@@ -111,6 +144,8 @@ class Effect(models.Model):
         verbose_name="Тип урона"
     )
 
+    objects = EffectQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -119,7 +154,7 @@ class Effect(models.Model):
         verbose_name_plural = "Эффекты заклинаний"
 
 
-class Spell(models.Model):
+class Spell(TrackedModel):
     """Заклинание"""
 
     class AttackType(models.TextChoices):
@@ -171,6 +206,20 @@ class Spell(models.Model):
         help_text="Характеристика для спасброска (если требуется)", 
         verbose_name="Характеристика для спасброска"
     )
+    damage_dice = models.CharField(
+        max_length=50,
+        blank=True,
+        validators=[validate_dice_expression],
+        help_text="Кости урона или лечения при накладывании, например 8d6 или 1d10+4",
+        verbose_name="Кости урона",
+    )
+    higher_level_dice = models.CharField(
+        max_length=50,
+        blank=True,
+        validators=[validate_dice_expression],
+        help_text="Дополнительные кости за каждый уровень ячейки выше базового",
+        verbose_name="Кости за уровень ячейки",
+    )
 
     # Эффекты
     effects = models.ManyToManyField(Effect, related_name="spells", blank=True, verbose_name="Эффект заклинания")
@@ -201,6 +250,8 @@ class Spell(models.Model):
     created_at = models.DateTimeField(default=now, verbose_name="Создано")
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SpellQuerySet.as_manager()
+
     def __str__(self):
         level_str = "Заговор" if self.level == 0 else f"{self.level} уровень"
         return f"{self.name} ({level_str}, {self.school.name})"
@@ -0,0 +1,85 @@
+import uuid
+
+from django.db import models
+from django.utils.timezone import now
+
+from spells.models.users import Player
+
+
+class Tombstone(models.Model):
+    """Запись об удалении объекта для синхронизации клиентов"""
+
+    class Kind(models.TextChoices):
+        PERSON = "person", "Персонаж"
+        SPELLBOOK = "spellbook", "Спеллбук"
+        SPELL = "spell", "Заклинание"
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=Kind.choices, verbose_name="Тип")
+    object_id = models.IntegerField(verbose_name="id удаленного объекта")
+    player = models.ForeignKey(
+        Player,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="Чьи данные удалены (пусто - общий справочник)",
+        verbose_name="Игрок",
+    )
+    deleted_at = models.DateTimeField(default=now, verbose_name="Удалено")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id}"
+
+    class Meta:
+        verbose_name = "Удаленный объект"
+        verbose_name_plural = "Удаленные объекты"
+        indexes = [
+            models.Index(fields=["player", "deleted_at"]),
+            models.Index(fields=["deleted_at"]),
+        ]
+
+
+class SpellbookSpellChange(models.Model):
+    """Добавление или удаление заклинания в спеллбуке (журнал связи M2M)"""
+
+    class Action(models.TextChoices):
+        ADD = "add", "Добавлено"
+        REMOVE = "remove", "Удалено"
+
+    id = models.BigAutoField(primary_key=True)
+    # без внешних ключей: записи должны пережить удаление спеллбука и заклинания
+    spellbook_id = models.IntegerField(verbose_name="id спеллбука")
+    spell_id = models.IntegerField(verbose_name="id заклинания")
+    action = models.CharField(
+        max_length=6, choices=Action.choices, verbose_name="Действие"
+    )
+    changed_at = models.DateTimeField(default=now, verbose_name="Изменено")
+
+    def __str__(self):
+        return f"{self.spellbook_id} {self.action} {self.spell_id}"
+
+    class Meta:
+        verbose_name = "Изменение заклинаний спеллбука"
+        verbose_name_plural = "Изменения заклинаний спеллбуков"
+        indexes = [
+            models.Index(fields=["spellbook_id", "changed_at"]),
+        ]
+
+
+class AppliedOperation(models.Model):
+    """Операция клиента, уже примененная на сервере (для идемпотентности)"""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, verbose_name="id")
+    player = models.ForeignKey(
+        Player, on_delete=models.CASCADE, related_name="+", verbose_name="Игрок"
+    )
+    kind = models.CharField(max_length=20, verbose_name="Тип операции")
+    applied_at = models.DateTimeField(default=now, verbose_name="Применено")
+
+    def __str__(self):
+        return f"{self.kind} ({self.id})"
+
+    class Meta:
+        verbose_name = "Примененная операция"
+        verbose_name_plural = "Примененные операции"
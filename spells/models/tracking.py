@@ -0,0 +1,188 @@
+"""Отслеживание измененных полей модели.
+
+Значения полей запоминаются при загрузке из базы (``from_db``), и
+``save()`` без ``update_fields`` пишет только изменившиеся колонки, а без
+изменений не обращается к базе вовсе.
+
+У модели с ``version_field`` любое изменение строки увеличивает версию:
+и ``save()``, и ``update()``/``bulk_update()`` через ``TrackedQuerySet``.
+Проверка версии (оптимистичная блокировка) включается только явно,
+вызовом ``expect_version()`` перед ``save()``: тогда UPDATE выполняется
+с условием на версию, и если строку уже изменил другой запрос,
+выбрасывается ``VersionConflict``. Внутренние сохранения версию не проверяют.
+"""
+
+import copy
+
+from django.db import models, router, transaction
+from django.db.models import F
+
+
+class VersionConflict(Exception):
+    """Объект изменен другим запросом после загрузки"""
+
+
+class TrackedQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """UPDATE, увеличивающий версию строк у моделей с ``version_field``"""
+        name = self.model.version_field
+        if name is not None and name not in kwargs:
+            kwargs[name] = F(name) + 1
+        return super().update(**kwargs)
+
+
+class TrackedModel(models.Model):
+    # Целочисленное поле версии строки (None - без версии)
+    version_field: str | None = None
+
+    objects = TrackedQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded()
+        return instance
+
+    def _tracked_fields(self):
+        pk = self._meta.pk
+        return [field for field in self._meta.concrete_fields if field is not pk]
+
+    def _remember_loaded(self, names=None):
+        """Запомнить текущие значения загруженных полей (или только ``names``)"""
+        loaded = self.__dict__.setdefault("_loaded_values", {})
+        for field in self._tracked_fields():
+            if names is not None and not {field.name, field.attname} & set(names):
+                continue
+            if field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                # JSON-поля изменяются на месте - храним копию
+                if isinstance(field, models.JSONField):
+                    value = copy.deepcopy(value)
+                loaded[field.attname] = value
+
+    def _original_value(self, field):
+        loaded = self.__dict__.get("_loaded_values")
+        if loaded is None:
+            # новый объект сравнивается со значениями по умолчанию
+            return field.get_default()
+        return loaded.get(field.attname)
+
+    def _is_changed(self, field) -> bool:
+        if field.attname not in self.__dict__:
+            # отложенное поле, которое не загружали и не меняли
+            return False
+        current = self.__dict__[field.attname]
+        if getattr(current, "_committed", True) is False:
+            # новый, еще не сохраненный файл
+            return True
+        loaded = self.__dict__.get("_loaded_values")
+        if loaded is not None and field.attname not in loaded:
+            # отложенное поле, которому присвоили значение
+            return True
+        return current != self._original_value(field)
+
+    def get_changed_fields(self) -> list[str]:
+        """Имена полей, изменившихся с момента загрузки или сохранения"""
+        return [
+            field.name
+            for field in self._tracked_fields()
+            if field.name != self.version_field and self._is_changed(field)
+        ]
+
+    def original_value(self, name: str):
+        """Значение поля на момент загрузки или последнего сохранения"""
+        return self._original_value(self._meta.get_field(name))
+
+    def has_changed(self, *names: str) -> bool:
+        """Изменилось ли хотя бы одно из полей ``names``"""
+        return any(self._is_changed(self._meta.get_field(name)) for name in names)
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._remember_loaded(fields)
+
+    def expect_version(self, version: int) -> None:
+        """
+        Проверить при следующем ``save()``, что в базе версия ``version``
+        (например, присланная клиентом), иначе ``VersionConflict``
+        """
+        self.__dict__["_expected_version"] = version
+
+    def save(self, *args, **kwargs):
+        if args or self._state.adding or kwargs.get("force_insert"):
+            super().save(*args, **kwargs)
+            self._remember_loaded()
+            return
+
+        update_fields = kwargs.pop("update_fields", None)
+        if update_fields is None and "_loaded_values" in self.__dict__:
+            update_fields = self.get_changed_fields()
+            if not update_fields:
+                self._check_unchanged_version()
+                return
+            update_fields += [
+                field.name
+                for field in self._tracked_fields()
+                if getattr(field, "auto_now", False) and field.name not in update_fields
+            ]
+        if update_fields is not None:
+            update_fields = [
+                name for name in update_fields if name != self.version_field
+            ]
+
+        try:
+            if "_expected_version" in self.__dict__:
+                # конфликт не должен ломать внешнюю транзакцию - своя точка отката
+                using = kwargs.get("using") or router.db_for_write(
+                    type(self), instance=self
+                )
+                with transaction.atomic(using=using):
+                    super().save(update_fields=update_fields, **kwargs)
+            else:
+                super().save(update_fields=update_fields, **kwargs)
+        finally:
+            expected = self.__dict__.pop("_expected_version", None)
+        self._remember_loaded(update_fields)
+        name = self.version_field
+        if name is not None:
+            if expected is not None:
+                setattr(self, name, expected + 1)
+                self._remember_loaded([name])
+            else:
+                # версию увеличил UPDATE - перечитается при обращении
+                self.__dict__.pop(name, None)
+
+    def _conflict(self, expected) -> VersionConflict:
+        return VersionConflict(
+            f"{self._meta.verbose_name} {self.pk}: версия {expected} устарела"
+        )
+
+    def _check_unchanged_version(self) -> None:
+        """Без изменений UPDATE не нужен, но устаревшая версия - все равно конфликт"""
+        expected = self.__dict__.pop("_expected_version", None)
+        if expected is not None and expected != getattr(self, self.version_field):
+            raise self._conflict(expected)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # версия увеличивается тем же UPDATE, что пишет поля; при проверке
+        # версии условие на нее входит в WHERE
+        name = self.version_field
+        if name is None or not values:
+            return super()._do_update(
+                base_qs, using, pk_val, values, update_fields, forced_update
+            )
+        field = self._meta.get_field(name)
+        values = [value for value in values if value[0] is not field]
+        values.append((field, None, F(name) + 1))
+        expected = self.__dict__.get("_expected_version")
+        if expected is not None:
+            base_qs = base_qs.filter(**{name: expected})
+        updated = super()._do_update(
+            base_qs, using, pk_val, values, update_fields, forced_update
+        )
+        if not updated and expected is not None:
+            raise self._conflict(expected)
+        return updated
+
+    class Meta:
+        abstract = True
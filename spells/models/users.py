@@ -1,8 +1,26 @@
 from django.db import models
+from django.db.models import Count, Q
 from django.utils.timezone import now
 
+from spells.models.querysets import SummaryQuerySet
+from spells.models.tracking import TrackedModel
 
-class Player(models.Model):
+
+class PlayerQuerySet(SummaryQuerySet):
+    heavy_fields = ("bio",)
+    preview_field = "bio"
+
+    def with_character_counts(self):
+        """Кол-во всех и активных персонажей одним запросом"""
+        return self.annotate(
+            characters_total=Count("characters", distinct=True),
+            characters_active=Count(
+                "characters", filter=Q(characters__is_active=True), distinct=True
+            ),
+        )
+
+
+class Player(TrackedModel):
     """Игрок (пользователь системы)"""
 
     id = models.AutoField(primary_key=True, verbose_name="id")
@@ -24,14 +42,29 @@ class Player(models.Model):
     )
     telegram_id = models.CharField(max_length=100, blank=True, verbose_name="Телеграмм id")
     avatar = models.ImageField(upload_to="player_avatars/", null=True, verbose_name="Аватар")
+    avatar_hash = models.CharField(
+        max_length=64, blank=True, editable=False, verbose_name="Хэш аватара (sha256)"
+    )
+    avatar_thumbnails = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Миниатюры аватара: {размер: {формат: путь}}",
+        verbose_name="Миниатюры аватара",
+    )
     created_at = models.DateTimeField(default=now, verbose_name="Зарегистрировался")
     last_login = models.DateTimeField(default=now, verbose_name="Последний вход")
 
+    objects = PlayerQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.nickname or self.user.username}"
 
     @property
     def total_characters(self):
+        # посчитано заранее через PlayerQuerySet.with_character_counts()
+        if "characters_total" in self.__dict__:
+            return self.characters_total
         return self.characters.count()
 
     @property
@@ -0,0 +1,159 @@
+"""Двоичный формат ответов и запросов API - MessagePack.
+
+Выбирается заголовком ``Accept: application/msgpack`` (или ``?format=msgpack``),
+тело запроса - ``Content-Type: application/msgpack``. Даты со временем
+кодируются родным типом Timestamp, ``Decimal`` - строкой, как в JSON.
+
+Список словарей с одинаковыми ключами можно передать по столбцам
+(``Accept: application/msgpack; layout=columns`` или ``?layout=columns``):
+ключи один раз, значения - массивами. Такой список кодируется
+расширением ``COLUMNS_EXT_TYPE`` с содержимым ``[ключи, столбец1, ...]``,
+парсер разворачивает его обратно в список словарей.
+"""
+
+import datetime
+import decimal
+import uuid
+from itertools import repeat
+from operator import eq, itemgetter
+
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+COLUMNS_EXT_TYPE = 1
+COLUMNS_LAYOUT = "columns"
+# Меньшие списки по столбцам не короче
+MIN_COLUMN_ROWS = 2
+_CONTAINERS = (dict, list, tuple)
+
+
+class Columns:
+    """Список словарей с одинаковыми ключами, разложенный по столбцам"""
+
+    __slots__ = ("keys", "columns")
+
+    def __init__(self, rows: list[dict]):
+        self.keys = list(rows[0])
+        self.columns = [_nested(list(map(itemgetter(key), rows))) for key in self.keys]
+
+    @staticmethod
+    def rows(keys: list, columns: list[list]) -> list[dict]:
+        return [
+            dict(zip(keys, values, strict=True))
+            for values in zip(*columns, strict=True)
+        ]
+
+
+def _nested(values: list) -> list:
+    # проверки через map() идут без цикла на Python по скалярным значениям
+    if any(map(isinstance, values, repeat(_CONTAINERS))):
+        return [to_columns(value) for value in values]
+    return values
+
+
+def to_columns(data):
+    """Заменить списки однородных словарей (на любой глубине) на ``Columns``"""
+    if isinstance(data, dict):
+        return {key: to_columns(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        # списки однородны: список скаляров (по первому элементу) не просматривается
+        if not data or not isinstance(data[0], _CONTAINERS):
+            return data
+        if len(data) >= MIN_COLUMN_ROWS and all(map(isinstance, data, repeat(dict))):
+            keys = data[0].keys()
+            if all(map(eq, map(dict.keys, data), repeat(keys))):
+                return Columns(data)
+        return _nested(list(data))
+    return data
+
+
+def _default(value):
+    import msgpack
+
+    if isinstance(value, Columns):
+        payload = msgpack.packb(
+            [value.keys, *value.columns], default=_default, datetime=True
+        )
+        return msgpack.ExtType(COLUMNS_EXT_TYPE, payload)
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        # datetime без часового пояса Timestamp не кодирует
+        return value.isoformat()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Тип {type(value).__name__} не кодируется в MessagePack")
+
+
+def _ext_hook(code: int, payload: bytes):
+    import msgpack
+
+    if code == COLUMNS_EXT_TYPE:
+        keys, *columns = unpackb(payload)
+        return Columns.rows(keys, columns)
+    return msgpack.ExtType(code, payload)
+
+
+def packb(data, columns: bool = False) -> bytes:
+    import msgpack
+
+    if columns:
+        data = to_columns(data)
+    return msgpack.packb(data, default=_default, datetime=True)
+
+
+def unpackb(payload: bytes):
+    import msgpack
+
+    return msgpack.unpackb(
+        payload, ext_hook=_ext_hook, timestamp=3, strict_map_key=False
+    )
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MSGPACK_MEDIA_TYPE
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        response = renderer_context.get("response")
+        if response is not None:
+            patch_vary_headers(response, ("Accept",))
+        if data is None:
+            return b""
+        return packb(data, columns=self._columns(accepted_media_type, renderer_context))
+
+    def _columns(self, accepted_media_type, renderer_context) -> bool:
+        """Запрошена ли раскладка по столбцам"""
+        params = (accepted_media_type or "").split(";")[1:]
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "layout":
+                return value.strip() == COLUMNS_LAYOUT
+        request = renderer_context.get("request")
+        if request is None:
+            return False
+        return request.query_params.get("layout") == COLUMNS_LAYOUT
+
+
+class MessagePackParser(BaseParser):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if stream is None:
+            return {}
+        try:
+            return unpackb(stream.read())
+        except (ValueError, TypeError) as error:
+            raise ParseError("Некорректный MessagePack") from error
@@ -0,0 +1,96 @@
+"""Маршрутизация запросов приложения spells между основной БД и репликами.
+
+Чтение уходит на одну из реплик ``SPELLS_DB_REPLICAS``, запись - в ``default``.
+Чтобы клиент сразу видел свои изменения, чтение переключается на основную БД:
+
+* внутри транзакции основной БД;
+* до конца запроса после первой записи (INSERT, UPDATE, DELETE в основную
+  БД внутри ``track_writes()``; чтение с блокировкой или внутри
+  ``get_or_create`` записью не считается);
+* в течение ``SPELLS_REPLICA_LAG`` секунд после записи - по cookie,
+  которую ставит ``PrimaryAfterWriteMiddleware``;
+* внутри ``use_primary()``.
+
+Без настроенных реплик все запросы идут в ``default``.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+APP_LABEL = "spells"
+
+# Чтение закреплено за основной БД
+_pinned: ContextVar[bool] = ContextVar("spells_db_pinned", default=False)
+# Была запись в основную БД в текущем контексте
+_wrote: ContextVar[bool] = ContextVar("spells_db_wrote", default=False)
+
+# Запросы, которые меняют данные (SELECT ... FOR UPDATE к ним не относится)
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def get_replicas() -> list[str]:
+    return list(getattr(settings, "SPELLS_DB_REPLICAS", ()))
+
+
+@contextmanager
+def use_primary():
+    """Читать из основной БД внутри блока"""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def _note_write(execute, sql, params, many, context):
+    if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+        _wrote.set(True)
+    return execute(sql, params, many, context)
+
+
+@contextmanager
+def track_writes():
+    """Отмечать запись в основную БД внутри блока: дальше чтение идет из нее"""
+    with connections[DEFAULT_DB_ALIAS].execute_wrapper(_note_write):
+        yield
+
+
+def reads_primary() -> bool:
+    """Идет ли чтение в текущем контексте из основной БД"""
+    return bool(
+        not get_replicas()
+        or _pinned.get()
+        or _wrote.get()
+        or connections[DEFAULT_DB_ALIAS].in_atomic_block
+    )
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != APP_LABEL:
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if reads_primary():
+            return DEFAULT_DB_ALIAS
+        return random.choice(get_replicas())
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != APP_LABEL:
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики содержат те же данные, что и основная БД
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
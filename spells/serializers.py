@@ -0,0 +1,54 @@
+from rest_framework import exceptions, serializers, status
+
+from spells.models.tracking import VersionConflict
+
+
+class RepresentationSerializerMixin:
+    """
+    Краткое (summary) или полное (full) представление модели.
+    Поля краткого представления задаются в ``Meta.summary_fields``
+    """
+
+    SUMMARY = "summary"
+    FULL = "full"
+    REPRESENTATIONS = (SUMMARY, FULL)
+
+    def __init__(self, *args, representation: str = FULL, **kwargs):
+        if representation not in self.REPRESENTATIONS:
+            raise serializers.ValidationError(
+                {"view": f"Допустимые значения: {', '.join(self.REPRESENTATIONS)}"}
+            )
+        self.representation = representation
+        super().__init__(*args, **kwargs)
+
+    def get_field_names(self, declared_fields, info):
+        if self.representation == self.SUMMARY:
+            return list(self.Meta.summary_fields)
+        return super().get_field_names(declared_fields, info)
+
+
+class Conflict(exceptions.APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Объект уже изменен другим запросом, загрузите его заново"
+    default_code = "conflict"
+
+
+class VersionedSerializerMixin:
+    """
+    Оптимистичная блокировка для моделей с ``version_field``:
+    версия, присланная клиентом в поле ``version``, должна совпадать
+    с версией в базе, иначе ответ 409 Conflict
+    """
+
+    def create(self, validated_data):
+        validated_data.pop("version", None)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        version = validated_data.pop("version", None)
+        if version is not None:
+            instance.expect_version(version)
+        try:
+            return super().update(instance, validated_data)
+        except VersionConflict as error:
+            raise Conflict(str(error)) from error
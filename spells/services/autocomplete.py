@@ -0,0 +1,281 @@
+"""Автодополнение названий заклинаний и материальных компонентов с опечатками.
+
+Название разбивается на триграммы слов (как в pg_trgm: слово дополняется
+двумя пробелами в начале и одним в конце), индекс хранит для каждой
+триграммы список позиций названий. Запрос считает общие триграммы
+только по спискам своих триграмм, поэтому не зависит от размера
+справочника так, как ``icontains``; опечатка портит лишь 1-3 триграммы.
+
+Оценка - покрытие запроса триграммами названия, коэффициент Жаккара,
+бонус за совпадение начала и популярность (в скольких спеллбуках
+встречается заклинание, во скольких заклинаниях - компонент).
+
+Индекс строится в памяти процесса и после публикации не меняется: поиск
+читает его без блокировок. Сохранение названия в этом процессе строит
+копию индекса с исправлением (копируются только затронутые списки
+триграмм) и подменяет ее целиком, а остальные процессы перестраивают
+индекс при смене поколения названий и не реже раза в
+``SPELLS_AUTOCOMPLETE_TTL`` с (популярность меняется постоянно
+и без смены поколения не учитывается).
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from itertools import compress, repeat
+from operator import eq, gt
+
+from django.conf import settings
+from django.db.models import Count
+
+from spells.models import MaterialComponent, Spell
+from spells.services.coalescing import coalesce
+from spells.services.generations import bump_generation, get_generation
+
+SPELL = "spell"
+COMPONENT = "component"
+KINDS = (SPELL, COMPONENT)
+
+# Минимальная доля триграмм запроса, которая должна найтись в названии
+MIN_COVERAGE = 0.3
+# Сколько лучших по числу общих триграмм названий оценивать полностью
+POOL_SIZE = 100
+# Сколько позиций из списков триграмм просматривать на запрос
+MAX_POSTINGS = 10000
+# Веса слагаемых оценки
+COVERAGE_WEIGHT = 0.6
+JACCARD_WEIGHT = 0.25
+PREFIX_BONUS = 0.15
+POPULARITY_WEIGHT = 0.15
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(WORD_PATTERN.findall(text.lower().replace("ё", "е")))
+
+
+def trigrams(text: str) -> set[str]:
+    """Триграммы слов нормализованного текста"""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+@dataclass
+class NameIndex:
+    """Инвертированный индекс триграмм названий одного вида"""
+
+    kind: str
+    generation: int = 0
+    built_at: float = field(default_factory=time.monotonic)
+    ids: list[int | None] = field(default_factory=list)
+    names: list[str] = field(default_factory=list)
+    normalized: list[str] = field(default_factory=list)
+    sizes: list[int] = field(default_factory=list)
+    popularity: list[float] = field(default_factory=list)
+    postings: dict[str, list[int]] = field(default_factory=lambda: defaultdict(list))
+    positions: dict[int, int] = field(default_factory=dict)
+
+    def add(self, object_id: int, name: str, popularity: float = 0.0) -> None:
+        self.remove(object_id)
+        position = len(self.ids)
+        grams = trigrams(name)
+        self.ids.append(object_id)
+        self.names.append(name)
+        self.normalized.append(normalize(name))
+        self.sizes.append(len(grams))
+        self.popularity.append(popularity)
+        self.positions[object_id] = position
+        for gram in grams:
+            self.postings[gram].append(position)
+
+    def replaced(
+        self, object_id: int, name: str | None, generation: int
+    ) -> "NameIndex":
+        """
+        Копия индекса с новым названием объекта (None - без объекта).
+        Сам индекс не меняется: его могут одновременно читать другие потоки
+        """
+        index = NameIndex(
+            kind=self.kind,
+            generation=generation,
+            built_at=self.built_at,
+            ids=list(self.ids),
+            names=list(self.names),
+            normalized=list(self.normalized),
+            sizes=list(self.sizes),
+            popularity=list(self.popularity),
+            postings=defaultdict(list, self.postings),
+            positions=dict(self.positions),
+        )
+        popularity = index.remove(object_id)
+        if name is not None:
+            # списки триграмм общие с исходным индексом - дописываются копии
+            for gram in trigrams(name):
+                index.postings[gram] = list(self.postings.get(gram, ()))
+            index.add(object_id, name, popularity)
+        return index
+
+    def remove(self, object_id: int) -> float:
+        """Убрать название (позиция остается пустой), вернуть его популярность"""
+        position = self.positions.pop(object_id, None)
+        if position is None:
+            return 0.0
+        self.ids[position] = None
+        return self.popularity[position]
+
+    def candidates(self, grams: set[str]) -> list[int]:
+        """
+        Позиции с наибольшим числом общих триграмм (не больше ``POOL_SIZE``).
+        Считаются только самые редкие триграммы запроса в пределах
+        ``MAX_POSTINGS`` позиций: частые почти ничего не различают,
+        а на длинных списках счет занимает основное время
+        """
+        shared = Counter()
+        budget = MAX_POSTINGS
+        for postings in sorted(
+            (self.postings.get(gram, ()) for gram in grams), key=len
+        ):
+            if shared and len(postings) > budget:
+                break
+            shared.update(postings)
+            budget -= len(postings)
+        if len(shared) <= POOL_SIZE:
+            return list(shared)
+
+        # порог - наименьшее число общих триграмм, при котором набирается пул
+        threshold, pool_size = 0, 0
+        for count, positions in sorted(Counter(shared.values()).items(), reverse=True):
+            threshold, pool_size = count, pool_size + positions
+            if pool_size >= POOL_SIZE:
+                break
+        pool = list(compress(shared, map(gt, shared.values(), repeat(threshold))))
+        # при равенстве - меньшие позиции, то есть популярные названия
+        ties = compress(shared, map(eq, shared.values(), repeat(threshold)))
+        pool.extend(heapq.nsmallest(POOL_SIZE - len(pool), ties))
+        return pool
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """Названия по убыванию оценки"""
+        grams = trigrams(query)
+        if not grams:
+            return []
+        minimum = max(1, math.ceil(len(grams) * MIN_COVERAGE))
+        prefix = normalize(query)
+        scored = []
+        for position in self.candidates(grams):
+            if self.ids[position] is None:
+                continue
+            count = len(grams & trigrams(self.normalized[position]))
+            if count < minimum:
+                continue
+            score = (
+                COVERAGE_WEIGHT * count / len(grams)
+                + JACCARD_WEIGHT * count / (len(grams) + self.sizes[position] - count)
+                + POPULARITY_WEIGHT * self.popularity[position]
+            )
+            if self.normalized[position].startswith(prefix):
+                score += PREFIX_BONUS
+            scored.append((score, position))
+
+        return [
+            {
+                "id": self.ids[position],
+                "name": self.names[position],
+                "kind": self.kind,
+                "score": round(score, 4),
+            }
+            for score, position in heapq.nlargest(limit, scored)
+        ]
+
+
+def _popularity(counts: dict[int, int]) -> dict[int, float]:
+    """Популярность в [0, 1] по логарифмической шкале"""
+    top = max(counts.values(), default=0)
+    if not top:
+        return {}
+    scale = math.log1p(top)
+    return {key: math.log1p(value) / scale for key, value in counts.items()}
+
+
+def _rows(kind: str):
+    if kind == SPELL:
+        return Spell.objects.annotate(uses=Count("spellbooks")).values_list(
+            "id", "name", "uses"
+        )
+    return MaterialComponent.objects.annotate(uses=Count("spell")).values_list(
+        "id", "name", "uses"
+    )
+
+
+def build_index(kind: str, generation: int = 0) -> NameIndex:
+    """Построить индекс названий из базы"""
+    # популярные названия получают меньшие позиции (см. NameIndex.candidates)
+    rows = list(_rows(kind).order_by("-uses", "id").iterator())
+    popularity = _popularity({object_id: uses for object_id, _, uses in rows})
+    index = NameIndex(kind=kind, generation=generation)
+    for object_id, name, _ in rows:
+        index.add(object_id, name, popularity.get(object_id, 0.0))
+    return index
+
+
+_indexes: dict[str, NameIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _scope(kind: str) -> str:
+    return f"autocomplete_{kind}"
+
+
+def _is_fresh(index: NameIndex | None, generation: int) -> bool:
+    if index is None or index.generation != generation:
+        return False
+    ttl = getattr(settings, "SPELLS_AUTOCOMPLETE_TTL", 600)
+    return time.monotonic() - index.built_at < ttl
+
+
+def get_index(kind: str) -> NameIndex:
+    """Индекс процесса, перестроенный при смене поколения или по времени"""
+    generation = get_generation(_scope(kind))
+    index = _indexes.get(kind)
+    if _is_fresh(index, generation):
+        return index
+
+    def rebuild():
+        index = build_index(kind, generation)
+        with _indexes_lock:
+            _indexes[kind] = index
+        return index
+
+    return coalesce(f"spells:autocomplete:{kind}:{generation}", rebuild)
+
+
+def suggest(query: str, kind: str | None = None, limit: int = 10) -> list[dict]:
+    """Подсказки по началу названия (с опечатками) для одного или всех видов"""
+    kinds = KINDS if kind is None else (kind,)
+    found = []
+    for name in kinds:
+        found.extend(get_index(name).search(query, limit))
+    found.sort(key=lambda item: -item["score"])
+    return found[:limit]
+
+
+def name_changed(kind: str, object_id: int, name: str | None) -> None:
+    """
+    Название сохранено (None - объект удален): подменить индекс процесса
+    исправленной копией и сменить поколение, чтобы остальные процессы
+    перестроили свои
+    """
+    generation = bump_generation(_scope(kind))
+    with _indexes_lock:
+        index = _indexes.get(kind)
+        # индекс видел все прошлые изменения - достаточно исправленной копии
+        if index is not None and index.generation == generation - 1:
+            _indexes[kind] = index.replaced(object_id, name, generation)
@@ -0,0 +1,146 @@
+"""Обработка аватаров игроков.
+
+Загрузка аватара только сохраняет исходный файл; миниатюры строятся
+после коммита в пуле фоновых потоков (замена очереди задач):
+
+* изображение поворачивается по EXIF и обрезается в квадрат;
+* для каждого размера сохраняются WebP и JPEG без метаданных;
+* имя файла содержит хэш содержимого, поэтому файлы неизменяемы
+  и могут отдаваться с бессрочным кэшированием.
+
+Pillow импортируется только при обработке: модуль подключается сигналами
+в каждом процессе, а миниатюры строятся только в фоновом пуле.
+"""
+
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from spells.models import Player
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = (64, 128, 256)
+THUMBNAIL_DIR = "player_avatars/thumbs"
+
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 6},
+    "jpeg": {"format": "JPEG", "quality": 85, "optimize": True, "progressive": True},
+}
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "SPELLS_AVATAR_WORKERS", 2),
+            thread_name_prefix="avatars",
+        )
+    return _executor
+
+
+def _flatten(image: "Image.Image") -> "Image.Image":
+    """RGB-копия изображения; прозрачность заливается белым"""
+    from PIL import Image
+
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _save_content_addressed(data: bytes, size: int, extension: str) -> str:
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    name = f"{THUMBNAIL_DIR}/{digest}_{size}.{extension}"
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def render_thumbnails(source) -> dict[str, dict[str, str]]:
+    """Построить и сохранить миниатюры, вернуть {размер: {формат: путь}}"""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as original:
+        image = _flatten(ImageOps.exif_transpose(original))
+
+    thumbnails = {}
+    for size in THUMBNAIL_SIZES:
+        thumbnail = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        variants = {}
+        for extension, options in FORMATS.items():
+            buffer = BytesIO()
+            # exif и icc_profile не передаются - метаданные не попадают в файл
+            thumbnail.save(buffer, **options)
+            variants[extension] = _save_content_addressed(
+                buffer.getvalue(), size, extension
+            )
+        thumbnails[str(size)] = variants
+    return thumbnails
+
+
+def process_avatar(player_id: int) -> None:
+    """Построить миниатюры текущего аватара игрока"""
+    try:
+        player = Player.objects.only("id", "avatar").get(id=player_id)
+        if not player.avatar:
+            Player.objects.filter(id=player_id).update(
+                avatar_hash="", avatar_thumbnails={}
+            )
+            return
+
+        with player.avatar.open("rb") as file:
+            content = file.read()
+        thumbnails = render_thumbnails(BytesIO(content))
+        # update() вместо save(): не вызывает сигналы и не трогает другие поля,
+        # а фильтр по имени файла не даст затереть более новый аватар
+        Player.objects.filter(id=player_id, avatar=player.avatar.name).update(
+            avatar_hash=hashlib.sha256(content).hexdigest(),
+            avatar_thumbnails=thumbnails,
+        )
+    except Exception:
+        logger.exception("Не удалось обработать аватар игрока %s", player_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue_avatar_processing(player_id: int) -> None:
+    """Поставить обработку аватара в фоновый пул после коммита"""
+    transaction.on_commit(lambda: get_executor().submit(process_avatar, player_id))
+
+
+def avatar_urls(player: Player) -> dict[str, dict[str, str]]:
+    """URL миниатюр по размерам"""
+    return {
+        size: {ext: default_storage.url(name) for ext, name in variants.items()}
+        for size, variants in (player.avatar_thumbnails or {}).items()
+    }
+
+
+def avatar_url(player: Player, size: int, extension: str = "webp") -> str | None:
+    """
+    URL наименьшей миниатюры не меньше ``size``;
+    пока миниатюр нет - URL исходного файла
+    """
+    thumbnails = player.avatar_thumbnails or {}
+    sizes = sorted(int(s) for s in thumbnails)
+    if sizes:
+        best = next((s for s in sizes if s >= size), sizes[-1])
+        return default_storage.url(thumbnails[str(best)][extension])
+    if player.avatar:
+        return player.avatar.url
+    return None
@@ -0,0 +1,193 @@
+"""Отрисовка карточек заклинаний и листов для печати (только Pillow).
+
+Модуль не импортирует Django: его функции выполняются в процессах пула
+(``spells.services.cards``), которые запускаются без настройки Django.
+Карточка строится по словарю из ``cards.card_data`` - все, что на ней
+напечатано, есть в словаре.
+
+Карточка 63x88 мм (размер игральной карты) при 300 dpi; лист A4
+вмещает 3x3 карточки с линиями реза.
+"""
+
+from functools import lru_cache
+from io import BytesIO
+
+DPI = 300
+CARD_SIZE = (744, 1039)
+PAGE_SIZE = (2480, 3508)
+CARDS_PER_ROW = 3
+ROWS_PER_PAGE = 3
+
+PADDING = 36
+HEADER_HEIGHT = 150
+FOOTER_HEIGHT = 18
+TITLE_SIZES = (46, 40, 34, 28)
+LABEL_SIZE = 20
+VALUE_SIZE = 25
+# Шрифт описания уменьшается, пока текст не поместится
+BODY_SIZES = (28, 26, 24, 22, 20, 18)
+LINE_SPACING = 1.2
+
+TEXT_COLOR = (30, 30, 30)
+LABEL_COLOR = (110, 110, 110)
+CUT_COLOR = (200, 200, 200)
+DEFAULT_COLOR = "#3498db"
+ELLIPSIS = "…"
+
+
+@lru_cache(maxsize=64)
+def _font(path: str | None, size: int):
+    from PIL import ImageFont
+
+    if path:
+        return ImageFont.truetype(path, size)
+    # встроенный шрифт Pillow без кириллицы - только если шрифт не найден
+    return ImageFont.load_default(size=size)
+
+
+def _color(value: str | None) -> tuple[int, int, int]:
+    from PIL import ImageColor
+
+    try:
+        return ImageColor.getrgb(value or DEFAULT_COLOR)[:3]
+    except ValueError:
+        return ImageColor.getrgb(DEFAULT_COLOR)[:3]
+
+
+def _wrap(text: str, font, width: int) -> list[str]:
+    """Разбить текст на строки не шире ``width`` (по словам, с учетом абзацев)"""
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if line and font.getlength(candidate) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def _line_height(font) -> int:
+    return round(font.size * LINE_SPACING)
+
+
+def _fit_title(draw, text: str, fonts: tuple, width: int):
+    for size in TITLE_SIZES:
+        font = _font(fonts[1], size)
+        if draw.textlength(text, font=font) <= width:
+            return font, text
+    while text and draw.textlength(text + ELLIPSIS, font=font) > width:
+        text = text[:-1]
+    return font, text.rstrip() + ELLIPSIS
+
+
+def _fit_body(paragraphs: list[str], fonts: tuple, width: int, height: int):
+    """Наибольший шрифт, при котором описание помещается; иначе - обрезка"""
+    text = "\n".join(paragraphs)
+    for size in BODY_SIZES:
+        font = _font(fonts[0], size)
+        lines = _wrap(text, font, width)
+        if len(lines) * _line_height(font) <= height:
+            return font, lines
+    visible = lines[: max(1, height // _line_height(font))]
+    visible[-1] = visible[-1].rstrip() + ELLIPSIS
+    return font, visible
+
+
+def render_card(data: dict, fonts: tuple[str | None, str | None]) -> bytes:
+    """PNG карточки; ``fonts`` - пути к обычному и жирному шрифту"""
+    from PIL import Image, ImageDraw
+
+    width, height = CARD_SIZE
+    inner = width - 2 * PADDING
+    color = _color(data["color"])
+    # на темной плашке - белый заголовок
+    luminance = 0.299 * color[0] + 0.587 * color[1] + 0.114 * color[2]
+    title_color = (255, 255, 255) if luminance < 150 else TEXT_COLOR
+
+    image = Image.new("RGB", CARD_SIZE, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, HEADER_HEIGHT), fill=color)
+    draw.rectangle((0, height - FOOTER_HEIGHT, width, height), fill=color)
+
+    title_font, title = _fit_title(draw, data["name"], fonts, inner)
+    draw.text((PADDING, 24), title, font=title_font, fill=title_color)
+    draw.text(
+        (PADDING, HEADER_HEIGHT - 50),
+        data["subtitle"],
+        font=_font(fonts[0], VALUE_SIZE),
+        fill=title_color,
+    )
+
+    # время, дистанция, компоненты, длительность - сеткой 2x2
+    label_font = _font(fonts[0], LABEL_SIZE)
+    value_font = _font(fonts[1], VALUE_SIZE)
+    column = (inner - PADDING) // 2
+    y = HEADER_HEIGHT + 24
+    for row in (data["stats"][:2], data["stats"][2:]):
+        row_height = 0
+        for index, (label, value) in enumerate(row):
+            x = PADDING + index * (column + PADDING)
+            draw.text((x, y), label, font=label_font, fill=LABEL_COLOR)
+            lines = _wrap(value or "-", value_font, column)[:3]
+            for number, line in enumerate(lines):
+                offset = LABEL_SIZE + 8 + number * _line_height(value_font)
+                draw.text((x, y + offset), line, font=value_font, fill=TEXT_COLOR)
+            row_height = max(
+                row_height, LABEL_SIZE + 8 + len(lines) * _line_height(value_font)
+            )
+        y += row_height + 18
+
+    draw.line((PADDING, y, width - PADDING, y), fill=color, width=3)
+    y += 20
+    body_font, lines = _fit_body(
+        data["paragraphs"], fonts, inner, height - FOOTER_HEIGHT - PADDING - y
+    )
+    for line in lines:
+        draw.text((PADDING, y), line, font=body_font, fill=TEXT_COLOR)
+        y += _line_height(body_font)
+
+    buffer = BytesIO()
+    # optimize=True в несколько раз дольше при выигрыше в размере ~10%
+    image.save(buffer, format="PNG", compress_level=3)
+    return buffer.getvalue()
+
+
+def assemble_pdf(cards: list[bytes]) -> bytes:
+    """PDF из готовых карточек: A4, 3x3 на лист, с линиями реза"""
+    from PIL import Image, ImageDraw
+
+    per_page = CARDS_PER_ROW * ROWS_PER_PAGE
+    card_width, card_height = CARD_SIZE
+    left = (PAGE_SIZE[0] - CARDS_PER_ROW * card_width) // 2
+    top = (PAGE_SIZE[1] - ROWS_PER_PAGE * card_height) // 2
+
+    pages = []
+    for start in range(0, max(len(cards), 1), per_page):
+        page = Image.new("RGB", PAGE_SIZE, (255, 255, 255))
+        for index, card in enumerate(cards[start : start + per_page]):
+            row, column = divmod(index, CARDS_PER_ROW)
+            with Image.open(BytesIO(card)) as image:
+                page.paste(image, (left + column * card_width, top + row * card_height))
+        draw = ImageDraw.Draw(page)
+        for column in range(CARDS_PER_ROW + 1):
+            x = left + column * card_width
+            draw.line((x, 0, x, PAGE_SIZE[1]), fill=CUT_COLOR, width=1)
+        for row in range(ROWS_PER_PAGE + 1):
+            y = top + row * card_height
+            draw.line((0, y, PAGE_SIZE[0], y), fill=CUT_COLOR, width=1)
+        pages.append(page)
+
+    buffer = BytesIO()
+    pages[0].save(
+        buffer,
+        format="PDF",
+        save_all=True,
+        append_images=pages[1:],
+        resolution=DPI,
+        quality=80,
+    )
+    return buffer.getvalue()
@@ -0,0 +1,294 @@
+"""Карточки заклинаний для печати и PDF спеллбуков.
+
+Карточка рисуется один раз и хранится в ``default_storage`` под именем
+с хэшем всего, что на ней напечатано (включая ``updated_at``
+заклинания, а также школу, время и компоненты, смена которых
+``updated_at`` не меняет). Поэтому после правки одного заклинания
+спеллбук из 200 карточек перерисовывает только его карточку, а PDF
+собирается из готовых файлов.
+
+Команда ``render_spell_cards`` рисует большие пачки в пуле из
+``SPELLS_CARD_WORKERS`` процессов (рисование упирается в процессор, потоки
+здесь не помогают). Запрос к API пул не запускает: до
+``SPELLS_CARD_REQUEST_MAX`` недостающих карточек рисуются прямо в запросе,
+остальные - одним фоновым потоком процесса, а API отвечает 202.
+Старые варианты карточек удаляет ``render_spell_cards --prune``.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import repeat
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from spells.models import Spell, Spellbook
+from spells.services import card_images
+
+logger = logging.getLogger(__name__)
+
+CARD_DIR = "spell_cards"
+# Меняется вместе с оформлением карточки - старые файлы не подходят
+CARD_LAYOUT_VERSION = 1
+DEFAULT_FONTS = ("DejaVuSans.ttf", "DejaVuSans-Bold.ttf")
+
+_SPELL_FIELDS = (
+    "id",
+    "name",
+    "level",
+    "range",
+    "duration",
+    "concentration",
+    "ritual",
+    "verbal_component",
+    "somatic_component",
+    "description",
+    "higher_level",
+    "updated_at",
+    "school__name",
+    "school__color",
+    "time__time",
+)
+
+
+@dataclass
+class CardSet:
+    """
+    Карточки в порядке печати, сколько из них пришлось нарисовать
+    и сколько еще рисуется в фоне
+    """
+
+    names: list[str]
+    rendered: int
+    pending: int = 0
+
+    @property
+    def etag(self) -> str:
+        digest = hashlib.sha256("\n".join(self.names).encode()).hexdigest()
+        return f'"{digest[:32]}"'
+
+
+@lru_cache(maxsize=8)
+def _font_path(path: str | None) -> str | None:
+    """Путь к шрифту, если Pillow может его открыть (ищет и в системных папках)"""
+    from PIL import ImageFont
+
+    if not path:
+        return None
+    try:
+        ImageFont.truetype(path, 10)
+    except OSError:
+        logger.warning("Шрифт карточек %s не найден, кириллица не отобразится", path)
+        return None
+    return path
+
+
+def card_fonts() -> tuple[str | None, str | None]:
+    regular, bold = getattr(settings, "SPELLS_CARD_FONTS", DEFAULT_FONTS)
+    regular = _font_path(regular)
+    return regular, _font_path(bold) or regular
+
+
+def card_data(spell_ids) -> dict[int, dict]:
+    """Все, что печатается на карточках: {id заклинания: данные} (два запроса)"""
+    rows = list(Spell.objects.filter(id__in=spell_ids).values(*_SPELL_FIELDS))
+    through = Spell.material_components.through
+    materials = {}
+    for spell_id, name in (
+        through.objects.filter(spell_id__in=[row["id"] for row in rows])
+        .order_by("materialcomponent__name")
+        .values_list("spell_id", "materialcomponent__name")
+    ):
+        materials.setdefault(spell_id, []).append(name)
+
+    cards = {}
+    for row in rows:
+        level = "Заговор" if row["level"] == 0 else f"{row['level']} уровень"
+        school = row["school__name"] or ""
+        subtitle = ", ".join(filter(None, (level, school.lower())))
+        if row["ritual"]:
+            subtitle += " (ритуал)"
+        components = [
+            letter
+            for letter, used in (
+                ("В", row["verbal_component"]),
+                ("С", row["somatic_component"]),
+                ("М", row["id"] in materials),
+            )
+            if used
+        ]
+        components = ", ".join(components)
+        if row["id"] in materials:
+            components += f" ({', '.join(materials[row['id']])})"
+        duration = row["duration"]
+        if row["concentration"]:
+            duration = f"Концентрация, {duration}"
+        paragraphs = [row["description"]]
+        if row["higher_level"]:
+            paragraphs.append(f"На более высоких уровнях. {row['higher_level']}")
+
+        cards[row["id"]] = {
+            "name": row["name"],
+            "subtitle": subtitle,
+            "color": row["school__color"],
+            "stats": [
+                ["Время", row["time__time"] or ""],
+                ["Дистанция", row["range"]],
+                ["Компоненты", components],
+                ["Длительность", duration],
+            ],
+            "paragraphs": paragraphs,
+            "updated_at": row["updated_at"].isoformat(),
+        }
+    return cards
+
+
+def card_name(spell_id: int, data: dict, fonts: tuple) -> str:
+    payload = json.dumps(
+        [CARD_LAYOUT_VERSION, fonts, data], ensure_ascii=False, sort_keys=True
+    )
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:32]
+    return f"{CARD_DIR}/{spell_id}/{digest}.png"
+
+
+def _render(items: list[tuple[str, dict]], fonts: tuple, workers: int = 1) -> None:
+    """Нарисовать и сохранить карточки; с ``workers`` > 1 - в пуле процессов"""
+    pool_min = getattr(settings, "SPELLS_CARD_POOL_MIN", 16)
+    datas = [data for _, data in items]
+    if workers > 1 and len(items) >= pool_min:
+        # spawn: рабочие процессы не наследуют соединения с БД и потоки
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(items)), mp_context=get_context("spawn")
+        ) as pool:
+            chunksize = max(1, len(items) // (workers * 4))
+            images = list(
+                pool.map(
+                    card_images.render_card, datas, repeat(fonts), chunksize=chunksize
+                )
+            )
+    else:
+        images = list(map(card_images.render_card, datas, repeat(fonts)))
+
+    for (name, _), image in zip(items, images, strict=True):
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(image))
+
+
+def _plan(spell_ids: list[int]) -> tuple[tuple, list[str], list[tuple[str, dict]]]:
+    """Шрифты, имена карточек в порядке ``spell_ids`` и недостающие карточки"""
+    fonts = card_fonts()
+    data = card_data(spell_ids)
+    names, missing = [], []
+    for spell_id in spell_ids:
+        if spell_id not in data:
+            continue
+        name = card_name(spell_id, data[spell_id], fonts)
+        names.append(name)
+        if not default_storage.exists(name):
+            missing.append((name, data[spell_id]))
+    return fonts, names, missing
+
+
+def ensure_cards(spell_ids: list[int], workers: int = 1) -> CardSet:
+    """Карточки заклинаний (в порядке ``spell_ids``), нарисовав недостающие"""
+    fonts, names, missing = _plan(spell_ids)
+    if missing:
+        _render(missing, fonts, workers)
+    return CardSet(names, len(missing))
+
+
+_executor = None
+_queued: set[str] = set()
+_queued_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        # один поток: фоновое рисование не отнимает у запросов больше ядра
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cards")
+    return _executor
+
+
+def _render_queued(items: list[tuple[str, dict]], fonts: tuple) -> None:
+    try:
+        _render(items, fonts)
+    except Exception:
+        logger.exception("Не удалось нарисовать карточки заклинаний")
+    finally:
+        with _queued_lock:
+            _queued.difference_update(name for name, _ in items)
+
+
+def request_cards(spell_ids: list[int]) -> CardSet:
+    """
+    Карточки для запроса к API: до ``SPELLS_CARD_REQUEST_MAX`` недостающих
+    рисуются сразу, больше - в фоне (``pending`` в результате)
+    """
+    fonts, names, missing = _plan(spell_ids)
+    if len(missing) <= getattr(settings, "SPELLS_CARD_REQUEST_MAX", 8):
+        if missing:
+            _render(missing, fonts)
+        return CardSet(names, len(missing))
+
+    with _queued_lock:
+        # карточки, которые уже рисуются по другому запросу, не ставятся дважды
+        items = [item for item in missing if item[0] not in _queued]
+        _queued.update(name for name, _ in items)
+    if items:
+        get_executor().submit(_render_queued, items, fonts)
+    return CardSet(names, 0, pending=len(missing))
+
+
+def read_card(name: str) -> bytes:
+    with default_storage.open(name, "rb") as file:
+        return file.read()
+
+
+def build_pdf(cards: CardSet) -> bytes:
+    return card_images.assemble_pdf([read_card(name) for name in cards.names])
+
+
+def spellbook_spell_ids(*spellbook_ids: int) -> list[int]:
+    """Заклинания спеллбуков по уровню и названию, без повторов"""
+    return list(
+        Spell.objects.filter(spellbooks__in=spellbook_ids)
+        .order_by("level", "name")
+        .values_list("id", flat=True)
+        .distinct()
+    )
+
+
+def spellbook_cards(spellbook_id: int) -> CardSet | None:
+    if not Spellbook.objects.filter(id=spellbook_id).exists():
+        return None
+    return request_cards(spellbook_spell_ids(spellbook_id))
+
+
+def prune_cards() -> int:
+    """Удалить карточки, не соответствующие текущим данным заклинаний"""
+    try:
+        directories, _ = default_storage.listdir(CARD_DIR)
+    except FileNotFoundError:
+        return 0
+    fonts = card_fonts()
+    spell_ids = [int(name) for name in directories if name.isdigit()]
+    current = {
+        card_name(spell_id, data, fonts)
+        for spell_id, data in card_data(spell_ids).items()
+    }
+    removed = 0
+    for directory in directories:
+        for file_name in default_storage.listdir(f"{CARD_DIR}/{directory}")[1]:
+            name = f"{CARD_DIR}/{directory}/{file_name}"
+            if name not in current:
+                default_storage.delete(name)
+                removed += 1
+    return removed
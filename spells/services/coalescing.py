@@ -0,0 +1,127 @@
+"""Объединение одинаковых одновременных вычислений (single-flight).
+
+Когда популярный ключ выпадает из кэша, все запросы, пришедшие в этот
+момент, иначе одновременно пошли бы в базу. Здесь одно вычисление
+выполняет только первый запрос, остальные ждут его результат:
+
+* ``coalesce()`` - внутри процесса: ожидающие потоки получают тот же
+  результат (или ту же ошибку), кэш не используется. Ключ должен
+  включать версию данных (поколения, ``updated_at``), а вызовы, читающие
+  из основной БД и с реплики, не объединяются: иначе запрос сразу после
+  записи получил бы результат, прочитанный до нее;
+* ``get_or_set()`` - значение в кэше; промах вычисляется один раз в процессе,
+  а между процессами - под блокировкой ``cache.add()``: остальные процессы
+  опрашивают кэш и вычисляют сами, только если не дождались.
+
+Выключается настройкой ``SPELLS_REQUEST_COALESCING = False``.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from spells.routers import reads_primary
+
+# Время жизни блокировки между процессами, если вычисляющий процесс упал
+LOCK_TIMEOUT = 30
+# Сколько ждать чужое вычисление и как часто проверять кэш, с
+WAIT_TIMEOUT = 10.0
+POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights: dict[str, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "SPELLS_REQUEST_COALESCING", True)
+
+
+def coalesce(key: str, compute):
+    """Выполнить ``compute()`` один раз для всех одновременных вызовов с ``key``"""
+    if not is_enabled():
+        return compute()
+
+    key = f"{key}:{'primary' if reads_primary() else 'replica'}"
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if not flight.done.wait(WAIT_TIMEOUT):
+            # вычисление зависло - не ждем его бесконечно
+            return compute()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = compute()
+    except BaseException as error:
+        flight.error = error
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+    return flight.result
+
+
+def _fill(key: str, compute, timeout):
+    # значение могло появиться, пока ждали своей очереди
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            value = compute()
+            if value is not None:
+                cache.set(key, value, timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    # значение вычисляет другой процесс
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if cache.get(lock_key) is None:
+            break
+    value = compute()
+    if value is not None:
+        cache.set(key, value, timeout)
+    return value
+
+
+def get_or_set(key: str, compute, timeout=None):
+    """
+    Значение из кэша или результат ``compute()``, вычисленный одним
+    вызовом на все одновременные промахи. None не кэшируется
+    """
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    if not is_enabled():
+        value = compute()
+        if value is not None:
+            cache.set(key, value, timeout)
+        return value
+    return coalesce(key, lambda: _fill(key, compute, timeout))
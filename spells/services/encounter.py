@@ -0,0 +1,277 @@
+"""Подбор лучших заклинаний партии против столкновения.
+
+Для каждого участника перебираются заклинания его активных спеллбуков
+и уровни ячеек, которые у него еще остались. Каждая пара (заклинание, ячейка)
+оценивается по ожидаемому урону, контролю и лечению; оценка запоминается
+по (заклинание, ячейка, бонусы заклинателя, цель), поэтому персонажи
+с одинаковыми характеристиками и одинаковые заклинания считаются один раз.
+
+Данные партии загружаются пакетно, фиксированным числом запросов,
+а таблица признаков заклинаний хранится в памяти процесса и правится
+точечно при изменении заклинания (см. spells.services.process_cache).
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+
+from spells.models import EffectCategory, Person, Spell, Spellbook
+from spells.services.events import SPELLBOOK_STATE_FIELDS, overlay_spellbooks
+from spells.services.process_cache import ProcessCache
+from spells.services.simulation import cast_dice, estimate_cast
+
+SLOT_LEVELS = range(1, 10)
+
+CONTROL_CATEGORIES = frozenset(
+    (EffectCategory.CONTROL, EffectCategory.CONDITION, EffectCategory.DEBUFF)
+)
+# Ценность контроля одной цели в единицах урона за уровень заклинания
+CONTROL_WEIGHT = 6.0
+# Ценность единицы лечения относительно единицы урона
+HEALING_WEIGHT = 1.0
+
+
+@dataclass(frozen=True)
+class SpellFeatures:
+    """Признаки заклинания, нужные для оценки"""
+
+    name: str
+    level: int
+    attack_type: str
+    damage_dice: str
+    higher_level_dice: str
+    concentration: bool
+    categories: frozenset[str]
+
+    @property
+    def is_healing(self) -> bool:
+        return EffectCategory.HEALING in self.categories
+
+    @property
+    def is_control(self) -> bool:
+        return bool(self.categories & CONTROL_CATEGORIES)
+
+
+@dataclass(frozen=True)
+class Target:
+    """Цели столкновения"""
+
+    armor_class: int = 10
+    save_bonus: int = 0
+    count: int = 1
+
+
+# Поля заклинания, из которых берутся признаки
+SPELL_FEATURE_FIELDS = (
+    "name",
+    "level",
+    "attack_type",
+    "damage_dice",
+    "higher_level_dice",
+    "concentration",
+)
+
+
+def _build_feature_table(spell_ids=None) -> dict[int, SpellFeatures]:
+    """Признаки всех заклинаний или только ``spell_ids``"""
+    spells = Spell.objects.all()
+    effects = Spell.effects.through.objects.all()
+    if spell_ids is not None:
+        spells = spells.filter(id__in=spell_ids)
+        effects = effects.filter(spell_id__in=spell_ids)
+
+    categories = defaultdict(set)
+    for spell_id, category in effects.values_list("spell_id", "effect__category"):
+        if category:
+            categories[spell_id].add(category)
+
+    rows = spells.values_list("id", *SPELL_FEATURE_FIELDS)
+    return {
+        spell_id: SpellFeatures(*fields, frozenset(categories[spell_id]))
+        for spell_id, *fields in rows
+    }
+
+
+_features = ProcessCache(
+    "encounter_features", _build_feature_table, "SPELLS_FEATURES_TTL"
+)
+
+
+def get_feature_table() -> dict[int, SpellFeatures]:
+    """Таблица признаков всех заклинаний (копия процесса)"""
+    return _features.get()
+
+
+def _replaced(table: dict, spell_ids, features: dict) -> dict:
+    table = dict(table)
+    for spell_id in spell_ids:
+        if spell_id in features:
+            table[spell_id] = features[spell_id]
+        else:
+            table.pop(spell_id, None)
+    return table
+
+
+def spells_changed(spell_ids) -> None:
+    """Признаки заклинаний изменились (или они удалены) - поправить таблицу"""
+    spell_ids = set(spell_ids)
+    features = _build_feature_table(spell_ids)
+    _features.changed(lambda table: _replaced(table, spell_ids, features))
+
+
+def features_changed() -> None:
+    """Изменились категории эффектов - перестроить таблицу во всех процессах"""
+    _features.invalidate()
+
+
+@lru_cache(maxsize=16384)
+def evaluate(
+    spell: SpellFeatures,
+    slot_level: int,
+    attack_bonus: int,
+    save_dc: int,
+    target: Target,
+) -> dict:
+    """Ценность накладывания заклинания ячейкой ``slot_level``"""
+    try:
+        dice = cast_dice(
+            spell.damage_dice, spell.higher_level_dice, spell.level, slot_level
+        )
+    except ValueError:
+        # усиленные кости вышли за лимиты - такой вариант не рассматриваем
+        return {"dice": "", "score": 0}
+    # лечение не требует броска против врага
+    attack_type = Spell.AttackType.AUTOMATIC if spell.is_healing else spell.attack_type
+    estimate = estimate_cast(
+        dice,
+        attack_type,
+        attack_bonus=attack_bonus,
+        save_dc=save_dc,
+        target_ac=target.armor_class,
+        target_save_bonus=target.save_bonus,
+    )
+
+    damage = healing = control = 0.0
+    if spell.is_healing:
+        healing = estimate.expected_damage
+    else:
+        damage = estimate.expected_damage * target.count
+    if spell.is_control:
+        success = estimate.success_probability
+        if success is None:
+            success = 1.0
+        control = success * CONTROL_WEIGHT * max(1, slot_level) * target.count
+
+    return {
+        "dice": dice,
+        "expected_damage": round(damage, 2),
+        "expected_healing": round(healing, 2),
+        "control": round(control, 2),
+        "success_probability": estimate.success_probability,
+        "score": round(damage + control + HEALING_WEIGHT * healing, 2),
+    }
+
+
+def _available_slots(spellbook: dict) -> set[int]:
+    slots = {
+        level for level in SLOT_LEVELS if spellbook[f"current_spell_slots_{level}"] > 0
+    }
+    if spellbook["warlock_current_slots"] > 0 and spellbook["warlock_slot_level"]:
+        slots.add(spellbook["warlock_slot_level"])
+    return slots
+
+
+def _load_party(person_ids):
+    persons = {person.id: person for person in Person.objects.filter(id__in=person_ids)}
+    spellbooks = list(
+        Spellbook.objects.filter(owner_id__in=persons, is_active=True).values(
+            "id",
+            "owner_id",
+            "warlock_slot_level",
+            *SPELLBOOK_STATE_FIELDS,
+        )
+    )
+    overlay_spellbooks(spellbooks)
+    edges = defaultdict(list)
+    edge_rows = Spellbook.spells.through.objects.filter(
+        spellbook_id__in=[spellbook["id"] for spellbook in spellbooks]
+    ).values_list("spellbook_id", "spell_id")
+    for spellbook_id, spell_id in edge_rows:
+        edges[spellbook_id].append(spell_id)
+    return persons, spellbooks, edges
+
+
+def _member_options(person, spellbooks, edges, features, target) -> list[dict]:
+    attack_bonus = person.spell_attack_bonus
+    save_dc = person.spell_save_dc
+    best = {}
+    for spellbook in spellbooks:
+        slots = _available_slots(spellbook)
+        for spell_id in edges[spellbook["id"]]:
+            spell = features.get(spell_id)
+            if spell is None:
+                continue
+            levels = {0} if spell.level == 0 else {s for s in slots if s >= spell.level}
+            for slot_level in levels:
+                value = evaluate(spell, slot_level, attack_bonus, save_dc, target)
+                if not value["score"]:
+                    continue
+                key = (spell_id, slot_level)
+                if key not in best:
+                    best[key] = {
+                        "spell": spell_id,
+                        "name": spell.name,
+                        "slot_level": slot_level,
+                        "spellbook": spellbook["id"],
+                        "concentration": spell.concentration,
+                        **value,
+                    }
+    # при равной ценности выгоднее тратить ячейку пониже
+    return sorted(
+        best.values(), key=lambda o: (-o["score"], o["slot_level"], o["spell"])
+    )
+
+
+def optimize(person_ids, target: Target, limit: int = 5) -> dict:
+    """Рейтинг вариантов каждого участника и план хода партии"""
+    persons, spellbooks, edges = _load_party(person_ids)
+    features = get_feature_table()
+
+    by_owner = defaultdict(list)
+    for spellbook in spellbooks:
+        by_owner[spellbook["owner_id"]].append(spellbook)
+
+    members = []
+    plan = []
+    concentration_taken = set()
+    for person_id in person_ids:
+        person = persons.get(person_id)
+        if person is None:
+            continue
+        options = _member_options(person, by_owner[person_id], edges, features, target)
+        members.append(
+            {"id": person_id, "name": person.name, "options": options[:limit]}
+        )
+
+        # один и тот же концентрационный эффект от двух участников не складывается
+        choice = next(
+            (
+                option
+                for option in options
+                if not (
+                    option["concentration"] and option["spell"] in concentration_taken
+                )
+            ),
+            None,
+        )
+        if choice is not None:
+            if choice["concentration"]:
+                concentration_taken.add(choice["spell"])
+            plan.append({"member": person_id, **choice})
+
+    return {
+        "members": members,
+        "plan": plan,
+        "expected_damage": round(sum(o["expected_damage"] for o in plan), 2),
+        "expected_healing": round(sum(o["expected_healing"] for o in plan), 2),
+    }
@@ -0,0 +1,502 @@
+"""Журнал событий игровой сессии (режим ``SPELLS_EVENT_SOURCING``).
+
+В обычном режиме трата ячеек и изменение хитов перезаписывают строку
+спеллбука или персонажа, и во время активной игры все записи упираются
+в блокировку одной строки. В режиме журнала каждое действие - короткая
+вставка ``SessionEvent`` без блокировок и без чтения журнала:
+
+* текущее состояние = строка (последний снимок) + события после
+  ``events_compacted_to``, свертка событий чистая и детерминированная;
+  событие, неприменимое к состоянию (нечего тратить), ничего не меняет;
+* внутри ``batch()`` события копятся в памяти и вставляются одним
+  ``bulk_create`` при выходе;
+* ``compact()`` сворачивает накопленные события в строки короткими
+  транзакциями по пачкам и сохраняет прежнее состояние в ``SessionSnapshot``.
+  События моложе ``SPELLS_EVENT_COMPACTION_GRACE`` с не сворачиваются:
+  id выдается при вставке, а видно событие после коммита, и без этого окна
+  событие с меньшим id, закоммиченное позже, оказалось бы ниже
+  ``events_compacted_to`` и пропало бы из состояния;
+* ``replay()`` восстанавливает ход сессии от ближайшего снимка.
+
+Перед выключением режима нужно выполнить свертку (``compact_session_events``),
+иначе несвернутые события не будут видны.
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from itertools import takewhile
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
+
+from spells.models import Person, SessionEvent, SessionSnapshot, Spellbook
+
+SLOT_LEVELS = range(1, 10)
+
+SPELLBOOK_STATE_FIELDS = (
+    *(f"max_spell_slots_{level}" for level in SLOT_LEVELS),
+    *(f"current_spell_slots_{level}" for level in SLOT_LEVELS),
+    "warlock_max_slots",
+    "warlock_current_slots",
+)
+PERSON_STATE_FIELDS = (
+    "max_hit_points",
+    "current_hit_points",
+    "temporary_hit_points",
+)
+
+# Поля, которые меняют события (максимумы только читаются)
+SPELLBOOK_COUNTER_FIELDS = tuple(
+    name for name in SPELLBOOK_STATE_FIELDS if "current" in name
+)
+PERSON_COUNTER_FIELDS = ("current_hit_points", "temporary_hit_points")
+
+_EVENT_FIELDS = (
+    "id",
+    "kind",
+    "spellbook_id",
+    "person_id",
+    "level",
+    "is_warlock",
+    "amount",
+    "created_at",
+)
+
+_buffer: ContextVar[list | None] = ContextVar("spells_event_buffer", default=None)
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "SPELLS_EVENT_SOURCING", False)
+
+
+# Свертка
+
+
+def _slot_candidates(event: dict) -> list[str]:
+    # как Spellbook.use_spell_slot: сначала ячейка колдуна, потом обычная
+    fields = []
+    if event["is_warlock"]:
+        fields.append("warlock_current_slots")
+    if event["level"] in SLOT_LEVELS:
+        fields.append(f"current_spell_slots_{event['level']}")
+    return fields
+
+
+def _limit(field: str) -> str:
+    return field.replace("current", "max")
+
+
+def apply_event(state: dict, event: dict) -> bool:
+    """Применить событие к состоянию на месте. False - событие ничего не меняет"""
+    kind = event["kind"]
+    if kind == SessionEvent.Kind.SLOT_USED:
+        for field in _slot_candidates(event):
+            if state[field] > 0:
+                state[field] -= 1
+                return True
+        return False
+
+    if kind == SessionEvent.Kind.SLOT_RESTORED:
+        for field in _slot_candidates(event):
+            if state[field] < state[_limit(field)]:
+                state[field] += 1
+                return True
+        return False
+
+    if kind == SessionEvent.Kind.LONG_REST:
+        for field in SPELLBOOK_COUNTER_FIELDS:
+            state[field] = state[_limit(field)]
+        return True
+
+    if kind == SessionEvent.Kind.HP_CHANGED:
+        amount = event["amount"]
+        if amount >= 0:
+            state["current_hit_points"] = min(
+                state["current_hit_points"] + amount, state["max_hit_points"]
+            )
+        else:
+            # урон сначала снимает временные хиты
+            damage = -amount
+            absorbed = min(damage, state["temporary_hit_points"])
+            state["temporary_hit_points"] -= absorbed
+            state["current_hit_points"] = max(
+                state["current_hit_points"] - (damage - absorbed), 0
+            )
+        return True
+
+    if kind == SessionEvent.Kind.TEMP_HP:
+        # временные хиты не складываются - остается большее значение
+        state["temporary_hit_points"] = max(
+            state["temporary_hit_points"], event["amount"]
+        )
+        return True
+
+    return False
+
+
+# Чтение состояния
+
+
+def _owner_field(model) -> str:
+    return "spellbook" if model is Spellbook else "person"
+
+
+def _pending_events(model, ids) -> dict[int, list[dict]]:
+    """Несвернутые события по id строки, включая еще не вставленные из пакета"""
+    owner = _owner_field(model)
+    pending = defaultdict(list)
+    if not ids:
+        return pending
+    rows = (
+        SessionEvent.objects.filter(
+            **{f"{owner}_id__in": ids, "id__gt": F(f"{owner}__events_compacted_to")}
+        )
+        .order_by("id")
+        .values(*_EVENT_FIELDS)
+    )
+    for row in rows:
+        pending[row[f"{owner}_id"]].append(row)
+
+    ids = set(ids)
+    for event in _buffer.get() or ():
+        object_id = getattr(event, f"{owner}_id")
+        if object_id in ids:
+            pending[object_id].append(_as_dict(event))
+    return pending
+
+
+def _as_dict(event: SessionEvent) -> dict:
+    return {name: getattr(event, name) for name in _EVENT_FIELDS}
+
+
+def _overlay(model, rows: list[dict], key: str) -> dict[int, int]:
+    if not is_enabled():
+        return {}
+    pending = _pending_events(model, [row[key] for row in rows])
+    last_events = {}
+    for row in rows:
+        events = pending.get(row[key])
+        if not events:
+            continue
+        for event in events:
+            apply_event(row, event)
+        last_events[row[key]] = events[-1]["id"] or 0
+    return last_events
+
+
+def overlay_spellbooks(rows: list[dict], key: str = "id") -> dict[int, int]:
+    """
+    Применить несвернутые события к строкам спеллбуков из ``.values()``.
+    Строки должны содержать все ``SPELLBOOK_STATE_FIELDS``.
+    Возвращает {id спеллбука: id последнего примененного события}
+    """
+    return _overlay(Spellbook, rows, key)
+
+
+def overlay_persons(rows: list[dict], key: str = "id") -> dict[int, int]:
+    """То же для хитов персонажей (строки содержат ``PERSON_STATE_FIELDS``)"""
+    return _overlay(Person, rows, key)
+
+
+def _states(model, fields, ids) -> dict[int, dict]:
+    pending = _pending_events(model, ids)
+    if not pending:
+        return {}
+    rows = model.objects.filter(id__in=pending).values("id", *fields)
+    states = {}
+    for row in rows:
+        state = {name: row[name] for name in fields}
+        for event in pending[row["id"]]:
+            apply_event(state, event)
+        states[row["id"]] = state
+    return states
+
+
+def spellbook_states(ids) -> dict[int, dict]:
+    """Состояние ячеек спеллбуков, у которых есть несвернутые события"""
+    if not is_enabled():
+        return {}
+    return _states(Spellbook, SPELLBOOK_STATE_FIELDS, list(ids))
+
+
+# Запись
+
+
+@contextmanager
+def batch():
+    """Копить события в памяти и вставить их одним запросом при выходе"""
+    if _buffer.get() is not None:
+        # вложенный пакет пишет во внешний
+        yield
+        return
+    token = _buffer.set([])
+    try:
+        yield
+        flush()
+    finally:
+        _buffer.reset(token)
+
+
+def flush() -> None:
+    """Вставить накопленные в пакете события"""
+    events = _buffer.get()
+    if events:
+        SessionEvent.objects.bulk_create(events)
+        events.clear()
+
+
+def _append(event: SessionEvent) -> None:
+    events = _buffer.get()
+    if events is None:
+        event.save(force_insert=True)
+    else:
+        events.append(event)
+
+
+def _record(
+    model, object_id: int, state: dict | None = None, **event_fields
+) -> SessionEvent | None:
+    """
+    Добавить событие в журнал. Если вызывающему известно состояние, событие
+    сначала применяется к нему (на месте) и не пишется, когда ничего не
+    меняет (None). Окончательно применимость решает свертка
+    """
+    event = SessionEvent(**{f"{_owner_field(model)}_id": object_id}, **event_fields)
+    if state is not None and not apply_event(state, _as_dict(event)):
+        return None
+    _append(event)
+    return event
+
+
+def use_slot(
+    spellbook_id: int, level: int, is_warlock: bool = False, state: dict | None = None
+) -> SessionEvent | None:
+    """Потратить ячейку"""
+    return _record(
+        Spellbook,
+        spellbook_id,
+        state,
+        kind=SessionEvent.Kind.SLOT_USED,
+        level=level or 0,
+        is_warlock=is_warlock,
+    )
+
+
+def restore_slot(
+    spellbook_id: int, level: int, is_warlock: bool = False, state: dict | None = None
+) -> SessionEvent | None:
+    """Вернуть одну ячейку, не превышая максимум"""
+    return _record(
+        Spellbook,
+        spellbook_id,
+        state,
+        kind=SessionEvent.Kind.SLOT_RESTORED,
+        level=level or 0,
+        is_warlock=is_warlock,
+    )
+
+
+def long_rest(spellbook_id: int, state: dict | None = None) -> SessionEvent | None:
+    """Восстановить все ячейки"""
+    return _record(
+        Spellbook,
+        spellbook_id,
+        state,
+        kind=SessionEvent.Kind.LONG_REST,
+    )
+
+
+def change_hp(
+    person_id: int, amount: int, state: dict | None = None
+) -> SessionEvent | None:
+    """Урон (amount < 0) или лечение персонажа"""
+    return _record(
+        Person,
+        person_id,
+        state,
+        kind=SessionEvent.Kind.HP_CHANGED,
+        amount=amount,
+    )
+
+
+def grant_temp_hp(
+    person_id: int, amount: int, state: dict | None = None
+) -> SessionEvent | None:
+    """Выдать временные хиты"""
+    return _record(
+        Person,
+        person_id,
+        state,
+        kind=SessionEvent.Kind.TEMP_HP,
+        amount=amount,
+    )
+
+
+# Свертка журнала
+
+
+def _compaction_cutoff() -> datetime:
+    """Сворачиваются только события старше окна (см. описание модуля)"""
+    grace = getattr(settings, "SPELLS_EVENT_COMPACTION_GRACE", 60)
+    return now() - timedelta(seconds=grace)
+
+
+def _compact_model(model, fields, counters, batch_size: int) -> int:
+    owner = _owner_field(model)
+    cutoff = _compaction_cutoff()
+    ids = list(
+        SessionEvent.objects.filter(
+            **{f"{owner}__isnull": False, "id__gt": F(f"{owner}__events_compacted_to")},
+            created_at__lt=cutoff,
+        )
+        .values_list(f"{owner}_id", flat=True)
+        .distinct()
+    )
+    compacted = 0
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start : start + batch_size]
+        # короткая транзакция на пачку: строки блокируются только на время свертки
+        with transaction.atomic():
+            rows = list(
+                model.objects.select_for_update()
+                .filter(id__in=chunk)
+                .values("id", "events_compacted_to", *fields)
+            )
+            pending = _pending_events(model, [row["id"] for row in rows])
+            moment = now()
+            snapshots = []
+            updated = []
+            for row in rows:
+                # водяной знак сдвигается только по непрерывному началу журнала
+                events = list(
+                    takewhile(
+                        lambda event: event["created_at"] < cutoff,
+                        pending.get(row["id"], ()),
+                    )
+                )
+                if not events:
+                    continue
+                state = {name: row[name] for name in fields}
+                snapshots.append(
+                    SessionSnapshot(
+                        **{f"{owner}_id": row["id"]},
+                        event_id=row["events_compacted_to"],
+                        state=dict(state),
+                    )
+                )
+                for event in events:
+                    apply_event(state, event)
+                updated.append(
+                    model(
+                        id=row["id"],
+                        events_compacted_to=events[-1]["id"],
+                        updated_at=moment,
+                        **{name: state[name] for name in counters},
+                    )
+                )
+            model.objects.bulk_update(
+                updated, [*counters, "events_compacted_to", "updated_at"]
+            )
+            SessionSnapshot.objects.bulk_create(snapshots)
+            compacted += len(updated)
+    return compacted
+
+
+def compact(batch_size: int = 500) -> dict[str, int]:
+    """Свернуть несвернутые события в строки спеллбуков и персонажей"""
+    return {
+        "spellbooks": _compact_model(
+            Spellbook, SPELLBOOK_STATE_FIELDS, SPELLBOOK_COUNTER_FIELDS, batch_size
+        ),
+        "persons": _compact_model(
+            Person, PERSON_STATE_FIELDS, PERSON_COUNTER_FIELDS, batch_size
+        ),
+    }
+
+
+def prune(before: datetime) -> int:
+    """Удалить свернутые события и снимки старше ``before``"""
+    compacted = Q(
+        spellbook__isnull=False, id__lte=F("spellbook__events_compacted_to")
+    ) | Q(person__isnull=False, id__lte=F("person__events_compacted_to"))
+    deleted, _ = SessionEvent.objects.filter(compacted, created_at__lt=before).delete()
+    SessionSnapshot.objects.filter(created_at__lt=before).delete()
+    return deleted
+
+
+# Воспроизведение
+
+
+def replay(
+    model,
+    object_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> dict | None:
+    """
+    Ход сессии: состояние в начале окна и состояние после каждого события.
+    Отсчет ведется от ближайшего снимка перед окном; события старше самого
+    раннего сохраненного снимка восстановить нельзя
+    """
+    owner = _owner_field(model)
+    fields = SPELLBOOK_STATE_FIELDS if model is Spellbook else PERSON_STATE_FIELDS
+    row = (
+        model.objects.filter(id=object_id)
+        .values("events_compacted_to", *fields)
+        .first()
+    )
+    if row is None:
+        return None
+
+    events = SessionEvent.objects.filter(**{f"{owner}_id": object_id})
+    window = events
+    if since is not None:
+        window = window.filter(created_at__gte=since)
+    if until is not None:
+        window = window.filter(created_at__lte=until)
+    first_id = window.order_by("id").values_list("id", flat=True).first()
+    if first_id is None:
+        return {"start": None, "events": []}
+
+    # строка - это снимок после events_compacted_to
+    baseline_id = row.pop("events_compacted_to")
+    baseline = row
+    if baseline_id >= first_id:
+        snapshots = SessionSnapshot.objects.filter(**{f"{owner}_id": object_id})
+        snapshot = (
+            snapshots.filter(event_id__lt=first_id).order_by("-event_id").first()
+            or snapshots.order_by("event_id").first()
+        )
+        if snapshot is not None and snapshot.event_id < baseline_id:
+            baseline_id, baseline = snapshot.event_id, snapshot.state
+
+    timeline = events.filter(id__gt=baseline_id).order_by("id")
+    if until is not None:
+        timeline = timeline.filter(created_at__lte=until)
+
+    state = dict(baseline)
+    start = None
+    entries = []
+    for event in timeline.values(*_EVENT_FIELDS):
+        in_window = since is None or event["created_at"] >= since
+        if in_window and start is None:
+            start = dict(state)
+        applied = apply_event(state, event)
+        if in_window:
+            entries.append(
+                {
+                    "id": event["id"],
+                    "kind": event["kind"],
+                    "level": event["level"],
+                    "is_warlock": event["is_warlock"],
+                    "amount": event["amount"],
+                    "created_at": event["created_at"].isoformat(),
+                    "applied": applied,
+                    "state": dict(state),
+                }
+            )
+    return {"start": start, "events": entries}
@@ -0,0 +1,34 @@
+"""Счетчики поколений для инвалидации кэша.
+
+Изменения M2M-связей не трогают ``updated_at``, поэтому для них ведется
+отдельный счетчик в кэше: любое изменение увеличивает поколение,
+и все ключи, построенные на старом значении, перестают использоваться.
+"""
+
+from django.core.cache import cache
+
+CATALOG = "catalog"
+
+
+def _key(scope: str, object_id: int | None = None) -> str:
+    if object_id is None:
+        return f"spells:gen:{scope}"
+    return f"spells:gen:{scope}:{object_id}"
+
+
+def get_generation(scope: str, object_id: int | None = None) -> int:
+    """Текущее поколение (0, если изменений еще не было)"""
+    return cache.get(_key(scope, object_id), 0)
+
+
+def bump_generation(scope: str, object_id: int | None = None) -> int:
+    """Увеличить поколение и вернуть новое значение"""
+    key = _key(scope, object_id)
+    # add() не перезапишет существующее значение, incr() атомарен в кэше
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # ключ успели вытеснить между add() и incr()
+        cache.set(key, 1, timeout=None)
+        return 1
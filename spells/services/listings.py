@@ -0,0 +1,85 @@
+"""Списки персонажей и спеллбуков.
+
+Каждый список фильтруется и сортируется так, чтобы его целиком покрывал
+один индекс из ``Meta.indexes`` модели (``LISTING_INDEXES``): строки
+читаются в порядке индекса, без сортировки во временном B-дереве.
+Команда ``explain_listings`` проверяет это по планам запросов.
+"""
+
+from django.db.models import QuerySet
+
+from spells.models import Person, Spellbook
+
+CHARACTER_FIELDS = (
+    "id",
+    "name",
+    "player_id",
+    "character_class__name",
+    "primary_class_level",
+    "second_class_level",
+    "warlock_level",
+    "is_active",
+    "is_favorite",
+    "is_public",
+    "updated_at",
+)
+SPELLBOOK_FIELDS = (
+    "id",
+    "name",
+    "owner_id",
+    "owner__name",
+    "is_active",
+    "is_shared",
+    "updated_at",
+)
+
+
+def _characters() -> QuerySet:
+    return Person.objects.select_related("character_class").only(*CHARACTER_FIELDS)
+
+
+def _spellbooks() -> QuerySet:
+    return Spellbook.objects.select_related("owner").only(*SPELLBOOK_FIELDS)
+
+
+def player_characters(player_id: int, active: bool = False) -> QuerySet:
+    """Персонажи игрока: избранные, затем недавно измененные"""
+    characters = _characters().filter(player_id=player_id)
+    if active:
+        characters = characters.filter(is_active=True)
+    return characters
+
+
+def public_characters() -> QuerySet:
+    """Публичные персонажи всех игроков"""
+    return _characters().filter(is_public=True)
+
+
+def person_spellbooks(person_id: int, active: bool = False) -> QuerySet:
+    """Спеллбуки персонажа, недавно измененные первыми"""
+    spellbooks = _spellbooks().filter(owner_id=person_id)
+    if active:
+        spellbooks = spellbooks.filter(is_active=True)
+    return spellbooks
+
+
+def shared_spellbooks() -> QuerySet:
+    """Общие спеллбуки всех игроков"""
+    return _spellbooks().filter(is_shared=True)
+
+
+# Список -> (запрос для проверки плана, индекс, который он должен использовать)
+LISTING_INDEXES = {
+    "player_characters": (lambda: player_characters(1), "person_player_order_idx"),
+    "player_active_characters": (
+        lambda: player_characters(1, active=True),
+        "person_player_active_idx",
+    ),
+    "public_characters": (public_characters, "person_public_order_idx"),
+    "person_spellbooks": (lambda: person_spellbooks(1), "spellbook_owner_order_idx"),
+    "person_active_spellbooks": (
+        lambda: person_spellbooks(1, active=True),
+        "spellbook_owner_active_idx",
+    ),
+    "shared_spellbooks": (shared_spellbooks, "spellbook_shared_order_idx"),
+}
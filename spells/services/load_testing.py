@@ -0,0 +1,347 @@
+"""Клиент нагрузочного теста API (``manage.py load_test``).
+
+Виртуальные пользователи - задачи asyncio, у каждого свое соединение
+HTTP/1.1 с keep-alive; все приходят с одного адреса, поэтому сервер теста
+работает без ограничения частоты (``SPELLS_THROTTLING = False``).
+Пользователь в цикле выбирает сценарий по весам смеси:
+
+* ``browse`` - просмотр справочника: компоненты, автодополнение,
+  публичные персонажи и спеллбуки, лист спеллбука, похожие заклинания;
+* ``crud`` - создание, чтение, изменение (с версией) и удаление
+  материальных компонентов;
+* ``combat`` - серия трат ячеек и урона через синхронизацию, лист спеллбука;
+* ``rest`` - долгий отдых, лист спеллбука и синхронизация по токену.
+
+Несколько пользователей играют за одного игрока (``party_size``), поэтому
+операции над одними строками идут одновременно, как с нескольких устройств.
+
+Модуль не импортирует Django: клиент запускается в отдельном процессе,
+чтобы не делить GIL с тестируемым сервером.
+"""
+
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+from urllib.parse import quote
+
+API = "/api/spells"
+SCENARIOS = ("browse", "crud", "combat", "rest")
+DEFAULT_MIX = {"browse": 60, "crud": 10, "combat": 25, "rest": 5}
+# Ответы, ожидаемые при конкурентной работе и не считающиеся ошибками
+CONFLICT = 409
+THROTTLED = 429
+NO_BODY_STATUSES = (204, 304)
+
+
+class Connection:
+    """Минимальный клиент HTTP/1.1 с повторным использованием соединения"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body=None) -> tuple[int, bytes]:
+        payload = b"" if body is None else json.dumps(body).encode()
+        head = [
+            f"{method} {path} HTTP/1.1",
+            f"Host: {self.host}:{self.port}",
+            "Accept: application/json",
+            f"Content-Length: {len(payload)}",
+        ]
+        if body is not None:
+            head.append("Content-Type: application/json")
+        message = ("\r\n".join(head) + "\r\n\r\n").encode() + payload
+
+        # сервер мог закрыть простаивающее соединение - один повтор на новом
+        for attempt in range(2):
+            reused = self.writer is not None
+            if not reused:
+                self.reader, self.writer = await asyncio.open_connection(
+                    self.host, self.port
+                )
+            try:
+                self.writer.write(message)
+                await self.writer.drain()
+                return await self._response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if not reused or attempt:
+                    raise
+        raise ConnectionError("Соединение закрыто")
+
+    async def _response(self) -> tuple[int, bytes]:
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Сервер закрыл соединение")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if status in NO_BODY_STATUSES:
+            body = b""
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self._chunked()
+        else:
+            body = await self.reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, body
+
+    async def _chunked(self) -> bytes:
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0], 16)
+            if not size:
+                await self.reader.readline()
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Stats:
+    """Задержки и коды ответов по меткам запросов"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.recording = False
+
+    def add(self, label: str, status: int | str, seconds: float) -> None:
+        if self.recording:
+            self.latencies[label].append(seconds * 1000)
+            self.statuses[label][status] += 1
+
+
+class User:
+    """Виртуальный пользователь: соединение, генератор и свои объекты"""
+
+    def __init__(self, number: int, plan: dict, stats: Stats):
+        fixtures = plan["fixtures"]
+        self.number = number
+        self.rng = random.Random(plan["seed"] * 100003 + number)
+        self.fixtures = fixtures
+        party = fixtures["parties"][number % len(fixtures["parties"])]
+        self.player, self.person, self.spellbook = party
+        self.scratch = list(fixtures["scratch"][number % len(fixtures["scratch"])])
+        self.think = plan["think_ms"] / 1000
+        self.stats = stats
+        self.counter = 0
+        self.sync_token = None
+        self.connection = Connection(plan["host"], plan["port"])
+
+    async def call(self, label: str, method: str, path: str, body=None):
+        started = time.perf_counter()
+        try:
+            status, content = await self.connection.request(method, API + path, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as error:
+            self.stats.add(label, type(error).__name__, time.perf_counter() - started)
+            self.connection.close()
+            return None, b""
+        self.stats.add(label, status, time.perf_counter() - started)
+        if self.think:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think))
+        return status, content
+
+    async def browse(self):
+        rng, fixtures = self.rng, self.fixtures
+        choice = rng.randrange(6)
+        if choice == 0:
+            await self.call(
+                "GET material_component/", "GET", "/material_component/?view=summary"
+            )
+        elif choice == 1:
+            name = rng.choice(fixtures["names"])
+            query = name[: rng.randint(2, max(2, len(name)))]
+            await self.call(
+                "GET autocomplete/", "GET", f"/autocomplete/?q={quote(query)}"
+            )
+        elif choice == 2:
+            await self.call("GET characters/public/", "GET", "/characters/public/")
+        elif choice == 3:
+            await self.call("GET spellbooks/shared/", "GET", "/spellbooks/shared/")
+        elif choice == 4:
+            spellbook = rng.choice(fixtures["spellbooks"])
+            await self.call(
+                "GET spellbook/<id>/sheet/", "GET", f"/spellbook/{spellbook}/sheet/"
+            )
+        else:
+            spell = rng.choice(fixtures["spells"])
+            await self.call(
+                "GET spell/<id>/similar/", "GET", f"/spell/{spell}/similar/"
+            )
+
+    async def crud(self):
+        rng = self.rng
+        self.counter += 1
+        await self.call(
+            "POST material_component/",
+            "POST",
+            "/material_component/",
+            {
+                "name": f"Нагрузка {self.number}-{self.counter}",
+                "description": "Компонент нагрузочного теста",
+                "cost": f"{rng.randint(0, 50000) / 100:.2f}",
+            },
+        )
+        component = rng.choice(self.fixtures["components"])
+        path = f"/material_component/{component}/"
+        status, content = await self.call("GET material_component/<id>/", "GET", path)
+        if status == 200:
+            version = json.loads(content)["version"]
+            await self.call(
+                "PATCH material_component/<id>/",
+                "PATCH",
+                path,
+                {"cost": f"{rng.randint(0, 50000) / 100:.2f}", "version": version},
+            )
+        if self.scratch:
+            await self.call(
+                "DELETE material_component/<id>/",
+                "DELETE",
+                f"/material_component/{self.scratch.pop()}/",
+            )
+
+    async def _sync(self, label: str, operation: dict):
+        operation = {"id": str(uuid.UUID(int=self.rng.getrandbits(128))), **operation}
+        await self.call(
+            label, "POST", f"/player/{self.player}/sync/", {"operations": [operation]}
+        )
+
+    async def combat(self):
+        rng = self.rng
+        for _ in range(rng.randint(3, 8)):
+            if rng.random() < 0.7:
+                await self._sync(
+                    "POST player/<id>/sync/ use_slot",
+                    {
+                        "type": "use_slot",
+                        "spellbook": self.spellbook,
+                        "level": rng.randint(1, 3),
+                    },
+                )
+            else:
+                await self._sync(
+                    "POST player/<id>/sync/ change_hp",
+                    {
+                        "type": "change_hp",
+                        "person": self.person,
+                        "amount": -rng.randint(1, 12),
+                    },
+                )
+        await self.call(
+            "GET spellbook/<id>/sheet/", "GET", f"/spellbook/{self.spellbook}/sheet/"
+        )
+
+    async def rest(self):
+        await self._sync(
+            "POST player/<id>/sync/ long_rest",
+            {"type": "long_rest", "spellbook": self.spellbook},
+        )
+        await self._sync(
+            "POST player/<id>/sync/ change_hp",
+            {"type": "change_hp", "person": self.person, "amount": 1000},
+        )
+        await self.call(
+            "GET spellbook/<id>/sheet/", "GET", f"/spellbook/{self.spellbook}/sheet/"
+        )
+        path = f"/player/{self.player}/sync/"
+        if self.sync_token:
+            path += f"?since={self.sync_token}"
+        status, content = await self.call("GET player/<id>/sync/", "GET", path)
+        if status == 200:
+            self.sync_token = json.loads(content)["token"]
+
+    async def run(self, scenarios: list[str], weights: list[int], deadline: float):
+        try:
+            while time.perf_counter() < deadline:
+                scenario = self.rng.choices(scenarios, weights)[0]
+                await getattr(self, scenario)()
+        finally:
+            self.connection.close()
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Значения должны быть отсортированы"""
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def _summary(latencies: list[float], statuses: Counter, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    errors = sum(
+        count
+        for status, count in statuses.items()
+        if not isinstance(status, int)
+        or (status >= 400 and status not in (CONFLICT, THROTTLED))
+    )
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / seconds if seconds else 0.0,
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "errors": errors,
+        "conflicts": statuses.get(CONFLICT, 0),
+        "throttled": statuses.get(THROTTLED, 0),
+        "statuses": {str(status): count for status, count in statuses.items()},
+    }
+
+
+async def _run(plan: dict) -> dict:
+    stats = Stats()
+    mix = plan["mix"]
+    scenarios = [name for name in SCENARIOS if mix.get(name)]
+    weights = [mix[name] for name in scenarios]
+    started = time.perf_counter()
+    deadline = started + plan["warmup"] + plan["duration"]
+    users = [User(number, plan, stats) for number in range(plan["users"])]
+    tasks = [
+        asyncio.create_task(user.run(scenarios, weights, deadline)) for user in users
+    ]
+
+    # прогрев (кэши, индексы автодополнения) в статистику не попадает
+    await asyncio.sleep(plan["warmup"])
+    stats.recording = True
+    measured = time.perf_counter()
+    await asyncio.gather(*tasks)
+    seconds = time.perf_counter() - measured
+
+    total_latencies, total_statuses = [], Counter()
+    endpoints = {}
+    for label in sorted(stats.latencies):
+        endpoints[label] = _summary(
+            stats.latencies[label], stats.statuses[label], seconds
+        )
+        total_latencies.extend(stats.latencies[label])
+        total_statuses.update(stats.statuses[label])
+    return {
+        "users": plan["users"],
+        "seconds": seconds,
+        "total": _summary(total_latencies, total_statuses, seconds),
+        "endpoints": endpoints,
+    }
+
+
+def run(plan: dict) -> dict:
+    """
+    Прогнать смесь сценариев. ``plan``: host, port, users, duration и warmup
+    (с), think_ms, mix {сценарий: вес}, seed и fixtures - id объектов базы
+    """
+    return asyncio.run(_run(plan))
@@ -0,0 +1,311 @@
+"""Поиск почти-дубликатов заклинаний и сравнение по полям.
+
+Текст заклинания (описание и усиление) разбивается на шинглы - тройки
+соседних слов; сходство двух текстов - коэффициент Жаккара их шинглов.
+Он оценивается MinHash-сигнатурой из ``NUM_PERM`` значений: доля совпавших
+значений двух сигнатур - несмещенная оценка коэффициента.
+
+Сигнатура режется на ``BANDS`` полос по ``ROWS`` значений, хэш каждой
+полосы хранится в ``SpellSignatureBand`` с индексом (полоса, корзина).
+Кандидаты - заклинания, совпавшие хотя бы в одной полосе (LSH):
+это один запрос по индексу вместо сравнения со всем справочником.
+Вероятность найти пару со сходством s - 1 - (1 - s^ROWS)^BANDS. Полосы
+подобраны под самый низкий используемый порог (0.3 у ``closest_official``):
+при 32 полосах по 2 значения пары со сходством 0.3 находятся
+с вероятностью ~0.95, 0.5 - ~1.0. Цена - больше случайных кандидатов
+(~0.27 при сходстве 0.1), но они отсеиваются сравнением сигнатур.
+
+Сигнатуры пересчитываются после сохранения заклинания, только если
+изменился текст, и строятся заново командой ``build_spell_signatures``;
+хэш текста включает разбиение на полосы, поэтому после его смены команда
+перестраивает все сигнатуры.
+"""
+
+import difflib
+import hashlib
+import random
+import re
+import zlib
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+from spells.models import Spell, SpellSignature, SpellSignatureBand
+
+SHINGLE_SIZE = 3
+BANDS = 32
+ROWS = 2
+NUM_PERM = BANDS * ROWS
+
+# Параметры хэш-функций h(x) = (a * x + b) mod p; фиксированное зерно,
+# чтобы сигнатуры из разных процессов были сравнимы
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_random = random.Random(20240601)
+_PERMUTATIONS = tuple(
+    (_random.randrange(1, _PRIME), _random.randrange(0, _PRIME))
+    for _ in range(NUM_PERM)
+)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Поля, которые сравниваются целиком
+DIFF_FIELDS = (
+    "name",
+    "level",
+    "school__name",
+    "time__time",
+    "range",
+    "duration",
+    "concentration",
+    "ritual",
+    "verbal_component",
+    "somatic_component",
+    "attack_type",
+    "saving_throw_ability",
+    "damage_dice",
+    "higher_level_dice",
+    "source_book",
+)
+# Поля, которые сравниваются по словам
+TEXT_FIELDS = ("description", "higher_level")
+
+
+def signature_text(description: str, higher_level: str) -> str:
+    return f"{description or ''}\n{higher_level or ''}"
+
+
+def shingles(text: str) -> set[str]:
+    """Тройки соседних слов нормализованного текста"""
+    words = WORD_PATTERN.findall(text.lower().replace("ё", "е"))
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {
+        " ".join(words[i : i + SHINGLE_SIZE])
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(text: str) -> list[int]:
+    """MinHash-сигнатура текста (пустой список для пустого текста)"""
+    hashes = [zlib.crc32(shingle.encode()) for shingle in shingles(text)]
+    if not hashes:
+        return []
+    return [
+        min((a * value + b) % _PRIME for value in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def bands(signature: list[int]) -> list[int]:
+    """Корзины полос сигнатуры (знаковые 64-битные числа)"""
+    buckets = []
+    for band in range(BANDS if signature else 0):
+        rows = signature[band * ROWS : (band + 1) * ROWS]
+        digest = hashlib.blake2b(repr(rows).encode(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
+
+
+def estimate_similarity(left: list[int], right: list[int]) -> float:
+    """Оценка коэффициента Жаккара по двум сигнатурам"""
+    if not left or not right:
+        return 0.0
+    return sum(a == b for a, b in zip(left, right, strict=True)) / NUM_PERM
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(f"{BANDS}x{ROWS}:{text}".encode()).hexdigest()
+
+
+def _save_signature(spell_id: int, text_hash: str, signature: list[int]) -> None:
+    with transaction.atomic():
+        SpellSignature.objects.update_or_create(
+            spell_id=spell_id,
+            defaults={"text_hash": text_hash, "minhash": signature},
+        )
+        SpellSignatureBand.objects.filter(spell_id=spell_id).delete()
+        SpellSignatureBand.objects.bulk_create(
+            SpellSignatureBand(spell_id=spell_id, band=band, bucket=bucket)
+            for band, bucket in enumerate(bands(signature))
+        )
+
+
+def update_signature(spell_id: int, text: str | None = None) -> bool:
+    """Пересчитать сигнатуру, если текст изменился. True - пересчитана"""
+    if text is None:
+        row = (
+            Spell.objects.filter(id=spell_id)
+            .values("description", "higher_level")
+            .first()
+        )
+        if row is None:
+            return False
+        text = signature_text(row["description"], row["higher_level"])
+
+    text_hash = _text_hash(text)
+    if SpellSignature.objects.filter(spell_id=spell_id, text_hash=text_hash).exists():
+        return False
+    _save_signature(spell_id, text_hash, minhash(text))
+    return True
+
+
+def rebuild_signatures() -> int:
+    """Построить недостающие и устаревшие сигнатуры всех заклинаний"""
+    known = dict(SpellSignature.objects.values_list("spell_id", "text_hash"))
+    rows = Spell.objects.values_list("id", "description", "higher_level")
+    updated = 0
+    for spell_id, description, higher_level in rows.iterator():
+        text = signature_text(description, higher_level)
+        text_hash = _text_hash(text)
+        if known.get(spell_id) != text_hash:
+            _save_signature(spell_id, text_hash, minhash(text))
+            updated += 1
+    return updated
+
+
+def _signature_of(spell_id: int) -> list[int] | None:
+    signature = (
+        SpellSignature.objects.filter(spell_id=spell_id)
+        .values_list("minhash", flat=True)
+        .first()
+    )
+    if signature is None and update_signature(spell_id):
+        return _signature_of(spell_id)
+    return signature
+
+
+def find_near_duplicates(
+    spell_id: int,
+    threshold: float = 0.5,
+    limit: int = 10,
+    official: bool | None = None,
+) -> list[dict] | None:
+    """
+    Заклинания с оценкой сходства текста не ниже ``threshold``,
+    по убыванию сходства. None - заклинания нет
+    """
+    signature = _signature_of(spell_id)
+    if signature is None:
+        return None
+    if not signature:
+        return []
+
+    same_bucket = reduce(
+        or_,
+        (Q(band=band, bucket=bucket) for band, bucket in enumerate(bands(signature))),
+    )
+    candidates = (
+        SpellSignatureBand.objects.filter(same_bucket)
+        .exclude(spell_id=spell_id)
+        .values("spell_id")
+    )
+    rows = SpellSignature.objects.filter(spell_id__in=candidates)
+    if official is not None:
+        rows = rows.filter(spell__is_official=official)
+
+    found = []
+    for other_id, other, name, is_official in rows.values_list(
+        "spell_id", "minhash", "spell__name", "spell__is_official"
+    ):
+        similarity = estimate_similarity(signature, other)
+        if similarity >= threshold:
+            found.append(
+                {
+                    "id": other_id,
+                    "name": name,
+                    "is_official": is_official,
+                    "similarity": round(similarity, 4),
+                }
+            )
+    found.sort(key=lambda item: (-item["similarity"], item["id"]))
+    return found[:limit]
+
+
+def closest_official(spell_id: int, threshold: float = 0.3) -> dict | None:
+    """Ближайшее официальное заклинание или None"""
+    found = find_near_duplicates(spell_id, threshold, limit=1, official=True)
+    return found[0] if found else None
+
+
+def _text_diff(left: str, right: str) -> dict:
+    left_words, right_words = left.split(), right.split()
+    matcher = difflib.SequenceMatcher(None, left_words, right_words, autojunk=False)
+    return {
+        "ratio": round(matcher.ratio(), 4),
+        "ops": [
+            {
+                "op": tag,
+                "left": " ".join(left_words[i1:i2]),
+                "right": " ".join(right_words[j1:j2]),
+            }
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        ],
+    }
+
+
+def _material_names(spell_ids) -> dict[int, set[str]]:
+    names = {spell_id: set() for spell_id in spell_ids}
+    rows = Spell.material_components.through.objects.filter(
+        spell_id__in=spell_ids
+    ).values_list("spell_id", "materialcomponent__name")
+    for spell_id, name in rows:
+        names[spell_id].add(name)
+    return names
+
+
+def diff_spells(left_id: int, right_id: int) -> dict | None:
+    """Различия двух заклинаний по полям. None - одного из них нет"""
+    rows = {
+        row["id"]: row
+        for row in Spell.objects.filter(id__in=(left_id, right_id)).values(
+            "id", "is_official", *DIFF_FIELDS, *TEXT_FIELDS
+        )
+    }
+    if left_id not in rows or right_id not in rows:
+        return None
+    left, right = rows[left_id], rows[right_id]
+
+    fields = {
+        name: {"left": left[name], "right": right[name]}
+        for name in DIFF_FIELDS
+        if left[name] != right[name]
+    }
+    materials = _material_names((left_id, right_id))
+    if materials[left_id] != materials[right_id]:
+        fields["material_components"] = {
+            "removed": sorted(materials[left_id] - materials[right_id]),
+            "added": sorted(materials[right_id] - materials[left_id]),
+        }
+
+    signatures = dict(
+        SpellSignature.objects.filter(spell_id__in=(left_id, right_id)).values_list(
+            "spell_id", "minhash"
+        )
+    )
+    return {
+        "left": {
+            "id": left_id,
+            "name": left["name"],
+            "is_official": left["is_official"],
+        },
+        "right": {
+            "id": right_id,
+            "name": right["name"],
+            "is_official": right["is_official"],
+        },
+        "similarity": round(
+            estimate_similarity(
+                signatures.get(left_id, []), signatures.get(right_id, [])
+            ),
+            4,
+        ),
+        "fields": fields,
+        "text": {
+            name: _text_diff(left[name] or "", right[name] or "")
+            for name in TEXT_FIELDS
+            if left[name] != right[name]
+        },
+    }
@@ -0,0 +1,80 @@
+"""Производные структуры справочника в памяти процесса.
+
+Индексы, которые нужны на каждый запрос (признаки заклинаний для
+рекомендаций и подбора против столкновения), не хранятся в общем кэше:
+иначе каждый запрос распаковывал бы их целиком. Процесс держит свою копию,
+помеченную поколением ``scope``:
+
+* при смене поколения или не реже раза в ``ttl_setting`` с (если задано)
+  копия строится заново, одна сборка на процесс (см. ``coalesce``);
+* изменение одного объекта в этом процессе строит исправленную копию
+  (``changed``) и подменяет ее целиком - опубликованная копия не меняется,
+  поэтому читается без блокировок; остальные процессы перестраиваются
+  по новому поколению.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+
+from spells.services.coalescing import coalesce
+from spells.services.generations import bump_generation, get_generation
+
+# Время жизни копии по умолчанию, с
+DEFAULT_TTL = 600
+
+
+class ProcessCache:
+    """Значение ``build()`` в памяти процесса, помеченное поколением ``scope``"""
+
+    def __init__(self, scope: str, build, ttl_setting: str | None = None):
+        self.scope = scope
+        self.build = build
+        self.ttl_setting = ttl_setting
+        self._value = None
+        self._generation = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, generation: int) -> bool:
+        if self._value is None or self._generation != generation:
+            return False
+        if self.ttl_setting is None:
+            return True
+        ttl = getattr(settings, self.ttl_setting, DEFAULT_TTL)
+        return time.monotonic() - self._built_at < ttl
+
+    def _store(self, value, generation: int, built_at: float) -> None:
+        self._value, self._generation, self._built_at = value, generation, built_at
+
+    def get(self):
+        """Копия процесса, перестроенная при смене поколения или по времени"""
+        generation = get_generation(self.scope)
+        with self._lock:
+            if self._is_fresh(generation):
+                return self._value
+
+        def rebuild():
+            built_at = time.monotonic()
+            value = self.build()
+            with self._lock:
+                self._store(value, generation, built_at)
+            return value
+
+        return coalesce(f"spells:process:{self.scope}:{generation}", rebuild)
+
+    def changed(self, update) -> None:
+        """
+        Объект изменился: сменить поколение и, если копия процесса видела
+        все прошлые изменения, подменить ее на ``update(копия)``.
+        ``update`` вызывается под блокировкой - данные из БД читаются заранее
+        """
+        generation = bump_generation(self.scope)
+        with self._lock:
+            if self._value is not None and self._generation == generation - 1:
+                self._store(update(self._value), generation, self._built_at)
+
+    def invalidate(self) -> None:
+        """Изменение, которое нельзя учесть точечно: перестроить во всех процессах"""
+        bump_generation(self.scope)
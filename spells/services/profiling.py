@@ -0,0 +1,242 @@
+"""Профилирование запросов к API (``ProfilingMiddleware``).
+
+* По заголовку ``X-Spells-Profile`` (сотрудникам или с токеном
+  ``SPELLS_PROFILING_TOKEN``) запрос выполняется под cProfile;
+  одновременно профилируется не больше одного запроса.
+* При ``SPELLS_SLOW_REQUEST_MS`` фоновый поток раз в
+  ``SPELLS_PROFILE_SAMPLE_INTERVAL_MS`` снимает стеки запросов, которые
+  идут дольше порога; если запрос так и оказался медленным, сохраняются
+  свернутые стеки (формат flamegraph: ``кадр;кадр;... число``).
+
+В обоих случаях записываются запросы к БД, сгруппированные по тексту SQL,
+и отчет сохраняется в ``ProfileReport``. Если оба режима выключены,
+middleware не подключается вовсе.
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from spells.models import ProfileReport
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Spells-Profile"
+PROFILE_ID_HEADER = "X-Spells-Profile-Id"
+# Сколько строк статистики cProfile, стеков и запросов сохранять
+TOP_FUNCTIONS = 60
+TOP_STACKS = 50
+TOP_QUERIES = 20
+MAX_STACK_DEPTH = 64
+
+
+class QueryRecorder:
+    """Обертка execute_wrapper: число, время и самые долгие запросы"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            statement = self.statements[sql]
+            statement[0] += 1
+            statement[1] += elapsed
+
+    def top(self) -> list[dict]:
+        """Запросы с одинаковым SQL (без параметров) вместе, самые долгие первыми"""
+        statements = sorted(self.statements.items(), key=lambda item: -item[1][1])
+        return [
+            {"sql": sql, "count": count, "ms": round(seconds * 1000, 2)}
+            for sql, (count, seconds) in statements[:TOP_QUERIES]
+        ]
+
+
+@contextmanager
+def record_queries():
+    """Записывать запросы ко всем базам этого потока"""
+    recorder = QueryRecorder()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+def is_requested(request) -> bool:
+    """Запрошено ли профилирование заголовком (и разрешено ли оно)"""
+    value = request.headers.get(PROFILE_HEADER)
+    if not value:
+        return False
+    token = getattr(settings, "SPELLS_PROFILING_TOKEN", None)
+    if token and value == token:
+        return True
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_staff)
+
+
+def save_report(request, response, kind, duration, recorder, report):
+    """Сохранить отчет; ошибка сохранения не должна ломать ответ"""
+    match = getattr(request, "resolver_match", None)
+    try:
+        return ProfileReport.objects.create(
+            kind=kind,
+            method=request.method,
+            path=request.get_full_path()[:500],
+            view=(match.view_name if match else "")[:200],
+            status_code=response.status_code,
+            duration_ms=round(duration * 1000, 2),
+            sql_count=recorder.count,
+            sql_ms=round(recorder.seconds * 1000, 2),
+            queries=recorder.top(),
+            report=report,
+        )
+    except Exception:
+        logger.exception("Не удалось сохранить профиль запроса %s", request.path)
+        return None
+
+
+_profile_lock = threading.Lock()
+
+
+def profile(request, get_response):
+    """Выполнить запрос под cProfile и сохранить статистику"""
+    # два профилировщика одновременно в процессе работать не могут
+    if not _profile_lock.acquire(blocking=False):
+        response = get_response(request)
+        response[PROFILE_HEADER] = "busy"
+        return response
+    try:
+        profiler = cProfile.Profile()
+        with record_queries() as recorder:
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - started
+    finally:
+        _profile_lock.release()
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+    kind = ProfileReport.Kind.PROFILE
+    report = save_report(request, response, kind, duration, recorder, stream.getvalue())
+    if report is not None:
+        response[PROFILE_ID_HEADER] = str(report.id)
+    return response
+
+
+def collapse(frame) -> str:
+    """Стек кадра одной строкой: от внешнего вызова к текущему"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", "?")
+        names.append(f"{module}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler:
+    """Фоновый поток, снимающий стеки запросов дольше порога"""
+
+    def __init__(self, threshold: float, interval: float):
+        self.threshold = threshold
+        self.interval = interval
+        self._requests: dict[int, tuple[float, Counter]] = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="spells-profile-sampler", daemon=True
+            )
+            self._thread.start()
+
+    def start(self) -> Counter:
+        """Начать отслеживать запрос текущего потока"""
+        samples = Counter()
+        with self._lock:
+            self._ensure_started()
+            self._requests[threading.get_ident()] = (time.perf_counter(), samples)
+        return samples
+
+    def finish(self) -> None:
+        with self._lock:
+            self._requests.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._requests:
+                    continue
+                now = time.perf_counter()
+                slow = [
+                    (ident, samples)
+                    for ident, (started, samples) in self._requests.items()
+                    if now - started >= self.threshold
+                ]
+                if not slow:
+                    continue
+                frames = sys._current_frames()
+                for ident, samples in slow:
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[collapse(frame)] += 1
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> Sampler:
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = Sampler(
+                settings.SPELLS_SLOW_REQUEST_MS / 1000,
+                getattr(settings, "SPELLS_PROFILE_SAMPLE_INTERVAL_MS", 5) / 1000,
+            )
+        return _sampler
+
+
+def sample(request, get_response):
+    """Выполнить запрос; если он медленный - сохранить стеки и запросы к БД"""
+    sampler = get_sampler()
+    with record_queries() as recorder:
+        samples = sampler.start()
+        started = time.perf_counter()
+        try:
+            response = get_response(request)
+        finally:
+            sampler.finish()
+        duration = time.perf_counter() - started
+
+    if duration >= sampler.threshold:
+        stacks = "\n".join(
+            f"{stack} {count}" for stack, count in samples.most_common(TOP_STACKS)
+        )
+        save_report(
+            request, response, ProfileReport.Kind.SAMPLED, duration, recorder, stacks
+        )
+    return response
@@ -0,0 +1,203 @@
+"""Публикация общих спеллбуков и публичных персонажей.
+
+Публикация превращает источник в канонический JSON, хэширует его
+и сохраняет как неизменяемую версию ``PublishedSnapshot``. Если содержимое
+не изменилось, новая версия не создается. Просмотр версии по хэшу
+обслуживается из кэша без обращения к ORM, но только пока источник
+остается опубликованным.
+"""
+
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from spells.models import Person, PublishedSnapshot, Spellbook
+from spells.services.coalescing import get_or_set
+from spells.services.spellbook_sheet import build_sheet
+
+# Состояние ячеек и время использования меняются на каждой игре
+# и не должны порождать новые версии опубликованного спеллбука
+VOLATILE_SHEET_KEYS = ("updated_at", "last_used", "slots", "warlock", "is_active")
+
+_PERSON_FIELDS = (
+    "id",
+    "name",
+    "race",
+    "subrace",
+    "alignment",
+    "background",
+    "primary_class_level",
+    "second_class_level",
+    "warlock_level",
+    "strength",
+    "dexterity",
+    "constitution",
+    "intelligence",
+    "wisdom",
+    "charisma",
+    "max_hit_points",
+    "armor_class",
+    "initiative_bonus",
+    "speed",
+    "proficiency_bonus",
+    "spellcasting_ability",
+)
+
+
+# Поля спеллбука и персонажа, видимые в опубликованных версиях: изменение
+# остальных (ячейки, хиты, время использования) перепубликации не требует
+SPELLBOOK_PUBLISHED_FIELDS = ("name", "description", "is_shared", "owner")
+PERSON_PUBLISHED_FIELDS = (
+    *_PERSON_FIELDS[1:],
+    "is_public",
+    "character_class",
+    "subclass",
+    "second_class",
+    "second_subclass",
+)
+
+
+def _entry_key(content_hash: str) -> str:
+    return f"spells:snapshot:entry:{content_hash}"
+
+
+def _latest_key(kind: str, object_id: int) -> str:
+    return f"spells:snapshot:latest:{kind}:{object_id}"
+
+
+def spellbook_payload(spellbook_id: int) -> dict | None:
+    sheet = build_sheet(spellbook_id)
+    if sheet is None or not sheet["is_shared"]:
+        return None
+    return {k: v for k, v in sheet.items() if k not in VOLATILE_SHEET_KEYS}
+
+
+def person_payload(person_id: int) -> dict | None:
+    row = (
+        Person.objects.filter(id=person_id, is_public=True)
+        .values(
+            *_PERSON_FIELDS,
+            "character_class__name",
+            "subclass__name",
+            "second_class__name",
+            "second_subclass__name",
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    caster = Person(**{name: row[name] for name in _PERSON_FIELDS})
+    payload = {name: row[name] for name in _PERSON_FIELDS}
+    payload.update(
+        character_class=row["character_class__name"],
+        subclass=row["subclass__name"],
+        second_class=row["second_class__name"],
+        second_subclass=row["second_subclass__name"],
+        level=caster.level,
+        spell_save_dc=caster.spell_save_dc,
+        spell_attack_bonus=caster.spell_attack_bonus,
+        shared_spellbooks=list(
+            Spellbook.objects.filter(owner_id=person_id, is_shared=True)
+            .order_by("name")
+            .values("id", "name")
+        ),
+    )
+    return payload
+
+
+PAYLOAD_BUILDERS = {
+    PublishedSnapshot.Kind.SPELLBOOK: spellbook_payload,
+    PublishedSnapshot.Kind.PERSON: person_payload,
+}
+
+
+def publish(kind: str, object_id: int) -> PublishedSnapshot | None:
+    """
+    Опубликовать текущее состояние источника.
+    Возвращает версию (новую или уже существующую с тем же содержимым)
+    либо None, если источник больше не публичный.
+    """
+    payload = PAYLOAD_BUILDERS[kind](object_id)
+    if payload is None:
+        cache.delete(_latest_key(kind, object_id))
+        return None
+
+    content = json.dumps(
+        payload, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    )
+    content_hash = hashlib.sha256(content.encode()).hexdigest()
+    snapshot, _ = PublishedSnapshot.objects.get_or_create(
+        content_hash=content_hash,
+        defaults={"kind": kind, "object_id": object_id, "payload": content},
+    )
+    entry = (snapshot.kind, snapshot.object_id, content.encode())
+    cache.set(_entry_key(content_hash), entry, timeout=None)
+    cache.set(_latest_key(kind, object_id), content_hash, timeout=None)
+    return snapshot
+
+
+def sync_publication(kind: str, object_id: int, is_public: bool) -> bool:
+    """
+    Запланировать перепубликацию после коммита, если источник публичный
+    или был опубликован раньше (тогда публикация снимет указатель).
+    Возвращает True, если перепубликация запланирована.
+    """
+    if not is_public and cache.get(_latest_key(kind, object_id)) is None:
+        return False
+    transaction.on_commit(lambda: publish(kind, object_id))
+    return True
+
+
+def republish_shared_spellbooks(condition: Q) -> None:
+    """Запланировать перепубликацию общих спеллбуков, подходящих под условие"""
+    shared = Spellbook.objects.filter(condition, is_shared=True).distinct()
+    for spellbook_id in shared.values_list("id", flat=True):
+        sync_publication(PublishedSnapshot.Kind.SPELLBOOK, spellbook_id, True)
+
+
+def _load_entry(content_hash: str) -> tuple[str, int, bytes] | None:
+    row = (
+        PublishedSnapshot.objects.filter(content_hash=content_hash)
+        .values_list("kind", "object_id", "payload")
+        .first()
+    )
+    if row is None:
+        return None
+    kind, object_id, payload = row
+    return kind, object_id, payload.encode()
+
+
+def get_blob(content_hash: str) -> bytes | None:
+    """
+    Содержимое версии по хэшу, если источник все еще опубликован.
+    В базу идет только при промахе кэша
+    """
+    entry = get_or_set(
+        _entry_key(content_hash), lambda: _load_entry(content_hash), timeout=None
+    )
+    if entry is None:
+        return None
+    kind, object_id, blob = entry
+    # снятие с публикации удаляет указатель на последнюю версию
+    if latest_hash(kind, object_id) is None:
+        return None
+    return blob
+
+
+def _republish_hash(kind: str, object_id: int) -> str | None:
+    snapshot = publish(kind, object_id)
+    return snapshot.content_hash if snapshot else None
+
+
+def latest_hash(kind: str, object_id: int) -> str | None:
+    """Хэш последней опубликованной версии источника (None - не опубликован)"""
+    # Указатель вытеснен из кэша: публикация идемпотентна,
+    # поэтому проще всего пересобрать его из источника
+    return get_or_set(
+        _latest_key(kind, object_id),
+        lambda: _republish_hash(kind, object_id),
+        timeout=None,
+    )
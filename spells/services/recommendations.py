@@ -0,0 +1,390 @@
+"""Рекомендации заклинаний для спеллбука.
+
+Рекомендация складывается из двух сигналов:
+
+* похожесть по содержанию - косинус между разреженными бинарными векторами
+  признаков заклинаний (школа, уровень, механика, категории эффектов,
+  типы урона, компоненты, классы) с весами idf;
+* совместный выбор - сколько спеллбуков содержат заклинание вместе
+  с уже выбранными (таблица ``SpellCooccurrence``).
+
+Векторы признаков хранятся в памяти процесса как инвертированный индекс
+(признак -> id заклинаний), поэтому произведение разреженного запроса
+на матрицу признаков проходит только по ненулевым элементам.
+Изменение заклинаний правит индекс точечно (``spells_changed``), веса idf
+при этом не пересчитываются - индекс перестраивается целиком не реже
+раза в ``SPELLS_FEATURES_TTL`` с. Таблица совместного выбора
+обновляется инкрементально из сигналов M2M и полностью пересчитывается
+командой ``build_spell_recommendations``.
+"""
+
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from spells.models import Spell, Spellbook, SpellCooccurrence
+from spells.services.process_cache import ProcessCache
+
+# Вклад совместного выбора относительно похожести по содержанию
+COOCCURRENCE_WEIGHT = 1.0
+
+BATCH_SIZE = 1000
+
+CLASS_PREFIX = "class:"
+# Признаки, которые берутся из строки заклинания
+SPELL_FEATURE_FIELDS = (
+    "name",
+    "level",
+    "school",
+    "attack_type",
+    "saving_throw_ability",
+    "verbal_component",
+    "somatic_component",
+    "concentration",
+    "ritual",
+)
+
+
+@dataclass
+class FeatureIndex:
+    """Разреженная матрица признаков заклинаний в виде инвертированного индекса"""
+
+    features: dict[int, tuple[str, ...]] = field(default_factory=dict)
+    postings: dict[str, list[int]] = field(default_factory=dict)
+    weights: dict[str, float] = field(default_factory=dict)
+    norms: dict[int, float] = field(default_factory=dict)
+    titles: dict[int, tuple[str, int]] = field(default_factory=dict)
+    class_spells: dict[int, frozenset[int]] = field(default_factory=dict)
+
+    def replaced(self, spell_ids, features: dict, titles: dict) -> "FeatureIndex":
+        """
+        Копия индекса с новыми признаками заклинаний ``spell_ids``
+        (``features``, ``titles`` - из ``_collect_features``; заклинаний,
+        которых там нет, больше нет в справочнике). Веса idf существующих
+        признаков не пересчитываются. Сам индекс не меняется: его могут
+        одновременно читать другие потоки
+        """
+        index = FeatureIndex(
+            features=dict(self.features),
+            postings=dict(self.postings),
+            weights=dict(self.weights),
+            norms=dict(self.norms),
+            titles=dict(self.titles),
+            class_spells=dict(self.class_spells),
+        )
+        # списки общие с исходным индексом - меняются только их копии
+        copied = set()
+
+        def postings(feature: str) -> list[int]:
+            if feature not in copied:
+                copied.add(feature)
+                index.postings[feature] = list(index.postings.get(feature, ()))
+            return index.postings[feature]
+
+        for spell_id in spell_ids:
+            old = set(index.features.get(spell_id, ()))
+            new = features.get(spell_id, set())
+            for feature in old - new:
+                postings(feature).remove(spell_id)
+            for feature in new - old:
+                postings(feature).append(spell_id)
+            for feature in old ^ new:
+                if feature.startswith(CLASS_PREFIX):
+                    class_id = int(feature.removeprefix(CLASS_PREFIX))
+                    spells = index.class_spells.get(class_id, frozenset())
+                    spells ^= {spell_id}
+                    if spells:
+                        index.class_spells[class_id] = spells
+                    else:
+                        index.class_spells.pop(class_id, None)
+            if spell_id in titles:
+                index.features[spell_id] = tuple(sorted(new))
+                index.titles[spell_id] = titles[spell_id]
+            else:
+                index.features.pop(spell_id, None)
+                index.titles.pop(spell_id, None)
+                index.norms.pop(spell_id, None)
+
+        for feature in copied:
+            if not index.postings[feature]:
+                del index.postings[feature]
+            elif feature not in index.weights:
+                index.weights[feature] = _idf(
+                    len(index.features), len(index.postings[feature])
+                )
+        for spell_id in spell_ids:
+            if spell_id in index.features:
+                index.norms[spell_id] = _norm(index.features[spell_id], index.weights)
+        return index
+
+    def query_vector(self, spell_ids) -> dict[str, float]:
+        """Сумма векторов заклинаний (с весами idf)"""
+        vector = Counter()
+        for spell_id in spell_ids:
+            for feature in self.features.get(spell_id, ()):
+                vector[feature] += self.weights[feature]
+        return vector
+
+    def similarity(self, vector: dict[str, float]) -> dict[int, float]:
+        """Косинус запроса со всеми заклинаниями, имеющими общие признаки"""
+        query_norm = math.sqrt(sum(value * value for value in vector.values()))
+        if not query_norm:
+            return {}
+        scores = defaultdict(float)
+        for feature, value in vector.items():
+            contribution = value * self.weights[feature]
+            for spell_id in self.postings[feature]:
+                scores[spell_id] += contribution
+        return {
+            spell_id: score / (query_norm * self.norms[spell_id])
+            for spell_id, score in scores.items()
+        }
+
+
+def _idf(total: int, count: int) -> float:
+    return math.log((1 + total) / (1 + count)) + 1
+
+
+def _norm(features, weights: dict[str, float]) -> float:
+    return math.sqrt(sum(weights[feature] ** 2 for feature in features)) or 1.0
+
+
+def _collect_features(spell_ids=None) -> tuple[dict[int, set[str]], dict, dict]:
+    """Признаки всех заклинаний или только ``spell_ids``"""
+    features = defaultdict(set)
+    titles = {}
+    class_spells = defaultdict(set)
+
+    spells = Spell.objects.all()
+    effects = Spell.effects.through.objects.all()
+    materials = Spell.material_components.through.objects.all()
+    classes = Spell.aviable_classes.through.objects.all()
+    if spell_ids is not None:
+        spells = spells.filter(id__in=spell_ids)
+        effects = effects.filter(spell_id__in=spell_ids)
+        materials = materials.filter(spell_id__in=spell_ids)
+        classes = classes.filter(spell_id__in=spell_ids)
+
+    spells = spells.values(
+        "id",
+        "name",
+        "level",
+        "school_id",
+        "attack_type",
+        "saving_throw_ability",
+        "verbal_component",
+        "somatic_component",
+        "concentration",
+        "ritual",
+    )
+    for row in spells:
+        spell_features = features[row["id"]]
+        titles[row["id"]] = (row["name"], row["level"])
+        spell_features.add(f"level:{row['level']}")
+        spell_features.add(f"attack:{row['attack_type']}")
+        if row["school_id"]:
+            spell_features.add(f"school:{row['school_id']}")
+        if row["saving_throw_ability"]:
+            spell_features.add(f"save:{row['saving_throw_ability']}")
+        for flag, name in (
+            ("verbal_component", "component:V"),
+            ("somatic_component", "component:S"),
+            ("concentration", "concentration"),
+            ("ritual", "ritual"),
+        ):
+            if row[flag]:
+                spell_features.add(name)
+
+    effects = effects.values_list(
+        "spell_id", "effect__category", "effect__damage_type_id"
+    )
+    for spell_id, category, damage_type_id in effects:
+        if category:
+            features[spell_id].add(f"effect:{category}")
+        if damage_type_id:
+            features[spell_id].add(f"damage:{damage_type_id}")
+
+    materials = materials.values_list("spell_id", flat=True).distinct()
+    for spell_id in materials:
+        features[spell_id].add("component:M")
+
+    classes = classes.values_list("spell_id", "characterclass_id")
+    for spell_id, class_id in classes:
+        features[spell_id].add(f"{CLASS_PREFIX}{class_id}")
+        class_spells[class_id].add(spell_id)
+
+    return features, titles, class_spells
+
+
+def build_feature_index() -> FeatureIndex:
+    """Посчитать векторы признаков всех заклинаний"""
+    features, titles, class_spells = _collect_features()
+
+    postings = defaultdict(list)
+    for spell_id, spell_features in features.items():
+        for feature in spell_features:
+            postings[feature].append(spell_id)
+
+    total = len(features) or 1
+    weights = {feature: _idf(total, len(ids)) for feature, ids in postings.items()}
+    norms = {
+        spell_id: _norm(spell_features, weights)
+        for spell_id, spell_features in features.items()
+    }
+    return FeatureIndex(
+        features={k: tuple(sorted(v)) for k, v in features.items()},
+        postings=dict(postings),
+        weights=weights,
+        norms=norms,
+        titles=titles,
+        class_spells={k: frozenset(v) for k, v in class_spells.items()},
+    )
+
+
+_features = ProcessCache(
+    "recommendation_features", build_feature_index, "SPELLS_FEATURES_TTL"
+)
+
+
+def get_feature_index() -> FeatureIndex:
+    """Индекс признаков процесса (см. spells.services.process_cache)"""
+    return _features.get()
+
+
+def spells_changed(spell_ids) -> None:
+    """Признаки заклинаний изменились (или они удалены) - поправить индекс"""
+    spell_ids = set(spell_ids)
+    features, titles, _ = _collect_features(spell_ids)
+    _features.changed(lambda index: index.replaced(spell_ids, features, titles))
+
+
+def features_changed() -> None:
+    """Изменение, затрагивающее признаки многих заклинаний (эффект, класс)"""
+    _features.invalidate()
+
+
+def rebuild_cooccurrence() -> int:
+    """Полностью пересчитать таблицу совместного выбора"""
+    through = Spellbook.spells.through
+    pairs = (
+        through.objects.annotate(other_id=F("spellbook__spells"))
+        .exclude(other_id=F("spell_id"))
+        .values("spell_id", "other_id")
+        .annotate(count=Count("spellbook_id"))
+        .order_by()
+    )
+    created = 0
+    with transaction.atomic():
+        SpellCooccurrence.objects.all().delete()
+        batch = []
+        for row in pairs.iterator():
+            batch.append(SpellCooccurrence(**row))
+            if len(batch) >= BATCH_SIZE:
+                created += len(SpellCooccurrence.objects.bulk_create(batch))
+                batch = []
+        created += len(SpellCooccurrence.objects.bulk_create(batch))
+    return created
+
+
+def update_cooccurrence(spellbook_spells, changed_spells, delta: int) -> None:
+    """
+    Инкрементально учесть добавление (delta=1) или удаление (delta=-1)
+    заклинаний ``changed_spells`` в спеллбуке с заклинаниями ``spellbook_spells``
+    (множество может включать и сами ``changed_spells``)
+    """
+    changed = set(changed_spells)
+    spellbook_spells = set(spellbook_spells) | changed
+    if len(spellbook_spells) < 2 or not changed:
+        return
+
+    if delta > 0:
+        # новые пары создаются с нулем, затем все пары увеличиваются одним UPDATE
+        SpellCooccurrence.objects.bulk_create(
+            [
+                SpellCooccurrence(spell_id=a, other_id=b)
+                for a in changed
+                for b in spellbook_spells
+                if a != b
+            ]
+            + [
+                SpellCooccurrence(spell_id=b, other_id=a)
+                for a in changed
+                for b in spellbook_spells - changed
+            ],
+            ignore_conflicts=True,
+        )
+    rows = SpellCooccurrence.objects.filter(
+        Q(spell_id__in=changed, other_id__in=spellbook_spells)
+        | Q(spell_id__in=spellbook_spells, other_id__in=changed)
+    )
+    if delta < 0:
+        rows = rows.filter(count__gt=0)
+    rows.update(count=F("count") + delta)
+
+
+def recommend(spell_ids, class_ids=(), exclude=(), limit: int = 20) -> list[dict]:
+    """Заклинания, похожие на ``spell_ids`` или выбираемые вместе с ними"""
+    index = get_feature_index()
+    scores = index.similarity(index.query_vector(spell_ids))
+
+    cooccurrence = defaultdict(int)
+    rows = SpellCooccurrence.objects.filter(
+        spell_id__in=list(spell_ids), count__gt=0
+    ).values_list("other_id", "count")
+    for other_id, count in rows:
+        cooccurrence[other_id] += count
+    if cooccurrence:
+        top = max(cooccurrence.values())
+        for other_id, count in cooccurrence.items():
+            scores[other_id] = scores.get(other_id, 0.0) + (
+                COOCCURRENCE_WEIGHT * count / top
+            )
+
+    allowed = None
+    if class_ids:
+        allowed = frozenset().union(
+            *(index.class_spells.get(class_id, ()) for class_id in class_ids)
+        )
+    skip = set(spell_ids) | set(exclude)
+
+    ranked = sorted(
+        (
+            (score, spell_id)
+            for spell_id, score in scores.items()
+            if spell_id not in skip
+            and spell_id in index.titles
+            and (allowed is None or spell_id in allowed)
+        ),
+        key=lambda item: (-item[0], item[1]),
+    )
+    return [
+        {
+            "id": spell_id,
+            "name": index.titles[spell_id][0],
+            "level": index.titles[spell_id][1],
+            "score": round(score, 4),
+            "cooccurrence": cooccurrence.get(spell_id, 0),
+        }
+        for score, spell_id in ranked[:limit]
+    ]
+
+
+def recommend_for_spellbook(spellbook_id: int, limit: int = 20) -> list[dict] | None:
+    """Рекомендации для спеллбука с учетом классов владельца"""
+    owner = (
+        Spellbook.objects.filter(id=spellbook_id)
+        .values("owner__character_class_id", "owner__second_class_id")
+        .first()
+    )
+    if owner is None:
+        return None
+    class_ids = [class_id for class_id in owner.values() if class_id]
+    spell_ids = list(
+        Spellbook.spells.through.objects.filter(spellbook_id=spellbook_id).values_list(
+            "spell_id", flat=True
+        )
+    )
+    return recommend(spell_ids, class_ids=class_ids, limit=limit)
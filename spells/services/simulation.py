@@ -0,0 +1,149 @@
+"""Оценка исхода накладывания заклинания по цели.
+
+Все величины считаются точно по распределениям костей из ``dice``:
+
+* бросок атаки - d20 + бонус атаки заклинаниями против КД цели,
+  натуральная 20 - критическое попадание (кости урона удваиваются),
+  натуральная 1 - промах;
+* спасбросок - d20 + бонус спасброска цели против СЛ заклинаний,
+  при успехе цель получает половину урона;
+* автоматическое заклинание всегда наносит полный урон.
+
+Результат по одной тройке (кости, механика, параметры броска) кэшируется,
+поэтому пакетная оценка многих заклинаний повторяет работу только
+для действительно разных комбинаций.
+"""
+
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+
+from spells.models import Spell
+from spells.services.dice import DiceExpression, convolve, parse
+
+D20 = range(1, 21)
+
+PERCENTILES = (10, 50, 90)
+
+
+@dataclass(frozen=True)
+class CastEstimate:
+    """Оценка исхода одного накладывания"""
+
+    expected_damage: float
+    min_damage: int
+    max_damage: int
+    # вероятность попадания (атака) или провала спасброска цели (спасбросок)
+    success_probability: float | None
+    critical_probability: float | None
+    percentiles: dict[int, int]
+
+    def as_dict(self) -> dict:
+        data = asdict(self)
+        data["percentiles"] = {f"p{k}": v for k, v in self.percentiles.items()}
+        return data
+
+
+def cast_dice(base: str, per_level: str, spell_level: int, slot_level: int) -> str:
+    """
+    Выражение костей заклинания с учетом уровня ячейки; ValueError, если
+    усиленное выражение выходит за лимиты ``dice``
+    """
+    if not base:
+        return ""
+    expression = parse(base)
+    extra_levels = max(0, slot_level - spell_level) if spell_level else 0
+    if per_level and extra_levels:
+        extra = parse(per_level).scaled(extra_levels)
+        expression = expression + extra
+    return str(expression)
+
+
+def attack_probabilities(attack_bonus: int, target_ac: int) -> tuple[float, float]:
+    """Вероятности обычного и критического попадания"""
+    hits = sum(1 for roll in D20[1:-1] if roll + attack_bonus >= target_ac)
+    return hits / 20, 1 / 20
+
+
+def save_success_probability(save_bonus: int, save_dc: int) -> float:
+    """Вероятность успешного спасброска цели"""
+    return sum(1 for roll in D20 if roll + save_bonus >= save_dc) / 20
+
+
+def _mix(*parts: tuple[float, dict[int, float]]) -> dict[int, float]:
+    result = {}
+    for weight, distribution in parts:
+        if not weight:
+            continue
+        for value, probability in distribution.items():
+            result[value] = result.get(value, 0.0) + weight * probability
+    return result
+
+
+def _critical(expression: DiceExpression) -> dict[int, float]:
+    dice_only = DiceExpression(expression.terms).distribution()
+    return {
+        value + expression.modifier: probability
+        for value, probability in convolve(dice_only, dice_only).items()
+    }
+
+
+def _estimate(
+    outcome: dict[int, float],
+    success: float | None = None,
+    critical: float | None = None,
+) -> CastEstimate:
+    # урон не бывает отрицательным
+    merged = {}
+    for value, probability in outcome.items():
+        merged[max(0, value)] = merged.get(max(0, value), 0.0) + probability
+    values = sorted(merged)
+    percentiles = {}
+    cumulative = 0.0
+    pending = list(PERCENTILES)
+    for value in values:
+        cumulative += merged[value]
+        while pending and cumulative >= pending[0] / 100 - 1e-12:
+            percentiles[pending.pop(0)] = value
+    return CastEstimate(
+        expected_damage=round(sum(v * p for v, p in merged.items()), 4),
+        min_damage=values[0],
+        max_damage=values[-1],
+        success_probability=None if success is None else round(success, 4),
+        critical_probability=None if critical is None else round(critical, 4),
+        percentiles=percentiles,
+    )
+
+
+@lru_cache(maxsize=4096)
+def estimate_cast(
+    dice: str,
+    attack_type: str,
+    attack_bonus: int = 0,
+    save_dc: int = 0,
+    target_ac: int = 10,
+    target_save_bonus: int = 0,
+) -> CastEstimate:
+    """Оценка урона одного накладывания по цели"""
+    if not dice or attack_type == Spell.AttackType.NONE:
+        return _estimate({0: 1.0})
+
+    expression = parse(dice)
+    normal = expression.distribution()
+
+    if attack_type in (Spell.AttackType.ATTACK_ROLL, Spell.AttackType.MIXED):
+        hit, critical = attack_probabilities(attack_bonus, target_ac)
+        miss = 1 - hit - critical
+        outcome = _mix(
+            (miss, {0: 1.0}), (hit, normal), (critical, _critical(expression))
+        )
+        return _estimate(outcome, success=hit + critical, critical=critical)
+
+    if attack_type == Spell.AttackType.SAVE_THROW:
+        saved = save_success_probability(target_save_bonus, save_dc)
+        half = {}
+        for value, probability in normal.items():
+            half[value // 2] = half.get(value // 2, 0.0) + probability
+        outcome = _mix((1 - saved, normal), (saved, half))
+        return _estimate(outcome, success=1 - saved)
+
+    return _estimate(normal, success=1.0)
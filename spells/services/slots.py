@@ -0,0 +1,85 @@
+"""Синхронизация ячеек заклинаний спеллбуков с уровнями персонажа.
+
+Таблица ячеек считается один раз по ``Person.max_spell_slots``
+и записывается во все спеллбуки владельца одним UPDATE.
+Текущие ячейки при этом не сбрасываются, а только ограничиваются
+новым максимумом.
+"""
+
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from django.utils.timezone import now
+
+from spells.models import Person, Spellbook
+
+SLOT_LEVELS = range(1, 10)
+
+# Поля персонажа, от которых зависит таблица ячеек
+SLOT_SOURCE_FIELDS = (
+    "primary_class_level",
+    "second_class_level",
+    "warlock_level",
+    "character_class_id",
+    "second_class_id",
+)
+
+
+def slot_table(person: Person) -> dict[str, int]:
+    """Значения полей ``max_*`` спеллбука для персонажа"""
+    slots = person.max_spell_slots
+    table = {f"max_spell_slots_{level}": slots.get(level, 0) for level in SLOT_LEVELS}
+    table["warlock_slot_level"] = 0
+    table["warlock_max_slots"] = 0
+    for key, count in slots.items():
+        if isinstance(key, str) and key.startswith("warlock_"):
+            table["warlock_slot_level"] = int(key.removeprefix("warlock_"))
+            table["warlock_max_slots"] = count
+    return table
+
+
+def _update_kwargs(table: dict[str, int]) -> dict:
+    kwargs = dict(table, updated_at=now())
+    for level in SLOT_LEVELS:
+        current = f"current_spell_slots_{level}"
+        kwargs[current] = Least(F(current), Value(table[f"max_spell_slots_{level}"]))
+    kwargs["warlock_current_slots"] = Least(
+        F("warlock_current_slots"), Value(table["warlock_max_slots"])
+    )
+    return kwargs
+
+
+def sync_spellbook_slots(person: Person) -> int:
+    """Обновить ячейки всех спеллбуков персонажа, вернуть кол-во спеллбуков"""
+    spellbooks = Spellbook.objects.filter(owner_id=person.pk)
+    return spellbooks.update(**_update_kwargs(slot_table(person)))
+
+
+def sync_all_spellbook_slots(batch_size: int = 500) -> int:
+    """
+    Пересчитать ячейки спеллбуков всех персонажей пачками.
+    Персонажи пачки с одинаковой таблицей обновляются одним UPDATE.
+    """
+    persons = Person.objects.select_related("character_class", "second_class")
+    persons = persons.only(
+        "primary_class_level",
+        "second_class_level",
+        "warlock_level",
+        "character_class__magic_type",
+        "second_class__magic_type",
+    ).order_by("id")
+
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(persons.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return updated
+        last_id = batch[-1].id
+
+        groups = {}
+        for person in batch:
+            table = slot_table(person)
+            groups.setdefault(tuple(sorted(table.items())), []).append(person.id)
+        for table, owner_ids in groups.items():
+            spellbooks = Spellbook.objects.filter(owner_id__in=owner_ids)
+            updated += spellbooks.update(**_update_kwargs(dict(table)))
@@ -0,0 +1,264 @@
+"""Лист подготовленных заклинаний спеллбука.
+
+Лист собирается фиксированным набором запросов через ``.values()``
+и склеивается в Python по словарным индексам, без создания моделей:
+
+1. спеллбук + владелец + классы владельца (один JOIN);
+2. заклинания спеллбука со школой и временем накладывания;
+3. материальные компоненты всех заклинаний;
+4. эффекты всех заклинаний с типами урона.
+
+Готовый лист кэшируется по ``updated_at`` спеллбука и владельца
+и по поколениям M2M-связей, поэтому повторный показ стоит одного запроса
+(двух в режиме журнала событий - ключ учитывает последнее событие).
+Одновременные промахи по одному ключу кэша собираются один раз
+(``coalescing``), так что запрос после изменения не получит старый лист.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+
+from spells.models import Person, Spell, Spellbook
+from spells.services.coalescing import get_or_set
+from spells.services.events import overlay_spellbooks
+from spells.services.generations import CATALOG, get_generation
+
+SPELLBOOK_SPELLS = "spellbook_spells"
+
+SLOT_LEVELS = range(1, 10)
+
+_SPELLBOOK_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "is_active",
+    "is_shared",
+    "updated_at",
+    "last_used",
+    "warlock_slot_level",
+    "warlock_max_slots",
+    "warlock_current_slots",
+    *(f"max_spell_slots_{level}" for level in SLOT_LEVELS),
+    *(f"current_spell_slots_{level}" for level in SLOT_LEVELS),
+)
+
+_OWNER_FIELDS = (
+    "id",
+    "name",
+    "updated_at",
+    "primary_class_level",
+    "second_class_level",
+    "warlock_level",
+    "proficiency_bonus",
+    "spellcasting_ability",
+    "strength",
+    "dexterity",
+    "constitution",
+    "intelligence",
+    "wisdom",
+    "charisma",
+)
+
+_SPELL_FIELDS = (
+    "id",
+    "name",
+    "level",
+    "range",
+    "duration",
+    "concentration",
+    "ritual",
+    "verbal_component",
+    "somatic_component",
+    "description",
+    "higher_level",
+    "attack_type",
+    "saving_throw_ability",
+    "school__name",
+    "school__color",
+    "time__time",
+)
+
+# Поля владельца и заклинаний, которые видны на листе
+SHEET_OWNER_FIELDS = (
+    *(name for name in _OWNER_FIELDS if name not in ("id", "updated_at")),
+    "character_class",
+    "second_class",
+)
+SHEET_SPELL_FIELDS = tuple(
+    dict.fromkeys(name.split("__")[0] for name in _SPELL_FIELDS if name != "id")
+)
+# Поля материального компонента, которые видны на листе
+SHEET_COMPONENT_FIELDS = ("name", "cost", "is_consumable", "is_focus")
+
+
+def _load_header(spellbook_id: int) -> dict | None:
+    """Спеллбук вместе с владельцем и его классами одним запросом"""
+    fields = (
+        *_SPELLBOOK_FIELDS,
+        *(f"owner__{name}" for name in _OWNER_FIELDS),
+        "owner__character_class__name",
+        "owner__second_class__name",
+    )
+    return Spellbook.objects.filter(id=spellbook_id).values(*fields).first()
+
+
+def _cache_key(header: dict, last_event: int = 0) -> str:
+    spellbook_id = header["id"]
+    return ":".join(
+        (
+            "spells:sheet",
+            str(spellbook_id),
+            header["updated_at"].isoformat(),
+            header["owner__updated_at"].isoformat(),
+            str(get_generation(SPELLBOOK_SPELLS, spellbook_id)),
+            str(get_generation(CATALOG)),
+            str(last_event),
+        )
+    )
+
+
+def _slot_state(header: dict) -> dict:
+    slots = {
+        str(level): {
+            "max": header[f"max_spell_slots_{level}"],
+            "current": header[f"current_spell_slots_{level}"],
+        }
+        for level in SLOT_LEVELS
+        if header[f"max_spell_slots_{level}"]
+    }
+    warlock = None
+    if header["warlock_max_slots"]:
+        warlock = {
+            "level": header["warlock_slot_level"],
+            "max": header["warlock_max_slots"],
+            "current": header["warlock_current_slots"],
+        }
+    return {"slots": slots, "warlock": warlock}
+
+
+def _owner_payload(header: dict) -> dict:
+    owner = {name: header[f"owner__{name}"] for name in _OWNER_FIELDS}
+    # Производные значения считаются теми же свойствами модели,
+    # что и везде, на несохраняемом экземпляре без запросов к базе
+    caster = Person(**{k: v for k, v in owner.items() if k != "updated_at"})
+    return {
+        "id": owner["id"],
+        "name": owner["name"],
+        "character_class": header["owner__character_class__name"],
+        "second_class": header["owner__second_class__name"],
+        "level": caster.level,
+        "spell_save_dc": caster.spell_save_dc,
+        "spell_attack_bonus": caster.spell_attack_bonus,
+    }
+
+
+def _spells_payload(spellbook_id: int) -> list[dict]:
+    rows = list(
+        Spell.objects.filter(spellbooks=spellbook_id)
+        .order_by("level", "name")
+        .values(*_SPELL_FIELDS)
+    )
+    spell_ids = [row["id"] for row in rows]
+
+    components = defaultdict(list)
+    component_rows = (
+        Spell.material_components.through.objects.filter(spell_id__in=spell_ids)
+        .order_by("materialcomponent__name")
+        .values(
+            "spell_id",
+            "materialcomponent__name",
+            "materialcomponent__cost",
+            "materialcomponent__is_consumable",
+            "materialcomponent__is_focus",
+        )
+    )
+    for row in component_rows:
+        cost = row["materialcomponent__cost"]
+        components[row["spell_id"]].append(
+            {
+                "name": row["materialcomponent__name"],
+                "cost": str(cost) if cost is not None else None,
+                "is_consumable": row["materialcomponent__is_consumable"],
+                "is_focus": row["materialcomponent__is_focus"],
+            }
+        )
+
+    effects = defaultdict(list)
+    effect_rows = (
+        Spell.effects.through.objects.filter(spell_id__in=spell_ids)
+        .order_by("effect__name")
+        .values(
+            "spell_id",
+            "effect__name",
+            "effect__category",
+            "effect__duration",
+            "effect__damage_type__name",
+        )
+    )
+    for row in effect_rows:
+        effects[row["spell_id"]].append(
+            {
+                "name": row["effect__name"],
+                "category": row["effect__category"],
+                "duration": row["effect__duration"],
+                "damage_type": row["effect__damage_type__name"],
+            }
+        )
+
+    spells = []
+    for row in rows:
+        spell_id = row["id"]
+        spells.append(
+            {
+                "id": spell_id,
+                "name": row["name"],
+                "level": row["level"],
+                "school": row["school__name"],
+                "school_color": row["school__color"],
+                "time": row["time__time"],
+                "range": row["range"],
+                "duration": row["duration"],
+                "concentration": row["concentration"],
+                "ritual": row["ritual"],
+                "verbal_component": row["verbal_component"],
+                "somatic_component": row["somatic_component"],
+                "material_components": components[spell_id],
+                "attack_type": row["attack_type"],
+                "saving_throw_ability": row["saving_throw_ability"],
+                "effects": effects[spell_id],
+                "description": row["description"],
+                "higher_level": row["higher_level"],
+            }
+        )
+    return spells
+
+
+def _assemble(spellbook_id: int, header: dict) -> dict:
+    return {
+        "id": header["id"],
+        "name": header["name"],
+        "description": header["description"],
+        "is_active": header["is_active"],
+        "is_shared": header["is_shared"],
+        "updated_at": header["updated_at"].isoformat(),
+        "last_used": header["last_used"].isoformat() if header["last_used"] else None,
+        "owner": _owner_payload(header),
+        **_slot_state(header),
+        "spells": _spells_payload(spellbook_id),
+    }
+
+
+def build_sheet(spellbook_id: int) -> dict | None:
+    """Собрать лист спеллбука (или взять из кэша). None - спеллбука нет"""
+    header = _load_header(spellbook_id)
+    if header is None:
+        return None
+
+    # в режиме журнала событий ячейки = строка + несвернутые события
+    last_event = overlay_spellbooks([header]).get(header["id"], 0)
+    return get_or_set(
+        _cache_key(header, last_event),
+        lambda: _assemble(spellbook_id, header),
+        getattr(settings, "SPELLS_SHEET_CACHE_TIMEOUT", 60 * 60),
+    )
@@ -0,0 +1,233 @@
+"""Синхронизация офлайн-клиентов.
+
+Клиент хранит непрозрачный токен и запрашивает все, что изменилось после
+него: строки ``Person``, ``Spellbook`` и ``Spell`` по ``updated_at``,
+изменения связи спеллбук-заклинание из журнала и записи об удалениях.
+Выборка берется с небольшим перекрытием по времени, чтобы не потерять
+строки, закоммиченные во время предыдущей выборки; применение дельт
+на клиенте идемпотентно, поэтому повторы безопасны.
+
+Счетчики (ячейки, хиты) клиент не перезаписывает значениями, а присылает
+операциями: операции применяются на сервере выражениями ``F()`` и ровно один
+раз (по id операции), поэтому правки с нескольких устройств складываются.
+"""
+
+from datetime import UTC, datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest, Least
+from django.utils.timezone import now
+
+from spells.models import (
+    AppliedOperation,
+    Person,
+    SessionEvent,
+    Spell,
+    Spellbook,
+    SpellbookSpellChange,
+    Tombstone,
+)
+from spells.services import events
+
+# Перекрытие окна выборки для строк, закоммиченных во время прошлой выборки
+OVERLAP = timedelta(seconds=2)
+
+
+def make_token(moment: datetime) -> str:
+    """Токен синхронизации - момент времени в микросекундах"""
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def parse_token(token: str) -> datetime:
+    """Момент времени из токена, ValueError при некорректном токене"""
+    return datetime.fromtimestamp(int(token) / 1_000_000, tz=UTC)
+
+
+def pull(player_id: int, since: datetime | None = None) -> dict:
+    """Изменения данных игрока после ``since`` (все данные, если None)"""
+    moment = now()
+    persons = Person.objects.filter(player_id=player_id)
+    spellbooks = Spellbook.objects.filter(owner__player_id=player_id)
+    spellbook_ids = list(spellbooks.values_list("id", flat=True))
+
+    if since is None:
+        edges = [
+            {"spellbook": spellbook_id, "spell": spell_id, "action": "add"}
+            for spellbook_id, spell_id in Spellbook.spells.through.objects.filter(
+                spellbook_id__in=spellbook_ids
+            ).values_list("spellbook_id", "spell_id")
+        ]
+        spells = Spell.objects.filter(
+            Q(spellbooks__in=spellbook_ids) | Q(created_by_id=player_id)
+        ).distinct()
+        tombstones = Tombstone.objects.none()
+    else:
+        since = since - OVERLAP
+        person_changes = Q(updated_at__gt=since)
+        spellbook_changes = Q(updated_at__gt=since)
+        if events.is_enabled():
+            # события журнала не трогают updated_at до свертки
+            recent = SessionEvent.objects.filter(created_at__gt=since)
+            person_changes |= Q(id__in=recent.values("person_id"))
+            spellbook_changes |= Q(id__in=recent.values("spellbook_id"))
+        persons = persons.filter(person_changes)
+        spellbooks = spellbooks.filter(spellbook_changes)
+        edges = list(
+            SpellbookSpellChange.objects.filter(
+                spellbook_id__in=spellbook_ids, changed_at__gt=since
+            )
+            .order_by("id")
+            .values("spellbook_id", "spell_id", "action")
+        )
+        edges = [
+            {
+                "spellbook": e["spellbook_id"],
+                "spell": e["spell_id"],
+                "action": e["action"],
+            }
+            for e in edges
+        ]
+        # заклинания, добавленные в спеллбук, нужны клиенту даже без изменений
+        added = {e["spell"] for e in edges if e["action"] == "add"}
+        spells = Spell.objects.filter(
+            Q(id__in=added)
+            | Q(updated_at__gt=since, spellbooks__in=spellbook_ids)
+            | Q(updated_at__gt=since, created_by_id=player_id)
+        ).distinct()
+        tombstones = Tombstone.objects.filter(
+            Q(player_id=player_id) | Q(player__isnull=True), deleted_at__gt=since
+        )
+
+    deleted = {kind: [] for kind in Tombstone.Kind.values}
+    for kind, object_id in tombstones.values_list("kind", "object_id"):
+        deleted[kind].append(object_id)
+
+    persons = list(persons.values())
+    spellbooks = list(spellbooks.values())
+    events.overlay_persons(persons)
+    events.overlay_spellbooks(spellbooks)
+
+    return {
+        "token": make_token(moment),
+        "persons": persons,
+        "spellbooks": spellbooks,
+        "spells": list(spells.values()),
+        "spellbook_spells": edges,
+        "deleted": deleted,
+    }
+
+
+class OperationRejected(Exception):
+    """Операция не применима (нет доступа или нечего тратить)"""
+
+
+def _spellbook(player_id: int, operation: dict):
+    return Spellbook.objects.filter(
+        id=operation["spellbook"], owner__player_id=player_id
+    )
+
+
+def _use_slot(player_id, operation):
+    return _spellbook(player_id, operation).use_slot(
+        operation.get("level", 0), operation.get("warlock", False)
+    )
+
+
+def _restore_slot(player_id, operation):
+    return _spellbook(player_id, operation).restore_slot(
+        operation.get("level", 0), operation.get("warlock", False)
+    )
+
+
+def _long_rest(player_id, operation):
+    return _spellbook(player_id, operation).reset_slots()
+
+
+def _change_hp(player_id, operation):
+    """Урон (amount < 0) сначала снимает временные хиты, лечение - до максимума"""
+    person = Person.objects.filter(id=operation["person"], player_id=player_id)
+    amount = operation["amount"]
+    if amount >= 0:
+        values = {
+            "current_hit_points": Least(
+                F("current_hit_points") + amount, F("max_hit_points")
+            )
+        }
+    else:
+        damage = Value(-amount)
+        values = {
+            "temporary_hit_points": Greatest(F("temporary_hit_points") - damage, 0),
+            "current_hit_points": Greatest(
+                F("current_hit_points")
+                - Greatest(damage - F("temporary_hit_points"), 0),
+                0,
+            ),
+        }
+    return person.update(**values, updated_at=now())
+
+
+def _grant_temp_hp(player_id, operation):
+    """Временные хиты не складываются - остается большее значение"""
+    person = Person.objects.filter(id=operation["person"], player_id=player_id)
+    return person.update(
+        temporary_hit_points=Greatest(F("temporary_hit_points"), operation["amount"]),
+        updated_at=now(),
+    )
+
+
+def _record_event(player_id, operation):
+    """
+    Операция в режиме журнала событий: проверка доступа и запись события
+    (неприменимое к состоянию событие свертка пропустит)
+    """
+    kind = operation["type"]
+    if kind in ("change_hp", "grant_temp_hp"):
+        owned = Person.objects.filter(id=operation["person"], player_id=player_id)
+        if not owned.exists():
+            return False
+        return getattr(events, kind)(operation["person"], operation["amount"])
+
+    if not _spellbook(player_id, operation).exists():
+        return False
+    args = ()
+    if kind != "long_rest":
+        args = (operation.get("level", 0), operation.get("warlock", False))
+    return getattr(events, kind)(operation["spellbook"], *args)
+
+
+OPERATIONS = {
+    "use_slot": _use_slot,
+    "restore_slot": _restore_slot,
+    "long_rest": _long_rest,
+    "change_hp": _change_hp,
+    "grant_temp_hp": _grant_temp_hp,
+}
+
+
+def apply_operations(player_id: int, operations: list[dict]) -> list[dict]:
+    """
+    Применить операции клиента по порядку. Повторно присланная операция
+    (тот же id) не применяется второй раз. В режиме журнала событий
+    события всего пакета вставляются одним запросом
+    """
+    results = []
+    with transaction.atomic(), events.batch():
+        for operation in operations:
+            handler = OPERATIONS[operation["type"]]
+            if events.is_enabled():
+                handler = _record_event
+            status = "applied"
+            try:
+                with transaction.atomic():
+                    AppliedOperation.objects.create(
+                        id=operation["id"], player_id=player_id, kind=operation["type"]
+                    )
+                    if not handler(player_id, operation):
+                        raise OperationRejected
+            except IntegrityError:
+                status = "duplicate"
+            except OperationRejected:
+                status = "rejected"
+            results.append({"id": str(operation["id"]), "status": status})
+    return results
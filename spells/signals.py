@@ -0,0 +1,408 @@
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from spells.models import (
+    CharacterClass,
+    DamageType,
+    Effect,
+    MagicSchool,
+    MaterialComponent,
+    Person,
+    Player,
+    PublishedSnapshot,
+    Spell,
+    Spellbook,
+    SpellbookSpellChange,
+    SpellTime,
+    Tombstone,
+)
+
+# Сервисы импортируются внутри обработчиков: apps.ready() загружает этот
+# модуль при каждом запуске процесса, а сервисы тянут за собой тяжелые
+# зависимости, которые нужны только при изменении данных
+
+# Модели справочника, изменения которых видны на листах спеллбуков
+# (название класса владельца тоже печатается на листе)
+CATALOG_MODELS = (
+    Spell,
+    MagicSchool,
+    SpellTime,
+    MaterialComponent,
+    Effect,
+    DamageType,
+    CharacterClass,
+)
+
+# Справочники, напечатанные на листах общих спеллбуков: пути от спеллбука
+# к их записям (тип урона - в эффектах, класс - у владельца)
+SHEET_CATALOG_LOOKUPS = {
+    MagicSchool: ("spells__school",),
+    SpellTime: ("spells__time",),
+    MaterialComponent: ("spells__material_components",),
+    Effect: ("spells__effects",),
+    DamageType: ("spells__effects__damage_type",),
+    CharacterClass: ("owner__character_class", "owner__second_class"),
+}
+
+
+@receiver(m2m_changed, sender=Spellbook.spells.through)
+def spellbook_spells_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Новое поколение заклинаний спеллбука при изменении связи"""
+    if not action.startswith("post_"):
+        return
+    from spells.services.generations import CATALOG, bump_generation
+    from spells.services.spellbook_sheet import SPELLBOOK_SPELLS
+
+    if not reverse:
+        bump_generation(SPELLBOOK_SPELLS, instance.pk)
+    elif pk_set:
+        # spell.spellbooks.add(...) - меняются спеллбуки из pk_set
+        for spellbook_id in pk_set:
+            bump_generation(SPELLBOOK_SPELLS, spellbook_id)
+    else:
+        # spell.spellbooks.clear() - затронутые спеллбуки уже не известны
+        bump_generation(CATALOG)
+
+
+@receiver(m2m_changed, sender=Spell.material_components.through)
+@receiver(m2m_changed, sender=Spell.effects.through)
+def spell_relations_changed(sender, action, **kwargs):
+    if action.startswith("post_"):
+        catalog_changed(sender)
+
+
+def catalog_changed(sender, **kwargs):
+    from spells.services.generations import CATALOG, bump_generation
+
+    bump_generation(CATALOG)
+
+
+for model in CATALOG_MODELS:
+    uid = f"spells_catalog_{model.__name__}"
+    post_save.connect(catalog_changed, sender=model, dispatch_uid=f"{uid}_save")
+    post_delete.connect(catalog_changed, sender=model, dispatch_uid=f"{uid}_delete")
+
+
+def _spell_features_changed(spell_ids) -> None:
+    from spells.services import encounter, recommendations
+
+    spell_ids = set(spell_ids)
+    transaction.on_commit(lambda: recommendations.spells_changed(spell_ids))
+    transaction.on_commit(lambda: encounter.spells_changed(spell_ids))
+
+
+@receiver(post_save, sender=Spell)
+def refresh_spell_features(sender, instance, created, **kwargs):
+    """Признаки заклинания для рекомендаций и подбора - точечно после коммита"""
+    from spells.services import encounter, recommendations
+
+    fields = (*recommendations.SPELL_FEATURE_FIELDS, *encounter.SPELL_FEATURE_FIELDS)
+    if created or instance.has_changed(*fields):
+        _spell_features_changed([instance.pk])
+
+
+@receiver(post_delete, sender=Spell)
+def drop_spell_features(sender, instance, **kwargs):
+    _spell_features_changed([instance.pk])
+
+
+@receiver(m2m_changed, sender=Spell.effects.through)
+@receiver(m2m_changed, sender=Spell.material_components.through)
+@receiver(m2m_changed, sender=Spell.aviable_classes.through)
+def spell_feature_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    from spells.services import encounter, recommendations
+
+    if not reverse:
+        _spell_features_changed([instance.pk])
+    elif pk_set:
+        # effect.spells.add(...) - меняются заклинания из pk_set
+        _spell_features_changed(pk_set)
+    elif action == "post_clear":
+        # затронутые заклинания уже не известны
+        transaction.on_commit(recommendations.features_changed)
+        transaction.on_commit(encounter.features_changed)
+
+
+@receiver(post_save, sender=Effect)
+@receiver(post_delete, sender=Effect)
+def effect_features_changed(sender, **kwargs):
+    """Категория и тип урона эффекта - признаки всех его заклинаний"""
+    from spells.services import encounter, recommendations
+
+    transaction.on_commit(recommendations.features_changed)
+    transaction.on_commit(encounter.features_changed)
+
+
+@receiver(post_save, sender=Spellbook)
+def republish_spellbook(sender, instance, created, **kwargs):
+    """Новая версия общего спеллбука (или снятие с публикации)"""
+    from spells.services.publishing import SPELLBOOK_PUBLISHED_FIELDS, sync_publication
+
+    # трата ячеек и отдых не меняют опубликованную версию
+    if not created and not instance.has_changed(*SPELLBOOK_PUBLISHED_FIELDS):
+        return
+    kind = PublishedSnapshot.Kind
+    if sync_publication(kind.SPELLBOOK, instance.pk, instance.is_shared):
+        # список общих спеллбуков входит в публичную карточку персонажа
+        sync_publication(kind.PERSON, instance.owner_id, True)
+        if instance.has_changed("owner"):
+            previous = instance.original_value("owner")
+            if previous is not None:
+                sync_publication(kind.PERSON, previous, True)
+
+
+@receiver(post_save, sender=Person)
+def republish_person(sender, instance, created, **kwargs):
+    """Новая версия публичного персонажа и его общих спеллбуков"""
+    from spells.services.publishing import PERSON_PUBLISHED_FIELDS, sync_publication
+    from spells.services.spellbook_sheet import SHEET_OWNER_FIELDS
+
+    kind = PublishedSnapshot.Kind
+    if created or instance.has_changed(*PERSON_PUBLISHED_FIELDS):
+        sync_publication(kind.PERSON, instance.pk, instance.is_public)
+    if created or not instance.has_changed(*SHEET_OWNER_FIELDS):
+        return
+    shared = Spellbook.objects.filter(owner=instance, is_shared=True)
+    for spellbook_id in shared.values_list("id", flat=True):
+        sync_publication(kind.SPELLBOOK, spellbook_id, True)
+
+
+@receiver(m2m_changed, sender=Spellbook.spells.through)
+def republish_spellbook_spells(sender, instance, action, reverse, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        from spells.services.publishing import sync_publication
+
+        sync_publication(
+            PublishedSnapshot.Kind.SPELLBOOK, instance.pk, instance.is_shared
+        )
+    else:
+        _republish_spellbooks_with(instance)
+
+
+def _republish_spellbooks_with(spell):
+    from spells.services.publishing import republish_shared_spellbooks
+
+    republish_shared_spellbooks(Q(spells=spell))
+
+
+@receiver(post_save, sender=Spell)
+def republish_spell_spellbooks(sender, instance, created, **kwargs):
+    """Заклинание изменилось - перепубликовать общие спеллбуки с ним"""
+    from spells.services.spellbook_sheet import SHEET_SPELL_FIELDS
+
+    if not created and instance.has_changed(*SHEET_SPELL_FIELDS):
+        _republish_spellbooks_with(instance)
+
+
+def _republish_catalog_spellbooks(sender, instance):
+    from spells.services.publishing import republish_shared_spellbooks
+
+    lookups = SHEET_CATALOG_LOOKUPS[sender]
+    republish_shared_spellbooks(
+        reduce(or_, (Q(**{lookup: instance.pk}) for lookup in lookups))
+    )
+
+
+def republish_catalog_saved(sender, instance, created, **kwargs):
+    """Запись справочника изменилась - перепубликовать общие спеллбуки с ней"""
+    from spells.services.spellbook_sheet import SHEET_COMPONENT_FIELDS
+
+    # новая запись еще не напечатана ни на одном листе
+    if created:
+        return
+    if sender is MaterialComponent and not instance.has_changed(
+        *SHEET_COMPONENT_FIELDS
+    ):
+        return
+    _republish_catalog_spellbooks(sender, instance)
+
+
+def republish_catalog_deleted(sender, instance, **kwargs):
+    """
+    Запись справочника удаляется: спеллбуки ищутся до удаления, пока связи
+    на месте, а публикуются после коммита
+    """
+    _republish_catalog_spellbooks(sender, instance)
+
+
+for model in SHEET_CATALOG_LOOKUPS:
+    uid = f"spells_republish_{model.__name__}"
+    post_save.connect(republish_catalog_saved, sender=model, dispatch_uid=f"{uid}_save")
+    pre_delete.connect(
+        republish_catalog_deleted, sender=model, dispatch_uid=f"{uid}_delete"
+    )
+
+
+@receiver(m2m_changed, sender=Spell.material_components.through)
+@receiver(m2m_changed, sender=Spell.effects.through)
+def republish_spell_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    """Компоненты и эффекты заклинания напечатаны на листах с ним"""
+    if not reverse:
+        if action.startswith("post_"):
+            _republish_spellbooks_with(instance)
+    elif action == "pre_clear":
+        # component.spells.clear() - спеллбуки ищутся, пока связи на месте
+        _republish_catalog_spellbooks(type(instance), instance)
+    elif action in ("post_add", "post_remove") and pk_set:
+        from spells.services.publishing import republish_shared_spellbooks
+
+        republish_shared_spellbooks(Q(spells__in=pk_set))
+
+
+@receiver(m2m_changed, sender=Spellbook.spells.through)
+def spellbook_cooccurrence_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Инкрементальное обновление таблицы совместного выбора заклинаний"""
+    from spells.services.recommendations import update_cooccurrence
+
+    through = Spellbook.spells.through
+
+    def spells_of(spellbook_id):
+        rows = through.objects.filter(spellbook_id=spellbook_id)
+        return set(rows.values_list("spell_id", flat=True))
+
+    # add() передает только новые связи, а remove() - все переданные id:
+    # до удаления запоминается, какие связи действительно существуют
+    if reverse:
+        # spell.spellbooks.add/remove/clear(...)
+        if action in ("pre_remove", "pre_clear"):
+            rows = through.objects.filter(spell_id=instance.pk)
+            if action == "pre_remove":
+                rows = rows.filter(spellbook_id__in=pk_set)
+            instance._removed_spellbook_ids = set(
+                rows.values_list("spellbook_id", flat=True)
+            )
+        elif action in ("post_remove", "post_clear"):
+            for spellbook_id in getattr(instance, "_removed_spellbook_ids", ()):
+                update_cooccurrence(spells_of(spellbook_id), [instance.pk], -1)
+            instance._removed_spellbook_ids = set()
+        elif action == "post_add" and pk_set:
+            for spellbook_id in pk_set:
+                update_cooccurrence(spells_of(spellbook_id), [instance.pk], 1)
+        return
+
+    if action in ("pre_remove", "pre_clear"):
+        spells = spells_of(instance.pk)
+        removed = spells if action == "pre_clear" else spells & set(pk_set)
+        instance._removed_spell_ids = (spells, removed)
+    elif action in ("post_remove", "post_clear"):
+        spells, removed = getattr(instance, "_removed_spell_ids", (set(), set()))
+        update_cooccurrence(spells, removed, -1)
+        instance._removed_spell_ids = (set(), set())
+    elif action == "post_add" and pk_set:
+        update_cooccurrence(spells_of(instance.pk), pk_set, 1)
+
+
+@receiver(post_save, sender=Person)
+def resync_spellbook_slots(sender, instance, created, **kwargs):
+    """Пересчитать ячейки спеллбуков, если изменились уровни или классы"""
+    from spells.services.slots import SLOT_SOURCE_FIELDS, sync_spellbook_slots
+
+    if not created and instance.has_changed(*SLOT_SOURCE_FIELDS):
+        sync_spellbook_slots(instance)
+
+
+@receiver(post_save, sender=Player)
+def process_new_avatar(sender, instance, **kwargs):
+    """Новый аватар обрабатывается в фоне, вне запроса загрузки"""
+    if instance.has_changed("avatar"):
+        from spells.services.avatars import enqueue_avatar_processing
+
+        enqueue_avatar_processing(instance.pk)
+
+
+@receiver(pre_delete, sender=Person)
+@receiver(pre_delete, sender=Spellbook)
+@receiver(pre_delete, sender=Spell)
+def record_tombstone(sender, instance, **kwargs):
+    """Запись об удалении для синхронизации клиентов"""
+    if sender is Person:
+        kind, player_id = Tombstone.Kind.PERSON, instance.player_id
+    elif sender is Spellbook:
+        kind = Tombstone.Kind.SPELLBOOK
+        owner = Person.objects.filter(id=instance.owner_id)
+        player_id = owner.values_list("player_id", flat=True).first()
+    else:
+        # заклинания - общий справочник, их удаление видно всем
+        kind, player_id = Tombstone.Kind.SPELL, None
+    Tombstone.objects.create(kind=kind, object_id=instance.pk, player_id=player_id)
+
+
+@receiver(m2m_changed, sender=Spellbook.spells.through)
+def record_spellbook_spell_changes(sender, instance, action, reverse, pk_set, **kwargs):
+    """Журнал изменений связи спеллбук-заклинание для синхронизации"""
+    if action == "pre_clear":
+        # clear() не передает pk_set - связи запоминаются до удаления
+        through = Spellbook.spells.through
+        if reverse:
+            rows = through.objects.filter(spell_id=instance.pk)
+            column = "spellbook_id"
+        else:
+            rows = through.objects.filter(spellbook_id=instance.pk)
+            column = "spell_id"
+        instance._sync_cleared_ids = set(rows.values_list(column, flat=True))
+        return
+    if action == "post_clear":
+        pk_set = getattr(instance, "_sync_cleared_ids", set())
+        instance._sync_cleared_ids = set()
+        change_action = SpellbookSpellChange.Action.REMOVE
+    elif action in ("post_add", "post_remove") and pk_set:
+        change_action = (
+            SpellbookSpellChange.Action.ADD
+            if action == "post_add"
+            else SpellbookSpellChange.Action.REMOVE
+        )
+    else:
+        return
+    pairs = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+    SpellbookSpellChange.objects.bulk_create(
+        SpellbookSpellChange(spellbook_id=a, spell_id=b, action=change_action)
+        for a, b in pairs
+    )
+
+
+@receiver(post_save, sender=Spell)
+def refresh_spell_signature(sender, instance, created, **kwargs):
+    """Пересчитать MinHash-сигнатуру после коммита, если изменился текст"""
+    if not created and not instance.has_changed("description", "higher_level"):
+        return
+    from spells.services.near_duplicates import signature_text, update_signature
+
+    spell_id = instance.pk
+    text = signature_text(instance.description, instance.higher_level)
+    transaction.on_commit(lambda: update_signature(spell_id, text))
+
+
+@receiver(post_save, sender=Spell)
+@receiver(post_save, sender=MaterialComponent)
+def refresh_autocomplete_name(sender, instance, created, **kwargs):
+    """Новое или переименованное название - в индекс автодополнения"""
+    if created or instance.has_changed("name"):
+        from spells.services import autocomplete
+
+        kind = autocomplete.SPELL if sender is Spell else autocomplete.COMPONENT
+        object_id, name = instance.pk, instance.name
+        transaction.on_commit(lambda: autocomplete.name_changed(kind, object_id, name))
+
+
+@receiver(post_delete, sender=Spell)
+@receiver(post_delete, sender=MaterialComponent)
+def drop_autocomplete_name(sender, instance, **kwargs):
+    from spells.services import autocomplete
+
+    kind = autocomplete.SPELL if sender is Spell else autocomplete.COMPONENT
+    object_id = instance.pk
+    transaction.on_commit(lambda: autocomplete.name_changed(kind, object_id, None))
@@ -0,0 +1,51 @@
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Реплика для тестов маршрутизации чтения (spells.tests.test_routing)
+TEST_REPLICA = "replica_test"
+
+
+class SpellsTestRunner(DiscoverRunner):
+    """
+    Тестовая база строится по текущим моделям: файлов миграций spells
+    в репозитории нет, и без этого таблицы приложения не создаются.
+
+    Основная БД и реплика в тестах - два разных файла SQLite. Данные
+    в реплику не реплицируются, поэтому тесты читают из основной БД
+    (``SPELLS_DB_REPLICAS`` пуст), а тесты маршрутизации включают
+    реплику ``TEST_REPLICA`` сами
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._replica_dir = tempfile.mkdtemp(prefix="spells-replica-")
+        directory = Path(self._replica_dir)
+        database = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": str(directory / "replica.sqlite3"),
+            "TEST": {"NAME": str(directory / "test_replica.sqlite3")},
+        }
+        # настройки соединений уже прочитаны - псевдоним добавляется и туда
+        settings.DATABASES[TEST_REPLICA] = database
+        connections.settings[TEST_REPLICA] = connections.configure_settings(
+            {DEFAULT_DB_ALIAS: {}, TEST_REPLICA: database}
+        )[TEST_REPLICA]
+        # не override_settings: он подменяет SETTINGS_MODULE, который нужен
+        # тестам, запускающим дочерние процессы
+        self._replicas = settings.SPELLS_DB_REPLICAS
+        settings.SPELLS_DB_REPLICAS = []
+
+    def teardown_test_environment(self, **kwargs):
+        settings.SPELLS_DB_REPLICAS = self._replicas
+        shutil.rmtree(self._replica_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        with override_settings(MIGRATION_MODULES={"spells": None}):
+            return super().setup_databases(**kwargs)
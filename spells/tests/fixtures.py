@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+
+from spells.models import (
+    CharacterClass,
+    MagicSchool,
+    MaterialComponent,
+    Person,
+    Player,
+    Spell,
+    Spellbook,
+    SpellTime,
+)
+from spells.models.enums import MagicType
+
+
+def make_world(spells: int = 5, username: str = "player") -> dict:
+    """Игрок с персонажем-волшебником и спеллбуком из ``spells`` заклинаний"""
+    user = User.objects.create(username=username)
+    player = Player.objects.create(user=user, nickname=username)
+    wizard, _ = CharacterClass.objects.get_or_create(
+        name="Волшебник",
+        defaults={
+            "description": "Класс",
+            "magic_type": MagicType.FULL_CASTER,
+            "spellcasting_ability": "INT",
+        },
+    )
+    school = MagicSchool.objects.create(
+        name="Воплощение", description="Школа", color="#e74c3c"
+    )
+    time = SpellTime.objects.create(time="1 действие")
+    component = MaterialComponent.objects.create(
+        name="Гуано летучей мыши", description="Компонент", cost=5
+    )
+    person = Person.objects.create(
+        name="Персонаж",
+        player=player,
+        character_class=wizard,
+        primary_class_level=5,
+        intelligence=18,
+        max_hit_points=30,
+        current_hit_points=30,
+        spellcasting_ability="INT",
+    )
+    spell_objects = []
+    for number in range(spells):
+        spell = Spell.objects.create(
+            name=f"{username} заклинание {number}",
+            level=number % 4,
+            time=time,
+            school=school,
+            duration="Мгновенная",
+            description="Огненный шар взрывается",
+            damage_dice="8d6",
+        )
+        spell.material_components.add(component)
+        spell_objects.append(spell)
+    spellbook = Spellbook.objects.create(
+        name="Спеллбук",
+        owner=person,
+        max_spell_slots_1=4,
+        current_spell_slots_1=4,
+        max_spell_slots_2=3,
+        current_spell_slots_2=3,
+    )
+    spellbook.spells.add(*spell_objects)
+    return {
+        "user": user,
+        "player": player,
+        "wizard": wizard,
+        "school": school,
+        "time": time,
+        "component": component,
+        "person": person,
+        "spells": spell_objects,
+        "spellbook": spellbook,
+    }
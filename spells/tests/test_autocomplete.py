@@ -0,0 +1,39 @@
+from django.test import SimpleTestCase
+
+from spells.services import autocomplete
+from spells.services.autocomplete import SPELL, NameIndex
+
+
+class ReplacedTests(SimpleTestCase):
+    """Правка названия не меняет индекс, который уже читают другие потоки"""
+
+    def setUp(self):
+        self.index = NameIndex(kind=SPELL, generation=1)
+        self.index.add(1, "Огненный шар", 1.0)
+        self.index.add(2, "Огненная стрела", 0.5)
+
+    def test_original_is_untouched(self):
+        before = self.index.search("огненный")
+        updated = self.index.replaced(1, "Ледяной шар", 2)
+
+        self.assertEqual(self.index.search("огненный"), before)
+        self.assertEqual(self.index.generation, 1)
+        self.assertEqual(updated.generation, 2)
+        self.assertEqual(updated.search("ледяной")[0]["id"], 1)
+        self.assertNotIn(1, [item["id"] for item in updated.search("огненный")])
+
+    def test_removed_name(self):
+        updated = self.index.replaced(2, None, 2)
+        self.assertEqual(updated.search("стрела"), [])
+        self.assertEqual(self.index.search("стрела")[0]["id"], 2)
+
+    def test_name_changed_swaps_index(self):
+        autocomplete._indexes[SPELL] = self.index
+        self.addCleanup(autocomplete._indexes.pop, SPELL, None)
+        self.index.generation = autocomplete.get_generation(autocomplete._scope(SPELL))
+        autocomplete.name_changed(SPELL, 1, "Ледяной шар")
+
+        current = autocomplete._indexes[SPELL]
+        self.assertIsNot(current, self.index)
+        self.assertEqual(current.search("ледяной")[0]["id"], 1)
+        self.assertEqual(self.index.search("ледяной"), [])
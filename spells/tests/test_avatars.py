@@ -0,0 +1,105 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from spells.models import Player
+from spells.services import avatars
+from spells.services.avatars import THUMBNAIL_SIZES, avatar_url, avatar_urls
+from spells.tests.fixtures import make_world
+
+
+def _png(size=(300, 200), color=(255, 0, 0, 0)) -> SimpleUploadedFile:
+    buffer = BytesIO()
+    Image.new("RGBA", size, color).save(buffer, format="PNG")
+    return SimpleUploadedFile("avatar.png", buffer.getvalue(), "image/png")
+
+
+class AvatarTests(TestCase):
+    """Миниатюры строятся в фоне после коммита, URL - по размерам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=0)
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media, MEDIA_URL="/media/")
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # фоновый пул заменен синхронным вызовом
+        executor = mock.Mock(submit=lambda function, *args: function(*args))
+        patcher = mock.patch.object(avatars, "get_executor", return_value=executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.player = Player.objects.get(id=self.world["player"].id)
+
+    def _upload(self, file) -> Player:
+        with self.captureOnCommitCallbacks(execute=True):
+            self.player.avatar = file
+            self.player.save()
+        self.player.refresh_from_db()
+        return self.player
+
+    def test_thumbnails_built_after_upload(self):
+        player = self._upload(_png())
+
+        self.assertEqual(len(player.avatar_hash), 64)
+        self.assertEqual(set(player.avatar_thumbnails), set(map(str, THUMBNAIL_SIZES)))
+        for size, variants in player.avatar_thumbnails.items():
+            self.assertEqual(set(variants), {"webp", "jpeg"})
+            with default_storage.open(variants["jpeg"]) as file:
+                image = Image.open(file)
+                image.load()
+            self.assertEqual(image.size, (int(size), int(size)))
+            self.assertEqual(image.mode, "RGB")
+            self.assertNotIn("exif", image.info)
+            # прозрачность залита белым
+            self.assertGreater(min(image.getpixel((0, 0))), 240)
+
+    def test_same_content_same_files(self):
+        first = dict(self._upload(_png()).avatar_thumbnails)
+        second = self._upload(_png()).avatar_thumbnails
+        self.assertEqual(second, first)
+
+    def test_saving_other_fields_does_not_reprocess(self):
+        self._upload(_png())
+        with mock.patch.object(avatars, "process_avatar") as process:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.player.nickname = "Новый ник"
+                self.player.save()
+        process.assert_not_called()
+
+    def test_avatar_urls(self):
+        self.assertIsNone(avatar_url(self.player, 128))
+        self.assertEqual(avatar_urls(self.player), {})
+
+        with mock.patch.object(avatars, "process_avatar"):
+            player = self._upload(_png())
+        # пока миниатюр нет - исходный файл
+        self.assertEqual(avatar_url(player, 128), player.avatar.url)
+
+        avatars.process_avatar(player.id)
+        player.refresh_from_db()
+        thumbnails = player.avatar_thumbnails
+        urls = avatar_urls(player)
+        self.assertEqual(urls["64"]["jpeg"], f"/media/{thumbnails['64']['jpeg']}")
+        self.assertEqual(avatar_url(player, 100), urls["128"]["webp"])
+        self.assertEqual(avatar_url(player, 1024, "jpeg"), urls["256"]["jpeg"])
+
+        response = self.client.get(f"/api/spells/player/{player.id}/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["player"]["avatar"], urls["128"]["webp"])
+        self.assertEqual(response.json()["player"]["avatars"], urls)
+
+    def test_removed_avatar_clears_thumbnails(self):
+        self._upload(_png())
+        player = self._upload(None)
+        self.assertEqual(player.avatar_thumbnails, {})
+        self.assertEqual(player.avatar_hash, "")
@@ -0,0 +1,47 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from spells.services import cards
+from spells.tests.fixtures import make_world
+
+
+class CardViewTests(TestCase):
+    """Запрос к API рисует немного карточек сам, остальные - в фоне"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=3)
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media, SPELLS_CARD_REQUEST_MAX=1)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_spell_card_rendered_in_request(self):
+        response = self.client.get(
+            f"/api/spells/spell/{self.world['spells'][0].id}/card/"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/png")
+
+    def test_large_spellbook_rendered_in_background(self):
+        url = f"/api/spells/spellbook/{self.world['spellbook'].id}/cards/"
+        with mock.patch.object(
+            cards, "ProcessPoolExecutor", side_effect=AssertionError
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.json()["pending"], 3)
+            # единственный фоновый поток выполняет задачи по очереди
+            cards.get_executor().submit(lambda: None).result()
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
@@ -0,0 +1,39 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from spells.routers import use_primary
+from spells.services import coalescing
+from spells.services.coalescing import coalesce
+
+
+@override_settings(SPELLS_DB_REPLICAS=["replica_1"])
+class CoalesceTests(SimpleTestCase):
+    """Ожидающие вызовы получают только результат, годный для их контекста"""
+
+    def setUp(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def _slow(self):
+        self.started.set()
+        self.release.wait(5)
+        return "leader"
+
+    def _start_leader(self):
+        thread = threading.Thread(target=coalesce, args=("key", self._slow))
+        thread.start()
+        self.started.wait(5)
+        self.addCleanup(thread.join)
+        self.addCleanup(self.release.set)
+
+    def test_primary_reads_do_not_join_replica_flight(self):
+        self._start_leader()
+        with use_primary():
+            self.assertEqual(coalesce("key", lambda: "primary"), "primary")
+
+    def test_follower_gives_up_waiting(self):
+        self._start_leader()
+        with mock.patch.object(coalescing, "WAIT_TIMEOUT", 0.05):
+            self.assertEqual(coalesce("key", lambda: "follower"), "follower")
@@ -0,0 +1,36 @@
+from django.test import TestCase
+
+from spells.models import Spellbook, SpellCooccurrence
+from spells.tests.fixtures import make_world
+
+
+class CooccurrenceTests(TestCase):
+    """Счетчики пар меняются только для связей, которые действительно менялись"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=0)
+        other = make_world(spells=3, username="other")
+        cls.a, cls.b, cls.c = other["spells"]
+        other["spellbook"].spells.clear()
+
+    def _count(self, spell, other) -> int:
+        row = SpellCooccurrence.objects.filter(spell=spell, other=other).first()
+        return row.count if row else 0
+
+    def test_removing_absent_spell_keeps_counts(self):
+        book = self.world["spellbook"]
+        other = Spellbook.objects.create(name="Другой", owner=self.world["person"])
+        book.spells.add(self.a, self.b)
+        other.spells.add(self.b, self.c)
+        self.assertEqual(self._count(self.b, self.c), 1)
+
+        # c в book нет - пара (b, c) из другого спеллбука не трогается
+        book.spells.remove(self.c, self.a)
+        self.assertEqual(self._count(self.a, self.b), 0)
+        self.assertEqual(self._count(self.b, self.c), 1)
+
+        self.c.spellbooks.remove(book)
+        self.assertEqual(self._count(self.b, self.c), 1)
+        self.c.spellbooks.clear()
+        self.assertEqual(self._count(self.b, self.c), 0)
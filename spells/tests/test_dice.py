@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from spells.services import dice
+from spells.services.dice import MAX_DICE, parse
+from spells.services.simulation import cast_dice
+from spells.tests.fixtures import make_world
+
+
+class DiceLimitTests(SimpleTestCase):
+    """Лимиты выражения костей считаются по всему выражению"""
+
+    def test_bounds_without_distribution(self):
+        expression = parse("2d6-1d4+3")
+        with mock.patch.object(dice, "_distribution") as distribution:
+            self.assertEqual(expression.minimum, 1)
+            self.assertEqual(expression.maximum, 14)
+            self.assertEqual(expression.expected, 7.5)
+        distribution.assert_not_called()
+
+    def test_limits_apply_to_whole_expression(self):
+        for text in ("40d100+40d99+40d98", "30d6+30d6", "7d100"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse(text)
+        parse("20d6+20d6")
+
+    def test_scaled_expression_is_checked(self):
+        self.assertEqual(cast_dice("8d6", "1d6", 3, 9), "14d6")
+        with self.assertRaises(ValueError):
+            cast_dice("8d6", f"{MAX_DICE}d6", 3, 4)
+
+    def test_roll_view_rejects_large_expression(self):
+        response = self.client.post(
+            "/api/spells/dice/roll/",
+            {"expression": "40d100+40d99+40d98"},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class CastSimulationLimitTests(TestCase):
+    """Заклинание с костями за лимитами не ломает пакетную оценку"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=3)
+        huge = cls.world["spells"][1]
+        huge.higher_level_dice = "20d6"
+        huge.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_over_limit_spell_reported_as_error(self):
+        _, huge, normal = self.world["spells"]
+        response = self.client.post(
+            "/api/spells/simulate/",
+            {
+                "caster": self.world["person"].id,
+                "spells": [huge.id, normal.id],
+                "slot_level": 9,
+            },
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([result["id"] for result in data["results"]], [normal.id])
+        self.assertEqual([error["id"] for error in data["errors"]], [huge.id])
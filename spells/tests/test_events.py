@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from spells.models import SessionEvent, SessionSnapshot, Spellbook
+from spells.services import events
+from spells.tests.fixtures import make_world
+
+
+@override_settings(SPELLS_EVENT_SOURCING=True, SPELLS_EVENT_COMPACTION_GRACE=60)
+class SessionEventTests(TestCase):
+    """Журнал событий: вставка без чтения, свертка с окном, воспроизведение"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=0)
+
+    def setUp(self):
+        self.spellbook_id = self.world["spellbook"].id
+
+    def _state(self) -> dict:
+        return events.spellbook_states([self.spellbook_id])[self.spellbook_id]
+
+    def _age(self, minutes: int = 5) -> None:
+        SessionEvent.objects.update(created_at=now() - timedelta(minutes=minutes))
+
+    def test_append_is_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            events.use_slot(self.spellbook_id, 1)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries[0]["sql"].startswith("INSERT"))
+
+    def test_batch_is_one_insert(self):
+        with CaptureQueriesContext(connection) as queries, events.batch():
+            events.use_slot(self.spellbook_id, 1)
+            events.use_slot(self.spellbook_id, 2)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(SessionEvent.objects.count(), 2)
+
+    def test_inapplicable_events_are_no_ops(self):
+        for _ in range(6):
+            events.use_slot(self.spellbook_id, 1)
+        events.restore_slot(self.spellbook_id, 2)
+        state = self._state()
+        self.assertEqual(state["current_spell_slots_1"], 0)
+        self.assertEqual(state["current_spell_slots_2"], 3)
+
+    def test_instance_checks_its_own_state(self):
+        spellbook = Spellbook.objects.get(id=self.spellbook_id)
+        self.assertTrue(spellbook.use_spell_slot(2))
+        self.assertEqual(spellbook.current_spell_slots_2, 2)
+        self.assertFalse(spellbook.use_spell_slot(5))
+        self.assertEqual(SessionEvent.objects.count(), 1)
+        # строка не перезаписывается до свертки
+        row = Spellbook.objects.get(id=self.spellbook_id)
+        self.assertEqual(row.current_spell_slots_2, 3)
+
+    def test_compaction_skips_recent_events(self):
+        events.use_slot(self.spellbook_id, 1)
+        self._age()
+        events.use_slot(self.spellbook_id, 1)
+
+        self.assertEqual(events.compact()["spellbooks"], 1)
+        row = Spellbook.objects.get(id=self.spellbook_id)
+        first, second = SessionEvent.objects.order_by("id")
+        self.assertEqual(row.events_compacted_to, first.id)
+        self.assertEqual(row.current_spell_slots_1, 3)
+        self.assertEqual(self._state()["current_spell_slots_1"], 2)
+        snapshot = SessionSnapshot.objects.get(spellbook_id=self.spellbook_id)
+        self.assertEqual(snapshot.state["current_spell_slots_1"], 4)
+
+    def test_compaction_stops_at_recent_event(self):
+        events.use_slot(self.spellbook_id, 1)
+        events.use_slot(self.spellbook_id, 1)
+        # событие с большим id старое, а перед ним - еще в окне
+        last = SessionEvent.objects.order_by("id").last()
+        SessionEvent.objects.filter(id=last.id).update(
+            created_at=now() - timedelta(minutes=5)
+        )
+        self.assertEqual(events.compact()["spellbooks"], 0)
+        self.assertEqual(
+            Spellbook.objects.get(id=self.spellbook_id).events_compacted_to, 0
+        )
+
+    def test_replay(self):
+        events.use_slot(self.spellbook_id, 2)
+        events.long_rest(self.spellbook_id)
+        self._age()
+        events.compact()
+        events.use_slot(self.spellbook_id, 7)
+
+        timeline = events.replay(Spellbook, self.spellbook_id)
+        self.assertEqual(timeline["start"]["current_spell_slots_2"], 3)
+        self.assertEqual(
+            [(entry["kind"], entry["applied"]) for entry in timeline["events"]],
+            [("slot_used", True), ("long_rest", True), ("slot_used", False)],
+        )
+        self.assertEqual(timeline["events"][0]["state"]["current_spell_slots_2"], 2)
+        self.assertEqual(timeline["events"][1]["state"]["current_spell_slots_2"], 3)
@@ -0,0 +1,73 @@
+from django.test import TestCase
+
+from spells.models import Spell
+from spells.services import encounter, recommendations
+from spells.tests.fixtures import make_world
+
+
+def _snapshot(index: recommendations.FeatureIndex) -> tuple:
+    """Все, кроме весов idf (точечная правка их не пересчитывает)"""
+    postings = {feature: sorted(ids) for feature, ids in index.postings.items()}
+    return index.features, postings, index.titles, index.class_spells
+
+
+class FeatureIndexTests(TestCase):
+    """Индексы признаков живут в процессе и правятся точечно"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=3)
+
+    def setUp(self):
+        recommendations._features.invalidate()
+        encounter._features.invalidate()
+        self.spell = self.world["spells"][1]
+
+    def _save(self, **fields):
+        spell = Spell.objects.get(id=self.spell.id)
+        for name, value in fields.items():
+            setattr(spell, name, value)
+        with self.captureOnCommitCallbacks(execute=True):
+            spell.save()
+
+    def test_spell_change_updates_copy(self):
+        before = recommendations.get_feature_index()
+        self._save(level=7, ritual=True)
+        after = recommendations.get_feature_index()
+
+        self.assertIsNot(after, before)
+        self.assertIn("level:1", before.features[self.spell.id])
+        self.assertIn("level:7", after.features[self.spell.id])
+        self.assertEqual(
+            _snapshot(after), _snapshot(recommendations.build_feature_index())
+        )
+
+    def test_unrelated_change_keeps_index(self):
+        before = recommendations.get_feature_index()
+        self._save(description="Новое описание")
+        self.assertIs(recommendations.get_feature_index(), before)
+
+    def test_links_and_delete(self):
+        recommendations.get_feature_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.world["wizard"].aviable_spells.add(self.spell)
+        index = recommendations.get_feature_index()
+        self.assertIn(self.spell.id, index.class_spells[self.world["wizard"].id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Spell.objects.filter(id=self.spell.id).delete()
+        index = recommendations.get_feature_index()
+        self.assertNotIn(self.spell.id, index.features)
+        self.assertEqual(
+            _snapshot(index), _snapshot(recommendations.build_feature_index())
+        )
+
+    def test_encounter_table(self):
+        before = encounter.get_feature_table()
+        self._save(damage_dice="3d10")
+        after = encounter.get_feature_table()
+        self.assertEqual(before[self.spell.id].damage_dice, "8d6")
+        self.assertEqual(after[self.spell.id].damage_dice, "3d10")
+        self.assertIs(
+            after[self.world["spells"][0].id], before[self.world["spells"][0].id]
+        )
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.test import TransactionTestCase, override_settings
+
+from spells.management.commands.thundering_herd import Command
+from spells.tests.fixtures import make_world
+
+CLIENTS = 20
+
+
+@override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"])
+class ThunderingHerdTests(TransactionTestCase):
+    """Одновременные промахи по листу спеллбука собираются один раз"""
+
+    # чтение может уйти на реплику из SPELLS_REPLICA_DBS
+    databases = "__all__"
+
+    def setUp(self):
+        spellbook = make_world(spells=5)["spellbook"]
+        self.path = f"/api/spells/spellbook/{spellbook.id}/sheet/"
+
+    def test_sheet_herd(self):
+        result = Command()._run(self.path, CLIENTS)
+
+        self.assertEqual(result["statuses"], {200: CLIENTS})
+        # каждый клиент читает только заголовок, лист собирается один раз
+        self.assertLessEqual(result["queries"], CLIENTS + 3)
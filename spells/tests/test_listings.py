@@ -0,0 +1,23 @@
+from django.db import connection
+from django.test import TestCase, skipUnlessDBFeature
+
+from spells.services.listings import LISTING_INDEXES
+from spells.tests.fixtures import make_world
+
+
+@skipUnlessDBFeature("supports_explaining_query_execution")
+class ListingPlanTests(TestCase):
+    """Списки читаются по своим индексам, без сортировки во временном B-дереве"""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_world(spells=1)
+
+    def test_listings_use_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("план на других СУБД зависит от статистики")
+        for name, (build, index) in LISTING_INDEXES.items():
+            with self.subTest(listing=name):
+                plan = build().explain()
+                self.assertIn(index, plan)
+                self.assertNotIn("USE TEMP B-TREE", plan)
@@ -0,0 +1,147 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from spells.models import Spell, SpellSignature
+from spells.services import near_duplicates
+from spells.services.near_duplicates import (
+    closest_official,
+    diff_spells,
+    find_near_duplicates,
+)
+from spells.tests.fixtures import make_world
+
+WORDS = (
+    "шар пламени вспыхивает в точке которую вы видите в пределах дистанции "
+    "каждое существо в сфере радиусом двадцать футов должно совершить "
+    "спасбросок ловкости получая урон огнем при провале или половину урона "
+    "при успехе огонь огибает углы и поджигает горючие предметы которые никто "
+    "не несет и не носит"
+).split()
+
+
+class NearDuplicateTests(TestCase):
+    """Почти-дубликаты находятся по тексту, сигнатура - только при его смене"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=0)
+
+    def setUp(self):
+        cache.clear()
+
+    def create(self, name: str, description: str, **fields) -> Spell:
+        with self.captureOnCommitCallbacks(execute=True):
+            return Spell.objects.create(
+                name=name,
+                level=3,
+                time=self.world["time"],
+                school=self.world["school"],
+                duration="Мгновенная",
+                description=description,
+                **fields,
+            )
+
+    def test_near_duplicate_found(self):
+        official = self.create("Огненный шар", " ".join(WORDS), is_official=True)
+        words = list(WORDS)
+        words[WORDS.index("видите")] = "слышите"
+        homebrew = self.create("Мой огненный шар", " ".join(words), is_official=False)
+        self.create("Лечение ран", "существо которого вы касаетесь восстанавливает")
+
+        found = find_near_duplicates(homebrew.id)
+        self.assertEqual([item["id"] for item in found], [official.id])
+        self.assertGreater(found[0]["similarity"], 0.7)
+        self.assertTrue(found[0]["is_official"])
+        self.assertIsNone(find_near_duplicates(homebrew.id + 1000))
+
+    def test_closest_official_at_low_threshold(self):
+        # общие только первые 26 слов из 46: сходство шинглов 0.375
+        official = self.create("Огненный шар", " ".join(WORDS), is_official=True)
+        words = WORDS[:26] + [f"иней{i}" for i in range(len(WORDS) - 26)]
+        homebrew = self.create("Ледяной шар", " ".join(words), is_official=False)
+
+        closest = closest_official(homebrew.id)
+        self.assertEqual(closest["id"], official.id)
+        self.assertLess(closest["similarity"], 0.5)
+
+    def test_signature_updated_only_on_text_change(self):
+        spell = self.create("Огненный шар", " ".join(WORDS))
+        text_hash = SpellSignature.objects.get(spell=spell).text_hash
+
+        with mock.patch.object(near_duplicates, "update_signature") as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                spell.name = "Большой огненный шар"
+                spell.save()
+        update.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            spell.higher_level = "Урон увеличивается на 1к6"
+            spell.save()
+        self.assertNotEqual(
+            SpellSignature.objects.get(spell=spell).text_hash, text_hash
+        )
+
+
+class SpellDiffTests(TestCase):
+    """Различия заклинания с ближайшим официальным по полям и словам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=0)
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.official = Spell.objects.create(
+                name="Огненный шар",
+                level=3,
+                time=self.world["time"],
+                school=self.world["school"],
+                duration="Мгновенная",
+                description=" ".join(WORDS),
+                damage_dice="8d6",
+                is_official=True,
+            )
+            self.official.material_components.add(self.world["component"])
+            words = list(WORDS)
+            words[WORDS.index("видите")] = "слышите"
+            self.homebrew = Spell.objects.create(
+                name="Мой огненный шар",
+                level=3,
+                time=self.world["time"],
+                school=self.world["school"],
+                duration="Мгновенная",
+                description=" ".join(words),
+                damage_dice="10d6",
+                is_official=False,
+            )
+
+    def test_diff_fields_and_text(self):
+        diff = diff_spells(self.official.id, self.homebrew.id)
+
+        self.assertEqual(diff["left"]["id"], self.official.id)
+        self.assertEqual(
+            set(diff["fields"]),
+            {"name", "damage_dice", "material_components"},
+        )
+        self.assertEqual(
+            diff["fields"]["damage_dice"], {"left": "8d6", "right": "10d6"}
+        )
+        self.assertEqual(
+            diff["fields"]["material_components"],
+            {"removed": [self.world["component"].name], "added": []},
+        )
+        ops = [op for op in diff["text"]["description"]["ops"] if op["op"] != "equal"]
+        self.assertEqual(ops, [{"op": "replace", "left": "видите", "right": "слышите"}])
+        self.assertNotIn("higher_level", diff["text"])
+        self.assertIsNone(diff_spells(self.official.id, self.homebrew.id + 1000))
+
+    def test_diff_with_closest_official(self):
+        response = self.client.get(f"/api/spells/spell/{self.homebrew.id}/diff/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["left"]["id"], self.official.id)
+
+        response = self.client.get(f"/api/spells/spell/{self.official.id}/diff/")
+        self.assertEqual(response.status_code, 404)
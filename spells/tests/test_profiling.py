@@ -0,0 +1,25 @@
+from django.test import TestCase, override_settings
+
+from spells.middleware import PRIMARY_COOKIE
+from spells.models import ProfileReport
+from spells.services.profiling import PROFILE_HEADER
+
+
+@override_settings(
+    SPELLS_PROFILING=True,
+    SPELLS_PROFILING_TOKEN="secret",
+    SPELLS_DB_REPLICAS=["replica_1"],
+)
+class ProfilingTests(TestCase):
+    """Отчет профилирования не считается записью запроса"""
+
+    def test_report_does_not_pin_client_to_primary(self):
+        response = self.client.post(
+            "/api/spells/dice/roll/",
+            {"expression": "2d6"},
+            content_type="application/json",
+            headers={PROFILE_HEADER: "secret"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(ProfileReport.objects.exists())
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
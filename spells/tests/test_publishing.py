@@ -0,0 +1,121 @@
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from spells.models import DamageType, Effect, Spellbook
+from spells.tests.fixtures import make_world
+
+
+class PublishingTests(TestCase):
+    """Опубликованные версии общих спеллбуков"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=2)
+
+    def setUp(self):
+        cache.clear()
+        self.spellbook = Spellbook.objects.get(id=self.world["spellbook"].id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spellbook.is_shared = True
+            self.spellbook.save()
+
+    def _snapshot_url(self):
+        response = self.client.get(f"/api/spells/spellbook/{self.spellbook.id}/shared/")
+        self.assertEqual(response.status_code, 302)
+        return response["Location"]
+
+    def test_unshared_snapshot_is_gone(self):
+        url = self._snapshot_url()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spellbook.is_shared = False
+            self.spellbook.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        etag = f'"{url.rstrip("/").rsplit("/", 1)[-1]}"'
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 404)
+
+    def test_slot_changes_do_not_republish(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.spellbook.use_spell_slot(1)
+            self.spellbook.reset_all_spell_slots()
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.spellbook.name = "Новое название"
+            self.spellbook.save()
+        self.assertTrue(callbacks)
+
+
+class CatalogRepublishTests(TestCase):
+    """Правка справочника, напечатанного на листе, дает новую версию"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=2)
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spellbook = Spellbook.objects.get(id=self.world["spellbook"].id)
+            self.spellbook.is_shared = True
+            self.spellbook.save()
+            self.effect = Effect.objects.create(
+                name="Пламя",
+                description="Эффект",
+                damage_type=DamageType.objects.create(name="Огонь"),
+            )
+            self.world["spells"][0].effects.add(self.effect)
+
+    def _published(self) -> dict:
+        url = f"/api/spells/spellbook/{self.spellbook.id}/shared/"
+        response = self.client.get(url, follow=True)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b"".join(response))
+
+    def _spell(self, payload: dict) -> dict:
+        spell_id = self.world["spells"][0].id
+        return next(spell for spell in payload["spells"] if spell["id"] == spell_id)
+
+    def test_catalog_edits_republish(self):
+        self.assertEqual(self._spell(self._published())["school"], "Воплощение")
+        edits = (
+            (self.world["school"], "name", "Эвокация"),
+            (self.world["time"], "time", "1 бонусное действие"),
+            (self.world["component"], "cost", 7),
+            (self.effect, "duration", "1 минута"),
+            (self.effect.damage_type, "name", "Пламя"),
+        )
+        for instance, field, value in edits:
+            with self.subTest(model=type(instance).__name__):
+                before = self._published()
+                with self.captureOnCommitCallbacks(execute=True):
+                    setattr(instance, field, value)
+                    instance.save()
+                self.assertNotEqual(self._published(), before)
+
+        spell = self._spell(self._published())
+        self.assertEqual(spell["school"], "Эвокация")
+        self.assertEqual(spell["time"], "1 бонусное действие")
+        self.assertEqual(spell["material_components"][0]["cost"], "7.00")
+        self.assertEqual(spell["effects"][0]["duration"], "1 минута")
+        self.assertEqual(spell["effects"][0]["damage_type"], "Пламя")
+
+    def test_unprinted_component_edit_does_not_republish(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            component = self.world["component"]
+            component.description = "Другое описание"
+            component.save()
+        self.assertEqual(callbacks, [])
+
+    def test_catalog_delete_and_unlink_republish(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.effect.delete()
+        self.assertEqual(self._spell(self._published())["effects"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.world["component"].spell_set.clear()
+        self.assertEqual(self._spell(self._published())["material_components"], [])
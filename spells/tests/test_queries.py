@@ -0,0 +1,51 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from spells.models import Person, Spellbook
+from spells.tests.fixtures import make_world
+
+
+class QueryCountTests(TestCase):
+    """Число запросов панели игрока и листа спеллбука не растет с данными"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=3)
+
+    def setUp(self):
+        cache.clear()
+
+    def _add_characters(self, count: int):
+        for number in range(count):
+            person = Person.objects.create(
+                name=f"Персонаж {number}",
+                player=self.world["player"],
+                character_class=self.world["wizard"],
+            )
+            book = Spellbook.objects.create(name=f"Книга {number}", owner=person)
+            book.spells.add(*self.world["spells"])
+
+    def test_dashboard_queries_do_not_depend_on_characters(self):
+        url = f"/api/spells/player/{self.world['player'].id}/dashboard/"
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self._add_characters(5)
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()["characters"]), 6)
+
+    def test_sheet_queries_do_not_depend_on_spells(self):
+        spellbook = self.world["spellbook"]
+        url = f"/api/spells/spellbook/{spellbook.id}/sheet/"
+        with self.assertNumQueries(4):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        # повторный показ - из кэша, одним запросом заголовка
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        cache.clear()
+        spellbook.spells.add(*make_world(spells=20, username="other")["spells"])
+        cache.clear()
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()["spells"]), 23)
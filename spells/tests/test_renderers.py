@@ -0,0 +1,110 @@
+import datetime
+import decimal
+
+import msgpack
+from django.test import SimpleTestCase, TestCase
+
+from spells.models import MaterialComponent
+from spells.renderers import (
+    COLUMNS_EXT_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    Columns,
+    packb,
+    to_columns,
+    unpackb,
+)
+
+URL = "/api/spells/material_component/"
+
+
+class ColumnsTests(SimpleTestCase):
+    """Раскладка по столбцам разворачивается парсером в те же данные"""
+
+    def setUp(self):
+        moment = datetime.datetime(2024, 6, 1, 12, 30, tzinfo=datetime.UTC)
+        self.data = {
+            "count": 2,
+            "results": [
+                {
+                    "id": 1,
+                    "cost": decimal.Decimal("1.50"),
+                    "updated_at": moment,
+                    "tags": [{"name": "огонь"}, {"name": "свет"}],
+                },
+                {"id": 2, "cost": None, "updated_at": moment, "tags": []},
+            ],
+        }
+        self.expected = {
+            "count": 2,
+            "results": [
+                {
+                    "id": 1,
+                    "cost": "1.50",
+                    "updated_at": moment,
+                    "tags": [{"name": "огонь"}, {"name": "свет"}],
+                },
+                {"id": 2, "cost": None, "updated_at": moment, "tags": []},
+            ],
+        }
+
+    def test_round_trip(self):
+        for columns in (False, True):
+            with self.subTest(columns=columns):
+                self.assertEqual(unpackb(packb(self.data, columns)), self.expected)
+
+    def test_columns_ext_type(self):
+        raw = msgpack.unpackb(packb(self.data, columns=True), timestamp=3)
+        results = raw["results"]
+        self.assertIsInstance(results, msgpack.ExtType)
+        self.assertEqual(results.code, COLUMNS_EXT_TYPE)
+        keys, ids, *_ = msgpack.unpackb(results.data, timestamp=3)
+        self.assertEqual(keys, ["id", "cost", "updated_at", "tags"])
+        self.assertEqual(ids, [1, 2])
+        self.assertLess(
+            len(packb(self.data, columns=True)), len(packb(self.data, columns=False))
+        )
+
+    def test_only_uniform_lists_become_columns(self):
+        self.assertIsInstance(to_columns([{"a": 1}, {"a": 2}]), Columns)
+        self.assertEqual(to_columns([{"a": 1}]), [{"a": 1}])
+        self.assertEqual(to_columns([{"a": 1}, {"b": 2}]), [{"a": 1}, {"b": 2}])
+        self.assertEqual(to_columns([1, 2, 3]), [1, 2, 3])
+
+    def test_naive_datetime_as_string(self):
+        moment = datetime.datetime(2024, 6, 1, 12, 30)
+        self.assertEqual(unpackb(packb({"at": moment})), {"at": moment.isoformat()})
+
+
+class MessagePackApiTests(TestCase):
+    """Формат выбирается заголовками, данные совпадают с JSON"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(3):
+            MaterialComponent.objects.create(
+                name=f"Компонент {number}", description="Описание", cost=number
+            )
+
+    def test_response_matches_json(self):
+        expected = self.client.get(URL).json()
+        for accept in (MSGPACK_MEDIA_TYPE, f"{MSGPACK_MEDIA_TYPE}; layout=columns"):
+            with self.subTest(accept=accept):
+                response = self.client.get(URL, headers={"Accept": accept})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response["Content-Type"], MSGPACK_MEDIA_TYPE)
+                self.assertIn("Accept", response["Vary"])
+                self.assertEqual(unpackb(response.content), expected)
+
+        response = self.client.get(URL, {"format": "msgpack", "layout": "columns"})
+        self.assertIsInstance(
+            msgpack.unpackb(response.content, timestamp=3), msgpack.ExtType
+        )
+
+    def test_request_body(self):
+        body = packb({"name": "Сера", "description": "Желтая", "cost": "2.50"})
+        response = self.client.post(URL, body, content_type=MSGPACK_MEDIA_TYPE)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["cost"], "2.50")
+
+        response = self.client.post(URL, b"\xc1", content_type=MSGPACK_MEDIA_TYPE)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,68 @@
+from contextvars import copy_context
+
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from spells.middleware import PRIMARY_COOKIE
+from spells.models import MaterialComponent
+from spells.routers import reads_primary, track_writes
+from spells.test_runner import TEST_REPLICA
+
+URL = "/api/spells/material_component/"
+
+
+@override_settings(SPELLS_DB_REPLICAS=[TEST_REPLICA])
+class RoutingTests(TransactionTestCase):
+    """Чтение с реплики (отдельный файл SQLite), запись и закрепление за основной"""
+
+    databases = {"default", TEST_REPLICA}
+
+    def setUp(self):
+        self.component = MaterialComponent.objects.create(
+            name="В основной", description="Компонент"
+        )
+        MaterialComponent.objects.using(TEST_REPLICA).create(
+            name="В реплике", description="Компонент"
+        )
+
+    def _names(self, response) -> list[str]:
+        self.assertEqual(response.status_code, 200)
+        return [row["name"] for row in response.json()]
+
+    def test_reads_go_to_replica(self):
+        names = MaterialComponent.objects.values_list("name", flat=True)
+        self.assertEqual(list(names), ["В реплике"])
+        with transaction.atomic():
+            self.assertEqual(list(names.all()), ["В основной"])
+
+    def test_only_writes_pin_to_primary(self):
+        def run():
+            with track_writes():
+                MaterialComponent.objects.get_or_create(name="В основной")
+                with transaction.atomic():
+                    MaterialComponent.objects.select_for_update().get(name="В основной")
+                self.assertFalse(reads_primary())
+                self.component.cost = 5
+                self.component.save()
+                self.assertTrue(reads_primary())
+
+        copy_context().run(run)
+        self.assertFalse(reads_primary())
+
+    def test_cookie_after_write(self):
+        response = self.client.get(URL)
+        self.assertEqual(self._names(response), ["В реплике"])
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+        response = self.client.patch(
+            f"{URL}{self.component.id}/",
+            {"cost": 7},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        # тот же клиент читает свою запись из основной БД
+        self.assertEqual(self._names(self.client.get(URL)), ["В основной"])
+
+        self.client.cookies.clear()
+        self.assertEqual(self._names(self.client.get(URL)), ["В реплике"])
@@ -0,0 +1,26 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from spells.tests.fixtures import make_world
+
+
+class SheetCacheTests(TestCase):
+    """Кэш листа спеллбука сбрасывается правками справочника"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_class_rename_invalidates_sheet(self):
+        url = f"/api/spells/spellbook/{self.world['spellbook'].id}/sheet/"
+        owner = self.client.get(url).json()["owner"]
+        self.assertEqual(owner["character_class"], "Волшебник")
+
+        wizard = self.world["wizard"]
+        wizard.name = "Маг"
+        wizard.save()
+        owner = self.client.get(url).json()["owner"]
+        self.assertEqual(owner["character_class"], "Маг")
@@ -0,0 +1,66 @@
+from django.test import TestCase
+
+from spells.models import Person, Spellbook
+from spells.services.slots import sync_all_spellbook_slots
+from spells.tests.fixtures import make_world
+
+
+class SlotSyncTests(TestCase):
+    """Максимум ячеек спеллбука следует за уровнями владельца"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=0)
+
+    def setUp(self):
+        self.person = Person.objects.get(id=self.world["person"].id)
+        self.spellbook = Spellbook.objects.get(id=self.world["spellbook"].id)
+
+    def _slots(self, kind: str) -> list[int]:
+        self.spellbook.refresh_from_db()
+        return [
+            getattr(self.spellbook, f"{kind}_spell_slots_{level}")
+            for level in range(1, 6)
+        ]
+
+    def test_level_up_raises_max_keeps_current(self):
+        self.person.primary_class_level = 7
+        self.person.save()
+
+        self.assertEqual(self._slots("max"), [4, 3, 3, 1, 0])
+        self.assertEqual(self._slots("current"), [4, 3, 0, 0, 0])
+
+    def test_level_down_clamps_current(self):
+        self.person.primary_class_level = 3
+        self.person.save()
+
+        self.assertEqual(self._slots("max"), [4, 2, 0, 0, 0])
+        self.assertEqual(self._slots("current"), [4, 2, 0, 0, 0])
+
+    def test_warlock_slots(self):
+        self.person.warlock_level = 3
+        self.person.save()
+
+        self.spellbook.refresh_from_db()
+        self.assertEqual(self.spellbook.warlock_slot_level, 2)
+        self.assertEqual(self.spellbook.warlock_max_slots, 2)
+        self.assertEqual(self.spellbook.warlock_current_slots, 0)
+
+    def test_unrelated_change_does_not_touch_spellbooks(self):
+        updated_at = self.spellbook.updated_at
+        self.person.name = "Новое имя"
+        self.person.save()
+
+        self.spellbook.refresh_from_db()
+        self.assertEqual(self.spellbook.updated_at, updated_at)
+
+    def test_sync_all_in_batches(self):
+        other = make_world(spells=0, username="other")
+        Spellbook.objects.update(max_spell_slots_1=0, current_spell_slots_1=0)
+
+        self.assertEqual(sync_all_spellbook_slots(batch_size=1), 2)
+        for spellbook in (self.spellbook, other["spellbook"]):
+            spellbook.refresh_from_db()
+            self.assertEqual(spellbook.max_spell_slots_3, 2)
+            self.assertEqual(spellbook.max_spell_slots_1, 4)
+            self.assertEqual(spellbook.current_spell_slots_1, 0)
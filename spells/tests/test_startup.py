@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from spells.management.commands.startup_benchmark import URLCONF_CODE, parse_importtime
+
+# Импортирует реестр приложений: пакет, AppConfig и его системные проверки
+DRF_APP_MODULES = ("rest_framework", "rest_framework.apps", "rest_framework.checks")
+
+
+class StartupTests(SimpleTestCase):
+    """Запуск не тянет тяжелые модули; время - ``manage.py startup_benchmark``"""
+
+    def test_parse_importtime(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       100 |        150 |   json.decoder\n"
+            "import time:        50 |        200 | json\n"
+        )
+        self.assertEqual(parse_importtime(output), (150, {"json": 200}))
+
+    def test_heavy_modules_are_lazy(self):
+        # URLconf и цепочка middleware, как у процесса WSGI до первого запроса;
+        # от DRF допустимы только модули приложения из INSTALLED_APPS
+        code = (
+            f"{URLCONF_CODE}; "
+            "from django.core.wsgi import get_wsgi_application; "
+            "get_wsgi_application(); import sys; "
+            "print(' '.join(m for m in sorted(sys.modules) "
+            "if m.split('.')[0] in ('PIL', 'msgpack', 'rest_framework') "
+            f"and m not in {DRF_APP_MODULES!r}))"
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE},
+            check=True,
+        )
+        self.assertEqual(completed.stdout.strip(), "")
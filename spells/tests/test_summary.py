@@ -0,0 +1,63 @@
+from django.test import TestCase
+
+from spells.models import MaterialComponent, Spell
+from spells.tests.fixtures import make_world
+
+URL = "/api/spells/material_component/"
+LONG_DESCRIPTION = "Щепотка серы и толченый уголь"
+
+
+class SummaryTests(TestCase):
+    """Краткое представление: без тяжелых полей, превью считается в SQL"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=1)
+        cls.long = MaterialComponent.objects.create(
+            name="Сера", description=LONG_DESCRIPTION, cost=1
+        )
+        cls.empty = MaterialComponent.objects.create(
+            name="Перо", description=None, cost=0
+        )
+
+    def test_summary_defers_heavy_fields(self):
+        component = MaterialComponent.objects.summary().get(id=self.long.id)
+        self.assertIn("description", component.get_deferred_fields())
+        self.assertEqual(component.short_description, LONG_DESCRIPTION[:20] + "...")
+
+        spell = Spell.objects.summary().get(id=self.world["spells"][0].id)
+        self.assertTrue({"description", "higher_level"} <= spell.get_deferred_fields())
+
+    def test_preview_matches_python_truncation(self):
+        previews = dict(
+            MaterialComponent.objects.with_preview().values_list(
+                "id", "description_preview"
+            )
+        )
+        for component in MaterialComponent.objects.all():
+            with self.subTest(name=component.name):
+                self.assertEqual(
+                    previews[component.id], component.truncate_description()
+                )
+
+    def test_summary_view(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(URL, {"view": "summary"})
+        self.assertEqual(response.status_code, 200)
+        rows = {row["id"]: row for row in response.json()}
+        self.assertNotIn("description", rows[self.long.id])
+        self.assertEqual(
+            rows[self.long.id]["short_description"], LONG_DESCRIPTION[:20] + "..."
+        )
+        self.assertEqual(rows[self.empty.id]["short_description"], "")
+
+    def test_full_view_is_default(self):
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        descriptions = {row["name"]: row["description"] for row in response.json()}
+        self.assertEqual(descriptions["Сера"], LONG_DESCRIPTION)
+
+    def test_unknown_view_rejected(self):
+        response = self.client.get(URL, {"view": "compact"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("view", response.json())
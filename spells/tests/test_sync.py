@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils.timezone import now
+
+from spells.models import Spell, Spellbook, SpellbookSpellChange
+from spells.services.sync import make_token
+from spells.tests.fixtures import make_world
+
+
+class SyncPullTests(TestCase):
+    """Журнал связи спеллбук-заклинание и удаления попадают в выборку"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=3)
+
+    def setUp(self):
+        # прошлые изменения - за пределами окна выборки
+        SpellbookSpellChange.objects.update(changed_at=now() - timedelta(minutes=1))
+        self.token = make_token(now())
+        self.spellbook = Spellbook.objects.get(id=self.world["spellbook"].id)
+        self.spells = self.world["spells"]
+
+    def _pull(self, token: str | None = None) -> dict:
+        url = f"/api/spells/player/{self.world['player'].id}/sync/"
+        params = {} if token is None else {"since": token}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _edges(self) -> set[tuple]:
+        return {
+            (edge["spellbook"], edge["spell"], edge["action"])
+            for edge in self._pull(self.token)["spellbook_spells"]
+        }
+
+    def test_full_pull(self):
+        data = self._pull()
+        self.assertEqual(len(data["spellbook_spells"]), 3)
+        self.assertEqual(len(data["spells"]), 3)
+
+    def test_add_and_remove(self):
+        spell = Spell.objects.create(
+            name="Новое", time=self.world["time"], school=self.world["school"]
+        )
+        self.spellbook.spells.add(spell)
+        self.spellbook.spells.remove(self.spells[0])
+        self.assertEqual(
+            self._edges(),
+            {
+                (self.spellbook.id, spell.id, "add"),
+                (self.spellbook.id, self.spells[0].id, "remove"),
+            },
+        )
+        self.assertIn(spell.id, [row["id"] for row in self._pull(self.token)["spells"]])
+
+    def test_clear(self):
+        self.spellbook.spells.clear()
+        expected = {(self.spellbook.id, spell.id, "remove") for spell in self.spells}
+        self.assertEqual(self._edges(), expected)
+
+    def test_reverse_clear(self):
+        self.spells[1].spellbooks.clear()
+        self.assertEqual(
+            self._edges(), {(self.spellbook.id, self.spells[1].id, "remove")}
+        )
+
+    def test_tombstones(self):
+        spell_id = self.spells[2].id
+        self.spells[2].delete()
+        Spellbook.objects.filter(id=self.spellbook.id).delete()
+        deleted = self._pull(self.token)["deleted"]
+        self.assertEqual(deleted["spell"], [spell_id])
+        self.assertEqual(deleted["spellbook"], [self.spellbook.id])
+        self.assertEqual(deleted["person"], [])
+        self.assertEqual(self._pull()["deleted"]["spellbook"], [])
@@ -0,0 +1,35 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from spells.throttling import ScopedRateThrottle
+
+URL = "/api/spells/spellbook/0/shared/"
+
+
+@mock.patch.object(ScopedRateThrottle, "THROTTLE_RATES", {"spells.shared": "2/min"})
+class ThrottlingTests(TestCase):
+    """Ограничение частоты по адресу клиента"""
+
+    def setUp(self):
+        cache.clear()
+
+    def _statuses(self, addresses) -> list[int]:
+        return [
+            self.client.get(URL, headers={"X-Forwarded-For": address}).status_code
+            for address in addresses
+        ]
+
+    def test_forged_forwarded_for_does_not_reset_limit(self):
+        statuses = self._statuses(["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        self.assertEqual(statuses, [404, 404, 429])
+
+    @override_settings(REST_FRAMEWORK={"NUM_PROXIES": 1, "DEFAULT_THROTTLE_RATES": {}})
+    def test_address_from_trusted_proxy(self):
+        statuses = self._statuses(["10.0.0.1", "10.0.0.2", "10.0.0.1", "10.0.0.1"])
+        self.assertEqual(statuses, [404, 404, 404, 429])
+
+    @override_settings(SPELLS_THROTTLING=False)
+    def test_throttling_can_be_disabled(self):
+        self.assertEqual(self._statuses(["10.0.0.1"] * 3), [404] * 3)
@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from spells.models import MaterialComponent, Spellbook
+from spells.models.tracking import VersionConflict
+from spells.tests.fixtures import make_world
+
+
+class VersionTests(TestCase):
+    """Версия растет при любом изменении строки, проверяется только явно"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.world = make_world(spells=1)
+
+    def test_save_is_one_update(self):
+        spellbook = Spellbook.objects.get(id=self.world["spellbook"].id)
+        with CaptureQueriesContext(connection) as queries:
+            spellbook.save()
+        self.assertEqual(len(queries), 0)
+
+        spellbook.name = "Другой"
+        with CaptureQueriesContext(connection) as queries:
+            spellbook.save()
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"version" = ', queries[0]["sql"])
+        self.assertEqual(spellbook.version, 2)
+
+    def test_internal_save_does_not_conflict(self):
+        stale = Spellbook.objects.get(id=self.world["spellbook"].id)
+        fresh = Spellbook.objects.get(id=stale.id)
+        fresh.name = "Другой"
+        fresh.save()
+        self.assertTrue(stale.use_spell_slot(1))
+        self.assertEqual(Spellbook.objects.get(id=stale.id).version, 3)
+
+    def test_expected_version_conflicts(self):
+        stale = Spellbook.objects.get(id=self.world["spellbook"].id)
+        Spellbook.objects.filter(id=stale.id).use_slot(1)
+        stale.name = "Другой"
+        stale.expect_version(1)
+        with self.assertRaises(VersionConflict):
+            stale.save()
+        self.assertEqual(Spellbook.objects.get(id=stale.id).name, "Спеллбук")
+
+    def test_queryset_update_bumps_version(self):
+        spellbooks = Spellbook.objects.filter(id=self.world["spellbook"].id)
+        spellbooks.use_slot(1)
+        spellbooks.restore_slot(1)
+        spellbooks.reset_slots()
+        self.assertEqual(spellbooks.get().version, 4)
+
+    def test_patch_after_update_conflicts(self):
+        component = self.world["component"]
+        url = f"/api/spells/material_component/{component.id}/"
+        MaterialComponent.objects.filter(id=component.id).update(cost=7)
+        response = self.client.patch(
+            url, {"cost": 9, "version": 1}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 409)
+
+        response = self.client.patch(
+            url, {"cost": 9, "version": 2}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 3)
@@ -1,20 +1,153 @@
+from importlib import import_module
+
 from django.urls import path
 
-from spells.views.material_component import (
-    MaterialComponentDetailView,
-    MaterialConponentListView,
-)
+
+def lazy_view(dotted_path: str, **initkwargs):
+    """
+    View, модуль которой импортируется при первом запросе к маршруту:
+    загрузка URLconf не тянет DRF и сервисы всех эндпоинтов сразу
+    """
+    module_name, class_name = dotted_path.rsplit(".", 1)
+    view = None
+
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view_class = getattr(import_module(module_name), class_name)
+            view = view_class.as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    # как APIView.as_view(): CSRF для сессий проверяет сам DRF
+    dispatch.csrf_exempt = True
+    return dispatch
+
 
 app_name = "spells"
 urlpatterns = [
     path(
         "material_component/",
-        MaterialConponentListView.as_view(),
+        lazy_view("spells.views.material_component.MaterialConponentListView"),
         name="material_component_list",
     ),
     path(
         "material_component/<int:id>/",
-        MaterialComponentDetailView.as_view(),
+        lazy_view("spells.views.material_component.MaterialComponentDetailView"),
         name="material_component_detail",
     ),
+    path(
+        "spellbook/<int:id>/sheet/",
+        lazy_view("spells.views.spellbook.SpellbookSheetView"),
+        name="spellbook_sheet",
+    ),
+    path(
+        "spellbook/<int:id>/shared/",
+        lazy_view("spells.views.shared.SharedSpellbookView"),
+        name="shared_spellbook",
+    ),
+    path(
+        "character/<int:id>/public/",
+        lazy_view("spells.views.shared.PublicPersonView"),
+        name="public_character",
+    ),
+    path(
+        "shared/<str:content_hash>/",
+        lazy_view("spells.views.shared.SnapshotView"),
+        name="shared_snapshot",
+    ),
+    path(
+        "spellbook/<int:id>/recommendations/",
+        lazy_view("spells.views.recommendations.SpellbookRecommendationsView"),
+        name="spellbook_recommendations",
+    ),
+    path(
+        "spell/<int:id>/similar/",
+        lazy_view("spells.views.recommendations.SimilarSpellsView"),
+        name="similar_spells",
+    ),
+    path(
+        "dice/roll/",
+        lazy_view("spells.views.simulation.DiceRollView"),
+        name="dice_roll",
+    ),
+    path(
+        "simulate/",
+        lazy_view("spells.views.simulation.CastSimulationView"),
+        name="cast_simulation",
+    ),
+    path(
+        "encounter/optimize/",
+        lazy_view("spells.views.encounter.EncounterOptimizeView"),
+        name="encounter_optimize",
+    ),
+    path(
+        "player/<int:id>/dashboard/",
+        lazy_view("spells.views.player.PlayerDashboardView"),
+        name="player_dashboard",
+    ),
+    path(
+        "player/<int:id>/sync/",
+        lazy_view("spells.views.sync.PlayerSyncView"),
+        name="player_sync",
+    ),
+    path(
+        "spellbook/<int:id>/timeline/",
+        lazy_view("spells.views.timeline.SpellbookTimelineView"),
+        name="spellbook_timeline",
+    ),
+    path(
+        "character/<int:id>/timeline/",
+        lazy_view("spells.views.timeline.PersonTimelineView"),
+        name="person_timeline",
+    ),
+    path(
+        "spell/<int:id>/near_duplicates/",
+        lazy_view("spells.views.near_duplicates.NearDuplicatesView"),
+        name="spell_near_duplicates",
+    ),
+    path(
+        "spell/<int:id>/diff/",
+        lazy_view("spells.views.near_duplicates.SpellDiffView"),
+        name="spell_diff_official",
+    ),
+    path(
+        "spell/<int:id>/diff/<int:other_id>/",
+        lazy_view("spells.views.near_duplicates.SpellDiffView"),
+        name="spell_diff",
+    ),
+    path(
+        "autocomplete/",
+        lazy_view("spells.views.autocomplete.AutocompleteView"),
+        name="autocomplete",
+    ),
+    path(
+        "player/<int:id>/characters/",
+        lazy_view("spells.views.listings.PlayerCharactersView"),
+        name="player_characters",
+    ),
+    path(
+        "characters/public/",
+        lazy_view("spells.views.listings.PublicCharactersView"),
+        name="public_characters",
+    ),
+    path(
+        "character/<int:id>/spellbooks/",
+        lazy_view("spells.views.listings.CharacterSpellbooksView"),
+        name="character_spellbooks",
+    ),
+    path(
+        "spellbooks/shared/",
+        lazy_view("spells.views.listings.SharedSpellbooksView"),
+        name="shared_spellbooks",
+    ),
+    path(
+        "spellbook/<int:id>/cards/",
+        lazy_view("spells.views.cards.SpellbookCardsView"),
+        name="spellbook_cards",
+    ),
+    path(
+        "spell/<int:id>/card/",
+        lazy_view("spells.views.cards.SpellCardView"),
+        name="spell_card",
+    ),
 ]
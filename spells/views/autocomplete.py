@@ -0,0 +1,33 @@
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.services.autocomplete import KINDS, suggest
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    """Параметры автодополнения"""
+
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    kind = serializers.ChoiceField(choices=KINDS, required=False, default=None)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+"""API по пути /api/spells/autocomplete/?q=..."""
+
+
+class AutocompleteView(APIView):
+    def get(self, request: Request):
+        """
+        Подсказки названий заклинаний и компонентов (с опечатками)
+        по убыванию сходства и популярности; ?kind=spell|component - один вид
+        """
+        query = AutocompleteQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        suggestions = suggest(
+            query.validated_data["q"],
+            query.validated_data["kind"],
+            query.validated_data["limit"],
+        )
+        return Response(data=suggestions, status=status.HTTP_200_OK)
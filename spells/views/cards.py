@@ -0,0 +1,62 @@
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.services.cards import (
+    build_pdf,
+    read_card,
+    request_cards,
+    spellbook_cards,
+)
+from spells.throttling import ScopedRateThrottle
+
+# Через сколько секунд повторить запрос, пока карточки рисуются в фоне
+RETRY_AFTER = 5
+
+"""API по пути /api/spells/spellbook/<id>/cards/"""
+
+
+class SpellbookCardsView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.cards"
+
+    def get(self, request: Request, id: int):
+        """PDF с карточками заклинаний спеллбука для печати"""
+        cards = spellbook_cards(id)
+        if cards is None:
+            raise Http404
+        if cards.pending:
+            data = {"detail": "Карточки рисуются", "pending": cards.pending}
+            return Response(
+                data=data,
+                status=status.HTTP_202_ACCEPTED,
+                headers={"Retry-After": str(RETRY_AFTER)},
+            )
+        # ETag по именам карточек: пока заклинания не менялись, PDF тот же
+        if request.headers.get("If-None-Match") == cards.etag:
+            return HttpResponseNotModified(headers={"ETag": cards.etag})
+        response = HttpResponse(build_pdf(cards), content_type="application/pdf")
+        response["Content-Disposition"] = f'inline; filename="spellbook-{id}.pdf"'
+        response["ETag"] = cards.etag
+        return response
+
+
+"""API по пути /api/spells/spell/<id>/card/"""
+
+
+class SpellCardView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.cards"
+
+    def get(self, request: Request, id: int):
+        """Карточка заклинания (PNG, 300 dpi)"""
+        cards = request_cards([id])
+        if not cards.names:
+            raise Http404
+        if request.headers.get("If-None-Match") == cards.etag:
+            return HttpResponseNotModified(headers={"ETag": cards.etag})
+        response = HttpResponse(read_card(cards.names[0]), content_type="image/png")
+        response["ETag"] = cards.etag
+        return response
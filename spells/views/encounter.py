@@ -0,0 +1,42 @@
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.services.encounter import Target, optimize
+from spells.throttling import ScopedRateThrottle
+
+
+class EncounterSerializer(serializers.Serializer):
+    """Параметры столкновения для подбора заклинаний партии"""
+
+    party = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=12
+    )
+    target_ac = serializers.IntegerField(min_value=0, max_value=40, default=10)
+    target_save_bonus = serializers.IntegerField(min_value=-10, max_value=30, default=0)
+    targets = serializers.IntegerField(min_value=1, max_value=50, default=1)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=5)
+
+
+"""API по пути /api/spells/encounter/optimize/"""
+
+
+class EncounterOptimizeView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.simulation"
+
+    def post(self, request: Request):
+        """Лучшие комбинации заклинание/ячейка для партии против столкновения"""
+        serializer = EncounterSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        target = Target(
+            armor_class=params["target_ac"],
+            save_bonus=params["target_save_bonus"],
+            count=params["targets"],
+        )
+        # порядок участников сохраняется, повторы отбрасываются
+        party = list(dict.fromkeys(params["party"]))
+        data = optimize(party, target, limit=params["limit"])
+        return Response(data=data, status=status.HTTP_200_OK)
@@ -0,0 +1,107 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.models import Person, Player, Spellbook
+from spells.services.listings import (
+    person_spellbooks,
+    player_characters,
+    public_characters,
+    shared_spellbooks,
+)
+
+
+class ListingQuerySerializer(serializers.Serializer):
+    """Параметры страницы списка"""
+
+    active = serializers.BooleanField(default=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=50)
+    offset = serializers.IntegerField(min_value=0, default=0)
+
+
+class CharacterListSerializer(serializers.ModelSerializer):
+    """Персонаж в списке"""
+
+    character_class = serializers.CharField(
+        source="character_class.name", default=None, read_only=True
+    )
+
+    class Meta:
+        model = Person
+        fields = [
+            "id",
+            "name",
+            "player",
+            "level",
+            "character_class",
+            "is_active",
+            "is_favorite",
+            "is_public",
+            "updated_at",
+        ]
+
+
+class SpellbookListSerializer(serializers.ModelSerializer):
+    """Спеллбук в списке"""
+
+    owner_name = serializers.CharField(source="owner.name", read_only=True)
+
+    class Meta:
+        model = Spellbook
+        fields = ["id", "name", "owner", "owner_name", "is_active", "updated_at"]
+
+
+def _query(request: Request) -> dict:
+    query = ListingQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    return query.validated_data
+
+
+def _page(query: dict, queryset, serializer_class) -> Response:
+    offset, limit = query["offset"], query["limit"]
+    serializer = serializer_class(queryset[offset : offset + limit], many=True)
+    return Response(data=serializer.data, status=status.HTTP_200_OK)
+
+
+"""API по пути /api/spells/player/<id>/characters/"""
+
+
+class PlayerCharactersView(APIView):
+    def get(self, request: Request, id: int):
+        """Персонажи игрока (?active=true - только активные)"""
+        query = _query(request)
+        get_object_or_404(Player.objects.only("id"), id=id)
+        characters = player_characters(id, active=query["active"])
+        return _page(query, characters, CharacterListSerializer)
+
+
+"""API по пути /api/spells/characters/public/"""
+
+
+class PublicCharactersView(APIView):
+    def get(self, request: Request):
+        """Публичные персонажи всех игроков"""
+        return _page(_query(request), public_characters(), CharacterListSerializer)
+
+
+"""API по пути /api/spells/character/<id>/spellbooks/"""
+
+
+class CharacterSpellbooksView(APIView):
+    def get(self, request: Request, id: int):
+        """Спеллбуки персонажа (?active=true - только активные)"""
+        query = _query(request)
+        get_object_or_404(Person.objects.only("id"), id=id)
+        spellbooks = person_spellbooks(id, active=query["active"])
+        return _page(query, spellbooks, SpellbookListSerializer)
+
+
+"""API по пути /api/spells/spellbooks/shared/"""
+
+
+class SharedSpellbooksView(APIView):
+    def get(self, request: Request):
+        """Общие спеллбуки всех игроков"""
+        return _page(_query(request), shared_spellbooks(), SpellbookListSerializer)
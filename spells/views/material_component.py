@@ -5,14 +5,33 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from spells.models import MaterialComponent
+from spells.serializers import (
+    RepresentationSerializerMixin,
+    VersionedSerializerMixin,
+)
 
 
-class MaterialComponentSerializer(serializers.ModelSerializer):
+class MaterialComponentSerializer(
+    RepresentationSerializerMixin,
+    VersionedSerializerMixin,
+    serializers.ModelSerializer,
+):
     """Сериализатор данных для модели MaterialComponent"""
 
+    version = serializers.IntegerField(min_value=1, required=False)
+
     class Meta:
         model = MaterialComponent
-        fields = ["name", "description", "cost", "is_consumable", "is_focus"]
+        fields = ["name", "description", "cost", "is_consumable", "is_focus", "version"]
+        summary_fields = [
+            "id",
+            "name",
+            "short_description",
+            "cost",
+            "is_consumable",
+            "is_focus",
+            "version",
+        ]
 
     def validate_name(self, value):
         """Валидация имени"""
@@ -32,11 +51,18 @@ class MaterialComponentSerializer(serializers.ModelSerializer):
 
 class MaterialConponentListView(APIView):
     def get(self, request: Request):
-        """Получение всех компонент"""
-        # Получаем все объекты (READ)
+        """Получение всех компонент (?view=summary - краткое представление)"""
+        representation = request.query_params.get(
+            "view", MaterialComponentSerializer.FULL
+        )
+        # Получаем все объекты (READ), для краткого представления без описаний
         components = MaterialComponent.objects.all()
+        if representation == MaterialComponentSerializer.SUMMARY:
+            components = components.summary()
         # Настраиваем сериализатор данных
-        serializer = MaterialComponentSerializer(components, many=True)
+        serializer = MaterialComponentSerializer(
+            components, many=True, representation=representation
+        )
         # Отправляем данные с ответом 200
         return Response(data=serializer.data, status=status.HTTP_200_OK)
 
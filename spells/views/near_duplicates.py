@@ -0,0 +1,60 @@
+from django.http import Http404
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.services.near_duplicates import (
+    closest_official,
+    diff_spells,
+    find_near_duplicates,
+)
+from spells.throttling import ScopedRateThrottle
+
+
+class NearDuplicatesQuerySerializer(serializers.Serializer):
+    """Параметры поиска почти-дубликатов"""
+
+    threshold = serializers.FloatField(min_value=0.0, max_value=1.0, default=0.5)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    official = serializers.BooleanField(required=False, allow_null=True, default=None)
+
+
+"""API по пути /api/spells/spell/<id>/near_duplicates/"""
+
+
+class NearDuplicatesView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.recommendations"
+
+    def get(self, request: Request, id: int):
+        """Заклинания с почти таким же текстом (?official=true - официальные)"""
+        query = NearDuplicatesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        spells = find_near_duplicates(id, **query.validated_data)
+        if spells is None:
+            raise Http404
+        return Response(data=spells, status=status.HTTP_200_OK)
+
+
+"""API по путям /api/spells/spell/<id>/diff/ и .../diff/<other_id>/"""
+
+
+class SpellDiffView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.recommendations"
+
+    def get(self, request: Request, id: int, other_id: int | None = None):
+        """
+        Различия заклинания с другим заклинанием,
+        по умолчанию - с ближайшим официальным
+        """
+        if other_id is None:
+            closest = closest_official(id)
+            if closest is None:
+                raise Http404
+            other_id = closest["id"]
+        diff = diff_spells(other_id, id)
+        if diff is None:
+            raise Http404
+        return Response(data=diff, status=status.HTTP_200_OK)
@@ -0,0 +1,165 @@
+from django.db.models import Count, Prefetch
+from django.shortcuts import get_object_or_404
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.models import Person, Player, Spell, Spellbook
+from spells.services.avatars import avatar_url, avatar_urls
+from spells.services.events import SPELLBOOK_COUNTER_FIELDS, spellbook_states
+
+DASHBOARD_AVATAR_SIZE = 128
+
+
+class DashboardSpellbookSerializer(serializers.ModelSerializer):
+    """Спеллбук персонажа на панели игрока"""
+
+    spell_count = serializers.IntegerField(read_only=True)
+    remaining_slots = serializers.IntegerField(read_only=True)
+    total_slots = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Spellbook
+        fields = [
+            "id",
+            "name",
+            "is_active",
+            "is_shared",
+            "spell_count",
+            "remaining_slots",
+            "total_slots",
+            "updated_at",
+        ]
+
+
+class DashboardCharacterSerializer(serializers.ModelSerializer):
+    """Персонаж на панели игрока"""
+
+    character_class = serializers.CharField(
+        source="character_class.name", default=None, read_only=True
+    )
+    second_class = serializers.CharField(
+        source="second_class.name", default=None, read_only=True
+    )
+    spellbooks = DashboardSpellbookSerializer(
+        source="spellbook_list", many=True, read_only=True
+    )
+
+    class Meta:
+        model = Person
+        fields = [
+            "id",
+            "name",
+            "level",
+            "character_class",
+            "second_class",
+            "is_active",
+            "is_favorite",
+            "is_public",
+            "spellbooks",
+        ]
+
+
+class DashboardSpellSerializer(serializers.ModelSerializer):
+    """Заклинание, созданное игроком"""
+
+    school = serializers.CharField(source="school.name", default=None, read_only=True)
+
+    class Meta:
+        model = Spell
+        fields = ["id", "name", "level", "school", "is_official", "updated_at"]
+
+
+class DashboardPlayerSerializer(serializers.ModelSerializer):
+    """Профиль игрока на панели"""
+
+    username = serializers.CharField(source="user.username", read_only=True)
+    favorite_class = serializers.CharField(
+        source="favorite_class.name", default=None, read_only=True
+    )
+    total_characters = serializers.IntegerField(read_only=True)
+    active_characters = serializers.IntegerField(
+        source="characters_active", read_only=True
+    )
+    avatar = serializers.SerializerMethodField()
+    avatars = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Player
+        fields = [
+            "id",
+            "username",
+            "nickname",
+            "bio",
+            "experience_points",
+            "favorite_class",
+            "total_characters",
+            "active_characters",
+            "avatar",
+            "avatars",
+        ]
+
+    def get_avatar(self, player):
+        """Аватар в размере панели игрока"""
+        return avatar_url(player, DASHBOARD_AVATAR_SIZE)
+
+    def get_avatars(self, player):
+        """Все миниатюры аватара по размерам и форматам"""
+        return avatar_urls(player)
+
+
+"""API по пути /api/spells/player/<id>/dashboard/"""
+
+
+class PlayerDashboardView(APIView):
+    def get(self, request: Request, id: int):
+        """
+        Панель игрока: персонажи со спеллбуками и созданные заклинания.
+        Четыре запроса независимо от числа персонажей и спеллбуков
+        """
+        players = Player.objects.select_related("user", "favorite_class")
+        player = get_object_or_404(players.with_character_counts(), id=id)
+
+        spellbooks = (
+            Spellbook.objects.with_spell_count()
+            .with_slot_totals()
+            .only(
+                "id",
+                "owner_id",
+                "name",
+                "is_active",
+                "is_shared",
+                "updated_at",
+            )
+        )
+        characters = (
+            Person.objects.filter(player=player)
+            .select_related("character_class", "second_class")
+            .prefetch_related(
+                Prefetch("spellbooks", queryset=spellbooks, to_attr="spellbook_list")
+            )
+        )
+        characters = list(characters)
+        # в режиме журнала событий остаток ячеек учитывает несвернутые события
+        spellbook_list = [sb for person in characters for sb in person.spellbook_list]
+        states = spellbook_states(sb.id for sb in spellbook_list)
+        for spellbook in spellbook_list:
+            if spellbook.id in states:
+                state = states[spellbook.id]
+                spellbook.remaining_slots = sum(
+                    state[name] for name in SPELLBOOK_COUNTER_FIELDS
+                )
+
+        created_spells = (
+            Spell.objects.filter(created_by=player)
+            .select_related("school")
+            .only("id", "name", "level", "is_official", "updated_at", "school__name")
+        )
+
+        data = {
+            "player": DashboardPlayerSerializer(player).data,
+            "characters": DashboardCharacterSerializer(characters, many=True).data,
+            "created_spells": DashboardSpellSerializer(created_spells, many=True).data,
+        }
+        return Response(data=data, status=status.HTTP_200_OK)
@@ -0,0 +1,69 @@
+from django.http import Http404
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.models import Spell
+from spells.services.coalescing import coalesce
+from spells.services.generations import CATALOG, get_generation
+from spells.services.recommendations import recommend, recommend_for_spellbook
+from spells.services.spellbook_sheet import SPELLBOOK_SPELLS
+from spells.throttling import ScopedRateThrottle
+
+
+class RecommendationQuerySerializer(serializers.Serializer):
+    """Параметры запроса рекомендаций"""
+
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+"""API по пути /api/spells/spellbook/<id>/recommendations/"""
+
+
+class SpellbookRecommendationsView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.recommendations"
+
+    def get(self, request: Request, id: int):
+        """Рекомендованные заклинания для спеллбука"""
+        query = RecommendationQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        limit = query.validated_data["limit"]
+        generations = (
+            f"{get_generation(SPELLBOOK_SPELLS, id)}:{get_generation(CATALOG)}"
+        )
+        spells = coalesce(
+            f"spells:recommendations:spellbook:{id}:{limit}:{generations}",
+            lambda: recommend_for_spellbook(id, limit=limit),
+        )
+        if spells is None:
+            raise Http404
+        return Response(data=spells, status=status.HTTP_200_OK)
+
+
+"""API по пути /api/spells/spell/<id>/similar/"""
+
+
+class SimilarSpellsView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.recommendations"
+
+    @staticmethod
+    def similar(spell_id: int, limit: int) -> list[dict] | None:
+        if not Spell.objects.filter(id=spell_id).exists():
+            return None
+        return recommend([spell_id], limit=limit)
+
+    def get(self, request: Request, id: int):
+        """Заклинания, похожие на данное"""
+        query = RecommendationQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        limit = query.validated_data["limit"]
+        spells = coalesce(
+            f"spells:recommendations:similar:{id}:{limit}:{get_generation(CATALOG)}",
+            lambda: self.similar(id, limit),
+        )
+        if spells is None:
+            raise Http404
+        return Response(data=spells, status=status.HTTP_200_OK)
@@ -0,0 +1,58 @@
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.shortcuts import redirect
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from spells.models import PublishedSnapshot
+from spells.services.publishing import get_blob, latest_hash
+from spells.throttling import ScopedRateThrottle
+
+# Версия по хэшу не меняется, но источник могут снять с публикации -
+# кэшируется недолго, дальше проверка по ETag
+SNAPSHOT_CACHE_CONTROL = "public, max-age=300"
+# Указатель на последнюю версию живет недолго
+LATEST_CACHE_CONTROL = "public, max-age=60"
+
+"""API по пути /api/spells/shared/"""
+
+
+class SnapshotView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.shared"
+
+    def get(self, request: Request, content_hash: str):
+        """Опубликованная версия по хэшу содержимого"""
+        blob = get_blob(content_hash)
+        if blob is None:
+            raise Http404
+        etag = f'"{content_hash}"'
+        if request.headers.get("If-None-Match") == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(blob, content_type="application/json")
+        response["ETag"] = etag
+        response["Cache-Control"] = SNAPSHOT_CACHE_CONTROL
+        return response
+
+
+class LatestSnapshotView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.shared"
+    kind = None
+
+    def get(self, request: Request, id: int):
+        """Перенаправление на последнюю опубликованную версию"""
+        content_hash = latest_hash(self.kind, id)
+        if content_hash is None:
+            raise Http404
+        response = redirect("spells:shared_snapshot", content_hash=content_hash)
+        response["Cache-Control"] = LATEST_CACHE_CONTROL
+        return response
+
+
+class SharedSpellbookView(LatestSnapshotView):
+    kind = PublishedSnapshot.Kind.SPELLBOOK
+
+
+class PublicPersonView(LatestSnapshotView):
+    kind = PublishedSnapshot.Kind.PERSON
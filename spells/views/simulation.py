@@ -0,0 +1,128 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.models import Person, Spell
+from spells.services.dice import parse
+from spells.services.simulation import cast_dice, estimate_cast
+from spells.throttling import ScopedRateThrottle
+
+
+class DiceRollSerializer(serializers.Serializer):
+    """Параметры броска костей"""
+
+    expression = serializers.CharField(max_length=50)
+    times = serializers.IntegerField(min_value=1, max_value=100, default=1)
+
+    def validate_expression(self, value):
+        """Валидация выражения костей"""
+        try:
+            return parse(value)
+        except ValueError as error:
+            raise serializers.ValidationError(str(error)) from error
+
+
+class CastSimulationSerializer(serializers.Serializer):
+    """Параметры оценки заклинаний персонажа против цели"""
+
+    caster = serializers.IntegerField()
+    spells = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=500
+    )
+    slot_level = serializers.IntegerField(min_value=1, max_value=9, required=False)
+    target_ac = serializers.IntegerField(min_value=0, max_value=40, default=10)
+    target_save_bonus = serializers.IntegerField(min_value=-10, max_value=30, default=0)
+
+
+"""API по пути /api/spells/dice/roll/"""
+
+
+class DiceRollView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.simulation"
+
+    def post(self, request: Request):
+        """Бросок костей по выражению, например 8d6+4"""
+        serializer = DiceRollSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        expression = serializer.validated_data["expression"]
+        rolls = []
+        for _ in range(serializer.validated_data["times"]):
+            total, dice = expression.roll()
+            rolls.append({"total": total, "dice": dice})
+        data = {
+            "expression": str(expression),
+            "expected": expression.expected,
+            "min": expression.minimum,
+            "max": expression.maximum,
+            "rolls": rolls,
+        }
+        return Response(data=data, status=status.HTTP_200_OK)
+
+
+"""API по пути /api/spells/simulate/"""
+
+
+class CastSimulationView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.simulation"
+
+    def post(self, request: Request):
+        """Оценка урона и вероятности успеха заклинаний против цели"""
+        serializer = CastSimulationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        caster = get_object_or_404(Person, id=params["caster"])
+        attack_bonus = caster.spell_attack_bonus
+        save_dc = caster.spell_save_dc
+
+        spells = Spell.objects.filter(id__in=params["spells"]).values(
+            "id", "name", "level", "attack_type", "damage_dice", "higher_level_dice"
+        )
+        results = []
+        errors = []
+        for spell in spells:
+            slot_level = max(spell["level"], params.get("slot_level", 0))
+            try:
+                dice = cast_dice(
+                    spell["damage_dice"],
+                    spell["higher_level_dice"],
+                    spell["level"],
+                    slot_level,
+                )
+            except ValueError as error:
+                errors.append({"id": spell["id"], "error": str(error)})
+                continue
+            estimate = estimate_cast(
+                dice,
+                spell["attack_type"],
+                attack_bonus=attack_bonus,
+                save_dc=save_dc,
+                target_ac=params["target_ac"],
+                target_save_bonus=params["target_save_bonus"],
+            )
+            results.append(
+                {
+                    "id": spell["id"],
+                    "name": spell["name"],
+                    "slot_level": slot_level,
+                    "dice": dice,
+                    "attack_type": spell["attack_type"],
+                    **estimate.as_dict(),
+                }
+            )
+        results.sort(key=lambda result: -result["expected_damage"])
+
+        data = {
+            "caster": {
+                "id": caster.id,
+                "spell_attack_bonus": attack_bonus,
+                "spell_save_dc": save_dc,
+            },
+            "results": results,
+            "errors": errors,
+        }
+        return Response(data=data, status=status.HTTP_200_OK)
@@ -0,0 +1,22 @@
+from django.http import Http404
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.services.spellbook_sheet import build_sheet
+from spells.throttling import ScopedRateThrottle
+
+"""API по пути /api/spells/spellbook/<id>/sheet/"""
+
+
+class SpellbookSheetView(APIView):
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = "spells.sheet"
+
+    def get(self, request: Request, id: int):
+        """Лист подготовленных заклинаний спеллбука"""
+        sheet = build_sheet(id)
+        if sheet is None:
+            raise Http404
+        return Response(data=sheet, status=status.HTTP_200_OK)
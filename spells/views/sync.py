@@ -0,0 +1,77 @@
+from django.shortcuts import get_object_or_404
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.models import Player
+from spells.services.sync import OPERATIONS, apply_operations, parse_token, pull
+
+
+class SyncOperationSerializer(serializers.Serializer):
+    """Операция клиента над счетчиками"""
+
+    # Поля, обязательные для каждого типа операции
+    REQUIRED = {
+        "use_slot": ("spellbook",),
+        "restore_slot": ("spellbook",),
+        "long_rest": ("spellbook",),
+        "change_hp": ("person", "amount"),
+        "grant_temp_hp": ("person", "amount"),
+    }
+
+    id = serializers.UUIDField()
+    type = serializers.ChoiceField(choices=sorted(OPERATIONS))
+    spellbook = serializers.IntegerField(required=False)
+    person = serializers.IntegerField(required=False)
+    level = serializers.IntegerField(min_value=1, max_value=9, required=False)
+    warlock = serializers.BooleanField(default=False)
+    amount = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        """Проверка полей, нужных для типа операции"""
+        missing = [name for name in self.REQUIRED[attrs["type"]] if name not in attrs]
+        slot_operation = attrs["type"] in ("use_slot", "restore_slot")
+        if slot_operation and not attrs["warlock"] and "level" not in attrs:
+            missing.append("level")
+        if attrs["type"] == "grant_temp_hp" and attrs.get("amount", 0) < 0:
+            raise serializers.ValidationError(
+                {"amount": "Временные хиты не могут быть отрицательными"}
+            )
+        if missing:
+            raise serializers.ValidationError(
+                {name: "Обязательное поле для этой операции" for name in missing}
+            )
+        return attrs
+
+
+class SyncPushSerializer(serializers.Serializer):
+    """Пакет операций клиента"""
+
+    operations = SyncOperationSerializer(many=True, allow_empty=False)
+
+
+"""API по пути /api/spells/player/<id>/sync/"""
+
+
+class PlayerSyncView(APIView):
+    def get(self, request: Request, id: int):
+        """Изменения после токена ?since= (без токена - все данные игрока)"""
+        get_object_or_404(Player.objects.only("id"), id=id)
+        since = request.query_params.get("since")
+        if since is not None:
+            try:
+                since = parse_token(since)
+            except (ValueError, OverflowError, OSError):
+                raise serializers.ValidationError(
+                    {"since": "Некорректный токен"}
+                ) from None
+        return Response(data=pull(id, since), status=status.HTTP_200_OK)
+
+    def post(self, request: Request, id: int):
+        """Применение операций клиента над ячейками и хитами"""
+        get_object_or_404(Player.objects.only("id"), id=id)
+        serializer = SyncPushSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = apply_operations(id, serializer.validated_data["operations"])
+        return Response(data={"results": results}, status=status.HTTP_200_OK)
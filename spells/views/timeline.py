@@ -0,0 +1,42 @@
+from django.http import Http404
+from rest_framework import serializers, status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from spells.models import Person, Spellbook
+from spells.services.events import replay
+
+
+class TimelineQuerySerializer(serializers.Serializer):
+    """Окно воспроизведения ?since=&until= (ISO 8601)"""
+
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+
+class TimelineView(APIView):
+    model = None
+
+    def get(self, request: Request, id: int):
+        """Ход сессии: состояние в начале окна и после каждого события"""
+        query = TimelineQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        timeline = replay(self.model, id, **query.validated_data)
+        if timeline is None:
+            raise Http404
+        return Response(data=timeline, status=status.HTTP_200_OK)
+
+
+"""API по пути /api/spells/spellbook/<id>/timeline/"""
+
+
+class SpellbookTimelineView(TimelineView):
+    model = Spellbook
+
+
+"""API по пути /api/spells/character/<id>/timeline/"""
+
+
+class PersonTimelineView(TimelineView):
+    model = Person